@@ -0,0 +1,76 @@
+"""create user oauth_account item
+
+Revision ID: b504f9254b19
+Revises:
+Create Date: 2026-10-18 08:00:00.000000+00:00
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import fastapi_users_db_sqlalchemy
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b504f9254b19"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user",
+        sa.Column("id", fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+        sa.Column("email", sa.String(length=320), nullable=False),
+        sa.Column("hashed_password", sa.String(length=1024), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("is_superuser", sa.Boolean(), nullable=False),
+        sa.Column("is_verified", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_user_email", "user", ["email"], unique=True)
+    op.create_table(
+        "oauth_account",
+        sa.Column("id", fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+        sa.Column("oauth_name", sa.String(length=100), nullable=False),
+        sa.Column("access_token", sa.String(length=1024), nullable=False),
+        sa.Column("expires_at", sa.Integer(), nullable=True),
+        sa.Column("refresh_token", sa.String(length=1024), nullable=True),
+        sa.Column("account_id", sa.String(length=320), nullable=False),
+        sa.Column("account_email", sa.String(length=320), nullable=False),
+        sa.Column(
+            "user_id", fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="cascade"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_oauth_account_account_id", "oauth_account", ["account_id"], unique=False
+    )
+    op.create_index(
+        "ix_oauth_account_oauth_name", "oauth_account", ["oauth_name"], unique=False
+    )
+    op.create_table(
+        "item",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("owner_id", sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_item_id", "item", ["id"], unique=False)
+    op.create_index("ix_item_title", "item", ["title"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_title", table_name="item")
+    op.drop_index("ix_item_id", table_name="item")
+    op.drop_table("item")
+    op.drop_index("ix_oauth_account_oauth_name", table_name="oauth_account")
+    op.drop_index("ix_oauth_account_account_id", table_name="oauth_account")
+    op.drop_table("oauth_account")
+    op.drop_index("ix_user_email", table_name="user")
+    op.drop_table("user")
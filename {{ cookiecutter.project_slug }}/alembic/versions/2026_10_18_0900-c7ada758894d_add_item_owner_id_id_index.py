@@ -0,0 +1,25 @@
+"""add item owner_id id index
+
+Revision ID: c7ada758894d
+Revises: b504f9254b19
+Create Date: 2026-10-18 09:00:00.000000+00:00
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7ada758894d"
+down_revision: Union[str, None] = "b504f9254b19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_item_owner_id_id", "item", ["owner_id", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_owner_id_id", table_name="item")
@@ -0,0 +1,49 @@
+"""add item search vector
+
+Revision ID: f0e8f684bd05
+Revises: c7ada758894d
+Create Date: 2026-10-18 10:00:00.000000+00:00
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "f0e8f684bd05"
+down_revision: Union[str, None] = "c7ada758894d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "item",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_item_search_vector",
+        "item",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+    op.drop_index("ix_item_description", table_name="item")
+
+
+def downgrade() -> None:
+    op.create_index("ix_item_description", "item", ["description"], unique=False)
+    op.drop_index("ix_item_search_vector", table_name="item", postgresql_using="gin")
+    op.drop_column("item", "search_vector")
@@ -0,0 +1,29 @@
+"""add item version id
+
+Revision ID: 3877e17099dc
+Revises: f0e8f684bd05
+Create Date: 2026-10-18 11:00:00.000000+00:00
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3877e17099dc"
+down_revision: Union[str, None] = "f0e8f684bd05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "item",
+        sa.Column("version_id", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("item", "version_id")
@@ -0,0 +1,98 @@
+"""add item event
+
+Revision ID: 695169d11cd7
+Revises: 3877e17099dc
+Create Date: 2026-10-18 12:00:00.000000+00:00
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "695169d11cd7"
+down_revision: Union[str, None] = "3877e17099dc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "item_event",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.UUID(), nullable=True),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("version_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_item_event_owner_id_id", "item_event", ["owner_id", "id"], unique=False
+    )
+    op.create_index(
+        "ix_item_event_created_at", "item_event", ["created_at"], unique=False
+    )
+    # record each change of an item, and notify the listening workers once the
+    # transaction commits
+    op.execute(
+        """
+        CREATE FUNCTION item_event_notify() RETURNS trigger AS $$
+        DECLARE
+            changed item%ROWTYPE;
+            event item_event%ROWTYPE;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := OLD;
+            ELSE
+                changed := NEW;
+            END IF;
+            INSERT INTO item_event (item_id, owner_id, op, version_id)
+            VALUES (
+                changed.id,
+                changed.owner_id,
+                CASE TG_OP
+                    WHEN 'INSERT' THEN 'create'
+                    WHEN 'UPDATE' THEN 'update'
+                    ELSE 'delete'
+                END,
+                CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE changed.version_id END
+            )
+            RETURNING * INTO event;
+            PERFORM pg_notify(
+                'item_events',
+                json_build_object(
+                    'id', event.id,
+                    'item_id', event.item_id,
+                    'owner_id', event.owner_id,
+                    'op', event.op,
+                    'version_id', event.version_id
+                )::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER item_event_notify
+        AFTER INSERT OR UPDATE OR DELETE ON item
+        FOR EACH ROW EXECUTE FUNCTION item_event_notify()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER item_event_notify ON item")
+    op.execute("DROP FUNCTION item_event_notify()")
+    op.drop_index("ix_item_event_created_at", table_name="item_event")
+    op.drop_index("ix_item_event_owner_id_id", table_name="item_event")
+    op.drop_table("item_event")
@@ -0,0 +1,145 @@
+"""
+Request throughput of uvicorn with access logging off and on.
+
+Serves a minimal app with uvicorn in a separate process, logging through
+`setup_logging` to a file, directly or through the `QueueSink`, and prints
+the results as JSON::
+
+    python -m benchmarks.access_log --requests 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from typing import Any
+
+import httpx
+import orjson as json
+import uvicorn
+from fastapi import FastAPI
+
+from app.config import settings, setup_logging
+
+app = FastAPI()
+
+
+@app.get("/")
+async def root() -> dict[str, bool]:
+    """Respond with a constant body."""
+    return {"ok": True}
+
+
+async def drive(url: str, requests: int, concurrency: int) -> float:
+    """
+    Send requests from concurrent clients and measure the requests per second.
+
+    :param url:
+    :param requests:
+    :param concurrency:
+    :return:
+    """
+    remaining = iter(range(requests))
+
+    async def client(session: httpx.AsyncClient) -> None:
+        for _ in remaining:
+            (await session.get(url)).raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def serve(*, access_log: bool, enqueue: bool, port: int) -> None:
+    """
+    Serve the app, logging to a temporary file.
+
+    :param access_log:
+    :param enqueue:
+    :param port:
+    :return:
+    """
+    with tempfile.TemporaryFile("w") as log_file:
+        sys.stdout = log_file
+        setup_logging(log_level="INFO", json_logs=True, enqueue=enqueue)
+        uvicorn.run(
+            app,
+            port=port,
+            log_config=None,
+            access_log=access_log,
+            loop=settings.uvicorn_loop,
+            http=settings.uvicorn_http,
+        )
+
+
+def run(
+    *, access_log: bool, enqueue: bool, port: int, requests: int, concurrency: int
+) -> float:
+    """
+    Serve the app in a separate process and measure its throughput.
+
+    :param access_log:
+    :param enqueue:
+    :param port:
+    :param requests:
+    :param concurrency:
+    :return:
+    """
+    url = f"http://127.0.0.1:{port}/"
+    process = multiprocessing.Process(
+        target=serve,
+        kwargs={"access_log": access_log, "enqueue": enqueue, "port": port},
+    )
+    process.start()
+    try:
+        while True:
+            try:
+                httpx.get(url)
+                break
+            except httpx.TransportError:
+                time.sleep(0.05)
+        asyncio.run(drive(url, 100, concurrency))
+        return asyncio.run(drive(url, requests, concurrency))
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    results: dict[str, Any] = {}
+    for sink, enqueue in (("stdout", False), ("queue", True)):
+        for access_log in (False, True):
+            rps = run(
+                access_log=access_log,
+                enqueue=enqueue,
+                port=args.port,
+                requests=args.requests,
+                concurrency=args.concurrency,
+            )
+            results[f"{sink}_access_log_{'on' if access_log else 'off'}"] = {
+                "requests_per_second": rps
+            }
+    report = {
+        "benchmark": "access_log",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    sys.stdout.buffer.write(json.dumps(report, option=json.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Per-request bytes and CPU cost of compressing `read_items` pages.
+
+Sends pages of several sizes through `CompressionMiddleware` with each encoding
+installed, at a few levels, and prints the results as JSON::
+
+    python -m benchmarks.compression --items 10 100 1000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any
+
+import orjson as json
+from starlette.types import Message, Receive, Scope, Send
+
+from app import schemas
+from app.api.responses import ModelResponse
+from app.config import ContentEncoding
+from app.middleware.compression import (
+    COMPRESSORS,
+    DEFAULT_LEVELS,
+    CompressionMiddleware,
+)
+from benchmarks.serialization import build_page
+
+# levels tried besides the default of each encoding
+LEVELS = {
+    ContentEncoding.zstd: (1, 9),
+    ContentEncoding.br: (1, 9),
+    ContentEncoding.gzip: (1, 9),
+}
+
+
+async def measure(
+    middleware: CompressionMiddleware, accept_encoding: bytes, iterations: int
+) -> dict[str, float]:
+    """
+    Measure the bytes sent and the CPU time of one response in microseconds.
+
+    :param middleware:
+    :param accept_encoding:
+    :param iterations:
+    :return:
+    """
+    scope: Scope = {
+        "type": "http",
+        "path": "/items/",
+        "headers": [(b"accept-encoding", accept_encoding)],
+    }
+    sent = 0
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message["body"])
+
+    for _ in range(min(iterations, 100)):
+        await middleware(scope, receive, send)
+    sent = 0
+    start = time.process_time()
+    for _ in range(iterations):
+        await middleware(scope, receive, send)
+    return {
+        "bytes_per_request": sent / iterations,
+        "cpu_us_per_request": (time.process_time() - start) / iterations * 1e6,
+    }
+
+
+async def run(items: list[int], iterations: int) -> dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param items: page sizes
+    :param iterations:
+    :return:
+    """
+    item_page_response = ModelResponse(schemas.ItemPage)
+    results = []
+    for size in items:
+        response = item_page_response(build_page(size))
+
+        async def app(scope: Scope, receive: Receive, send: Send) -> None:
+            await response(scope, receive, send)  # noqa: B023
+
+        identity = await measure(
+            CompressionMiddleware(app, encodings=[], minimum_size=0, levels={}),
+            b"identity",
+            iterations,
+        )
+        encodings: dict[str, Any] = {"identity": identity}
+        for encoding in COMPRESSORS:
+            for level in sorted({DEFAULT_LEVELS[encoding], *LEVELS[encoding]}):
+                middleware = CompressionMiddleware(
+                    app,
+                    encodings=[encoding],
+                    minimum_size=0,
+                    levels={encoding: level},
+                )
+                result = await measure(middleware, encoding.value.encode(), iterations)
+                result["ratio"] = (
+                    result["bytes_per_request"] / identity["bytes_per_request"]
+                )
+                result["extra_cpu_us_per_request"] = (
+                    result["cpu_us_per_request"] - identity["cpu_us_per_request"]
+                )
+                encodings[f"{encoding.value}:{level}"] = result
+        results.append({"items": size, "encodings": encodings})
+    return {
+        "benchmark": "compression",
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    report = asyncio.run(run(items=args.items, iterations=args.iterations))
+    sys.stdout.buffer.write(json.dumps(report, option=json.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
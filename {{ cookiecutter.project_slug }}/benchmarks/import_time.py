@@ -0,0 +1,107 @@
+"""
+Import and startup time of the app, each measured in a fresh interpreter.
+
+Times importing the settings, the models and `app.main`, creating the app with
+`create_app()`, and creating it with its OpenAPI schema generated against
+read from a precomputed file, and prints the median of each as JSON::
+
+    python -m benchmarks.import_time --repeat 10
+
+Run `python -X importtime -c "import app.main"` to break an import down by module.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import orjson as json
+
+# (setup, timed statement) run in a fresh interpreter
+STAGES = {
+    "import_config": ("", "import app.config"),
+    "import_models": ("import app.config", "import app.models"),
+    "import_main": ("import app.config", "import app.main"),
+    "create_app": ("from app.main import create_app", "create_app()"),
+    "create_app_openapi_generated": (
+        "from app.main import create_app",
+        "create_app().openapi()",
+    ),
+    "create_app_openapi_precomputed": (
+        "from app.main import create_app",
+        "create_app().openapi()",
+    ),
+}
+
+CHILD = """
+import sys, time
+exec(sys.argv[1])
+start = time.perf_counter()
+exec(sys.argv[2])
+print(time.perf_counter() - start)
+"""
+
+
+def measure(setup: str, statement: str, env: dict[str, str]) -> float:
+    """
+    Time a statement in a fresh interpreter.
+
+    :param setup: run before the timer starts
+    :param statement:
+    :param env:
+    :return: seconds
+    """
+    command = [sys.executable, "-c", CHILD, setup, statement]
+    output = subprocess.run(
+        command,  # noqa: S603
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output.split()[-1])
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "LOGURU_LEVEL": "WARNING",
+        "OTEL_TRACES_EXPORTER": "none",
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, ("src", os.environ.get("PYTHONPATH")))
+        ),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        schema = Path(directory) / "openapi.json"
+        command = [sys.executable, "-m", "app.openapi", str(schema)]
+        subprocess.run(command, env=env, check=True, capture_output=True)  # noqa: S603
+        for name, (setup, statement) in STAGES.items():
+            stage_env = env
+            if name == "create_app_openapi_precomputed":
+                stage_env = {**env, "FASTAPI_OPENAPI_SCHEMA": str(schema)}
+            timings = [measure(setup, statement, stage_env) for _ in range(args.repeat)]
+            results[name] = {"median_ms": statistics.median(timings) * 1000}
+    report = {
+        "benchmark": "import_time",
+        "repeat": args.repeat,
+        "results": results,
+    }
+    sys.stdout.buffer.write(json.dumps(report, option=json.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Latency and throughput of the item endpoints of the app under concurrency.
+
+Seeds users and items in a scratch database, drives the app in process through
+its ASGI interface and prints p50/p95/p99 latencies and requests per second
+of each endpoint as JSON::
+
+    python -m benchmarks.load --users 10 --items 1000 --requests 2000
+
+The database is dropped and recreated; it defaults to a temporary SQLite file
+standing in for PostgreSQL, pass `--database-url` to use a scratch PostgreSQL
+database instead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import httpx
+import orjson as json
+from sqlalchemy import event, insert
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+@compiles(REGCONFIG, "sqlite")
+@compiles(TSVECTOR, "sqlite")
+def compile_text_search_type(*_: Any, **__: Any) -> str:
+    """
+    Store PostgreSQL text search types as text in SQLite.
+
+    :return:
+    """
+    return "TEXT"
+
+
+def create_text_search_functions(dbapi_connection: Any, _: Any) -> None:
+    """
+    Stand in for the PostgreSQL functions computing a `tsvector` in SQLite.
+
+    :param dbapi_connection:
+    :param _:
+    :return:
+    """
+    for name, function in (
+        ("to_tsvector", lambda _, text: text),
+        ("setweight", lambda vector, _: vector),
+    ):
+        dbapi_connection.create_function(name, 2, function, deterministic=True)
+
+
+async def seed(users: int, items: int) -> tuple[list[str], dict[str, list[int]]]:
+    """
+    Recreate the tables and seed users and their items.
+
+    :param users:
+    :param items:
+    :return: a token of each user, and the ids of each user's items
+    """
+    from app import models
+    from app.db.base_class import Base
+    from app.db.session import get_engine
+    from app.db.users import jwt_strategy
+
+    engine = get_engine()
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", create_text_search_functions)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    # users authenticate with tokens issued here, never with a password
+    user_rows = [
+        {
+            "id": uuid.uuid4(),
+            "email": f"user{i}@example.com",
+            "hashed_password": "!",
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }
+        for i in range(users)
+    ]
+    item_rows = [
+        {
+            "title": f"item {i}",
+            "description": "lorem ipsum dolor sit amet " * 4,
+            "owner_id": user_rows[i % users]["id"],
+        }
+        for i in range(items)
+    ]
+    async with engine.begin() as connection:
+        await connection.execute(insert(models.User), user_rows)
+        rows = await connection.execute(
+            insert(models.Item).returning(models.Item.id, models.Item.owner_id),
+            item_rows,
+        )
+    db_users = [models.User(**row) for row in user_rows]
+    item_ids: dict[uuid.UUID, list[int]] = {user.id: [] for user in db_users}
+    for id, owner_id in rows:
+        item_ids[owner_id].append(id)
+    tokens = [await jwt_strategy.write_token(user) for user in db_users]
+    return tokens, {
+        token: item_ids[user.id] for token, user in zip(tokens, db_users, strict=True)
+    }
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    """
+    Summarize the latencies of a phase.
+
+    :param latencies: seconds
+    :param elapsed: seconds
+    :return:
+    """
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p95_ms": percentiles[94] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+    }
+
+
+async def phase(
+    client: httpx.AsyncClient,
+    request: Request,
+    *,
+    requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    """
+    Send requests from concurrent clients and measure them.
+
+    :param client:
+    :param request: sends the i-th request of the phase
+    :param requests:
+    :param concurrency:
+    :return:
+    """
+    remaining = iter(range(requests))
+    latencies: list[float] = []
+
+    async def worker() -> None:
+        for i in remaining:
+            start = time.perf_counter()
+            response = await request(client, i)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def run(
+    *, users: int, items: int, requests: int, concurrency: int, seed_value: int
+) -> dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param users:
+    :param items:
+    :param requests: requests per endpoint
+    :param concurrency:
+    :param seed_value: seed of the random choice of users and items
+    :return:
+    """
+    from app.main import create_app
+
+    app = create_app()
+    tokens, item_ids = await seed(users, items)
+    rng = random.Random(seed_value)
+    created: list[tuple[str, int]] = []
+
+    def auth(token: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {token}"}
+
+    def owned_item() -> tuple[str, int]:
+        token = rng.choice([token for token in tokens if item_ids[token]])
+        return token, rng.choice(item_ids[token])
+
+    async def list_items(client: httpx.AsyncClient, _: int) -> httpx.Response:
+        return await client.get("/items/", headers=auth(rng.choice(tokens)))
+
+    async def get_item(client: httpx.AsyncClient, _: int) -> httpx.Response:
+        token, id = owned_item()
+        return await client.get(f"/items/{id}", headers=auth(token))
+
+    async def create_item(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        token = rng.choice(tokens)
+        response = await client.post(
+            "/items/", headers=auth(token), json={"title": f"created {i}"}
+        )
+        created.append((token, response.json()["id"]))
+        return response
+
+    async def update_item(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        token, id = owned_item()
+        return await client.put(
+            f"/items/{id}", headers=auth(token), json={"title": f"updated {i}"}
+        )
+
+    async def delete_item(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        token, id = created[i]
+        return await client.delete(f"/items/{id}", headers=auth(token))
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark/api/v1"
+    ) as client:
+        for name, request in (
+            ("list", list_items),
+            ("get", get_item),
+            ("create", create_item),
+            ("update", update_item),
+            ("delete", delete_item),
+        ):
+            results[name] = await phase(
+                client, request, requests=requests, concurrency=concurrency
+            )
+    return {
+        "benchmark": "load",
+        "database": app_dialect(),
+        "users": users,
+        "items": items,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seed": seed_value,
+        "results": results,
+    }
+
+
+def app_dialect() -> str:
+    """
+    Name the database dialect of the app.
+
+    :return:
+    """
+    from app.db.session import get_engine
+
+    return get_engine().dialect.name
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # settings are read when the app is imported, from here on
+        os.environ["SQLALCHEMY_DSN"] = (
+            args.database_url or f"sqlite+aiosqlite:///{directory}/load.db"
+        )
+        for name, value in (
+            ("SQLALCHEMY_ECHO", "False"),
+            ("LOGURU_LEVEL", "WARNING"),
+            ("OTEL_TRACES_EXPORTER", "none"),
+        ):
+            os.environ.setdefault(name, value)
+        report = asyncio.run(
+            run(
+                users=args.users,
+                items=args.items,
+                requests=args.requests,
+                concurrency=args.concurrency,
+                seed_value=args.seed,
+            )
+        )
+    sys.stdout.buffer.write(json.dumps(report, option=json.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-request CPU cost of serializing a `read_items` page.
+
+Compares FastAPI's `response_model` path rendered by `JSONResponse` and by
+`ORJSONResponse` with the `ModelResponse` type adapter path, and prints the
+results as JSON::
+
+    python -m benchmarks.serialization --items 100
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import orjson as json
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import models, schemas
+from app.api.responses import ModelResponse
+
+
+def build_page(size: int) -> dict[str, Any]:
+    """
+    Build a page of ORM items as returned by `read_items`.
+
+    :param size:
+    :return:
+    """
+    owner_id = uuid.uuid4()
+    return {
+        "items": [
+            models.Item(
+                id=i,
+                title=f"item {i}",
+                description="lorem ipsum dolor sit amet " * 4,
+                owner_id=owner_id,
+                version_id=1,
+            )
+            for i in range(size)
+        ],
+        "next_cursor": "WzEwMF0=",
+    }
+
+
+async def measure(render: Callable[[], Awaitable[bytes]], iterations: int) -> float:
+    """
+    Measure the CPU time of one render in microseconds.
+
+    :param render:
+    :param iterations:
+    :return:
+    """
+    for _ in range(min(iterations, 100)):
+        await render()
+    start = time.process_time()
+    for _ in range(iterations):
+        await render()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def run(items: int, iterations: int) -> dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param items:
+    :param iterations:
+    :return:
+    """
+    page = build_page(items)
+    field = create_response_field(name="Response_read_items", type_=schemas.ItemPage)
+    item_page_response = ModelResponse(schemas.ItemPage)
+
+    async def json_response() -> bytes:
+        content = await serialize_response(field=field, response_content=page)
+        return JSONResponse(content).body
+
+    async def orjson_response() -> bytes:
+        content = await serialize_response(field=field, response_content=page)
+        return ORJSONResponse(content).body
+
+    async def model_response() -> bytes:
+        return item_page_response(page).body
+
+    bodies = {await json_response(), await orjson_response(), await model_response()}
+    if len(bodies) > 1:
+        raise AssertionError("serialization paths disagree")
+
+    results = {
+        name: {"cpu_us_per_request": await measure(render, iterations)}
+        for name, render in (
+            ("json_response", json_response),
+            ("orjson_response", orjson_response),
+            ("model_response", model_response),
+        )
+    }
+    return {
+        "benchmark": "serialization",
+        "items": items,
+        "iterations": iterations,
+        "results": results,
+        "saved_cpu_us_per_request": results["json_response"]["cpu_us_per_request"]
+        - results["model_response"]["cpu_us_per_request"],
+    }
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    report = asyncio.run(run(items=args.items, iterations=args.iterations))
+    sys.stdout.buffer.write(json.dumps(report, option=json.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
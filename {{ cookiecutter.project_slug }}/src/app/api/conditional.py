@@ -0,0 +1,136 @@
+import hashlib
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi import Response
+
+from app.config import ContentEncoding
+
+
+def entity_tag(version: int) -> str:
+    """
+    Build the strong entity tag of a row at a version.
+
+    :param version:
+    :return:
+    """
+    return f'"{version}"'
+
+
+def encoded_tag(tag: str, encoding: ContentEncoding) -> str:
+    """
+    Build the tag of a representation encoded from the tagged one.
+
+    A strong tag must differ between encodings, as their bytes differ; weak
+    tags are kept.
+
+    :param tag:
+    :param encoding:
+    :return:
+    """
+    if tag.startswith("W/") or not tag.endswith('"'):
+        return tag
+    return f'{tag[:-1]}-{encoding.value}"'
+
+
+def decoded_tag(tag: str) -> str:
+    """
+    Strip the encoding added by `encoded_tag` from a tag.
+
+    :param tag:
+    :return:
+    """
+    for encoding in ContentEncoding:
+        suffix = f'-{encoding.value}"'
+        if tag.endswith(suffix):
+            return f'{tag.removesuffix(suffix)}"'
+    return tag
+
+
+def page_tag(items: Sequence[Any], next_cursor: str | None) -> str:
+    """
+    Build the weak entity tag of a page of versioned rows.
+
+    The tag changes whenever a row of the page is added, removed or updated,
+    without serializing the page.
+
+    :param items:
+    :param next_cursor:
+    :return:
+    """
+    digest = hashlib.sha256(
+        repr(([(item.id, item.version_id) for item in items], next_cursor)).encode()
+    )
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def parse_tags(header: str) -> list[str]:
+    """
+    Split a list of entity tags, as sent in `If-Match` and `If-None-Match`.
+
+    :param header:
+    :return:
+    """
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def matching_tag(header: str | None, tag: str) -> str | None:
+    """
+    Find the tag of `If-None-Match` matching the current tag, with the weak comparison.
+
+    Tags of any encoding of the current representation match.
+
+    :param header:
+    :param tag:
+    :return: the tag to answer 304 with, or None if none matches
+    """
+    if header is None:
+        return None
+    if header.strip() == "*":
+        return tag
+    opaque = tag.removeprefix("W/")
+    for other in parse_tags(header):
+        if decoded_tag(other.removeprefix("W/")) == opaque:
+            return other
+    return None
+
+
+def none_match(header: str | None, tag: str) -> bool:
+    """
+    Evaluate `If-None-Match` against the current tag, with the weak comparison.
+
+    :param header:
+    :param tag:
+    :return: whether the request is not to be answered with 304
+    """
+    return matching_tag(header, tag) is None
+
+
+def match_versions(header: str) -> list[int] | None:
+    """
+    Read the versions listed by `If-Match` as strong tags built by `entity_tag`.
+
+    Weak tags never match with the strong comparison `If-Match` requires, and
+    are left out with tags of other forms; the encoding of a tag is ignored.
+
+    :param header:
+    :return: the versions, or None for `*`, which matches any version
+    """
+    if header.strip() == "*":
+        return None
+    versions = []
+    for tag in map(decoded_tag, parse_tags(header)):
+        value = tag[1:-1] if len(tag) > 1 and tag[0] == tag[-1] == '"' else ""
+        if value.isdigit():
+            versions.append(int(value))
+    return versions
+
+
+def not_modified(tag: str) -> Response:
+    """
+    Build a 304 response.
+
+    :param tag:
+    :return:
+    """
+    return Response(status_code=304, headers={"ETag": tag})
@@ -1,22 +1,35 @@
+import hashlib
 from collections.abc import AsyncGenerator, AsyncIterator
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import async_session
+from app.config import settings
+from app.db.session import async_session, pinned
+from app.db.user_cache import CachedSQLAlchemyUserDatabase
 from app.models import User
-from src.app.models.user import OAuthAccount
+from app.models.user import OAuthAccount
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Retrieve an async database session.
 
+    The session is keyed by the request's credentials, so reads of a client that
+    wrote recently, through any worker, stay on the primary database instead of
+    a lagging replica.
+
+    :param request:
     :return:
     """
     async with async_session() as session:
+        if credentials := request.headers.get("Authorization"):
+            pin_key = hashlib.sha256(credentials.encode()).digest()
+            session.info["pin_key"] = pin_key
+            if settings.sqlalchemy_reader_dsns:
+                await pinned.load(pin_key)
         yield session
 
 
@@ -29,4 +42,4 @@ async def get_user_db(
     :param session:
     :return:
     """
-    yield SQLAlchemyUserDatabase(session, User, OAuthAccount)
+    yield CachedSQLAlchemyUserDatabase(session, User, OAuthAccount)
@@ -0,0 +1,48 @@
+from collections.abc import Mapping
+from typing import Any, Generic, TypeVar
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+T = TypeVar("T")
+
+
+class ModelResponse(Generic[T]):
+    """
+    Serialize endpoint results straight to JSON bytes.
+
+    FastAPI validates a `response_model` into Python objects, converts them to
+    JSON-compatible dicts and lists, and then encodes those. A `TypeAdapter`
+    validates once and encodes the result in pydantic-core, so returning the
+    built `Response` skips the intermediate passes. Keep `response_model` on the
+    route for the OpenAPI schema.
+    """
+
+    def __init__(self, type_: type[T]):
+        """
+        Object with a cached type adapter.
+
+        :param type_:
+        """
+        self.adapter = TypeAdapter(type_)
+
+    def __call__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+    ) -> Response:
+        """
+        Build a JSON response.
+
+        :param content: ORM objects, dicts or models valid for the type
+        :param status_code:
+        :param headers:
+        :return:
+        """
+        return Response(
+            content=self.adapter.dump_json(self.adapter.validate_python(content)),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
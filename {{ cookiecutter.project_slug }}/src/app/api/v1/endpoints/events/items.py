@@ -0,0 +1,72 @@
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app import schemas
+from app.config import settings
+from app.db.users import current_active_user
+from app.events import item_events
+
+router = APIRouter()
+
+# comments, which EventSource clients ignore: the first flushes the response
+# through buffering proxies, the others keep an idle one open
+CONNECTED = b": connected\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+def encode_event(event: schemas.ItemEvent) -> bytes:
+    """
+    Encode an event as a Server-Sent Events message.
+
+    :param event:
+    :return:
+    """
+    return (
+        f"id: {event.id}\nevent: {event.op}\ndata: {event.model_dump_json()}\n\n"
+    ).encode()
+
+
+async def event_stream(
+    owner_id: UUID | None, last_event_id: int | None
+) -> AsyncIterator[bytes]:
+    """
+    Stream the events of a subscription, with keepalives while idle.
+
+    :param owner_id:
+    :param last_event_id:
+    :return:
+    """
+    yield CONNECTED
+    async for event in item_events.subscribe(
+        owner_id=owner_id,
+        after=last_event_id,
+        keepalive=settings.events_keepalive_seconds,
+    ):
+        yield KEEPALIVE if event is None else encode_event(event)
+
+
+@router.get("/", response_class=StreamingResponse)
+async def stream_item_events(
+    *,
+    last_event_id: int | None = Header(default=None, ge=0),
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> Any:
+    """
+    Stream the creates, updates and deletes of items as Server-Sent Events.
+
+    Reconnecting clients send the `Last-Event-ID` header to receive the events
+    they missed first.
+    """
+    if not settings.events_enabled:
+        raise HTTPException(status_code=503)
+    return StreamingResponse(
+        event_stream(
+            None if current_user.is_superuser else current_user.id, last_event_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
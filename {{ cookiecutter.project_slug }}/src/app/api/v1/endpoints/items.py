@@ -1,30 +1,176 @@
+import csv
+import io
+from collections.abc import AsyncIterator, Sequence
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson as json
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement, Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, schemas
+from app import crud, models, schemas
 from app.api import deps
+from app.api.conditional import (
+    entity_tag,
+    match_versions,
+    matching_tag,
+    none_match,
+    not_modified,
+    page_tag,
+)
+from app.api.responses import ModelResponse
+from app.config import ExportFormat, settings
+from app.crud.base import BulkRowResult, InvalidCursorError, VersionMismatchError
+from app.db.session import async_session
 from app.db.users import current_active_user
 
 router = APIRouter()
 
+BatchSize = Query(
+    default=settings.sqlalchemy_bulk_batch_size,
+    ge=1,
+    le=settings.sqlalchemy_bulk_batch_size,
+)
 
-@router.get("/", response_model=list[schemas.Item])
+
+item_response = ModelResponse(schemas.Item)
+item_page_response = ModelResponse(schemas.ItemPage)
+bulk_result_response = ModelResponse(list[schemas.ItemBulkResult])
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def ndjson_chunk(rows: Sequence[Row[Any]]) -> bytes:
+    """
+    Encode rows as newline delimited JSON.
+
+    :param rows:
+    :return:
+    """
+    return b"".join(
+        json.dumps(row._asdict(), option=json.OPT_APPEND_NEWLINE) for row in rows
+    )
+
+
+def csv_chunk(rows: Sequence[Sequence[Any]]) -> str:
+    """
+    Encode rows as CSV.
+
+    :param rows:
+    :return:
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def export_chunks(
+    format: ExportFormat, where: Sequence[ColumnElement[bool]]
+) -> AsyncIterator[bytes | str]:
+    """
+    Stream encoded items as they are fetched from the database.
+
+    The stream opens its own session, which lives for the whole response.
+
+    :param format:
+    :param where:
+    :return:
+    """
+    columns = list(schemas.Item.model_fields)
+    encode = ndjson_chunk if format is ExportFormat.ndjson else csv_chunk
+    if format is ExportFormat.csv:
+        yield csv_chunk([columns])
+    async with async_session() as db:
+        async for rows in crud.item.stream(
+            db,
+            columns=columns,
+            yield_per=settings.sqlalchemy_stream_yield_per,
+            where=where,
+        ):
+            yield encode(rows)
+
+
+def bulk_response(results: Sequence[BulkRowResult[models.Item]]) -> Response:
+    """
+    Build the per-row response of a bulk action.
+
+    :param results:
+    :return:
+    """
+    return bulk_result_response(
+        [
+            {"index": result.index, "item": result.obj, "error": result.error}
+            for result in results
+        ]
+    )
+
+
+@router.get("/", response_model=schemas.ItemPage)
 async def read_items(
     db: AsyncSession = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    if_none_match: str | None = Header(default=None),
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> Any:
+    """Read a page of items, starting after the `after` cursor."""
+    try:
+        if current_user.is_superuser:
+            items, next_cursor = await crud.item.get_page(
+                db=db, after=after, limit=limit
+            )
+        else:
+            items, next_cursor = await crud.item.get_page_by_owner(
+                db=db, owner_id=current_user.id, after=after, limit=limit
+            )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400)
+    tag = page_tag(items, next_cursor)
+    if not none_match(if_none_match, tag):
+        return not_modified(tag)
+    return item_page_response(
+        {"items": items, "next_cursor": next_cursor}, headers={"ETag": tag}
+    )
+
+
+@router.get("/search", response_model=schemas.ItemPage)
+async def search_items(
+    db: AsyncSession = Depends(deps.get_db),
+    q: str = Query(min_length=1),
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
     current_user: schemas.UserRead = Depends(current_active_user),
 ) -> Any:
-    """Read items."""
-    if current_user.is_superuser:
-        items = await crud.item.get_multi(db=db, skip=skip, limit=limit)
-    else:
-        items = await crud.item.get_multi_by_owner(
-            db=db, owner_id=current_user.id, skip=skip, limit=limit
+    """Search items by title and description, most relevant first."""
+    try:
+        items, next_cursor = await crud.item.search(
+            db=db,
+            q=q,
+            after=after,
+            limit=limit,
+            where=crud.item.owned_by(current_user),
         )
-    return items
+    except InvalidCursorError:
+        raise HTTPException(status_code=400)
+    return item_page_response({"items": items, "next_cursor": next_cursor})
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_items(
+    *,
+    format: ExportFormat = ExportFormat.ndjson,
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> StreamingResponse:
+    """Export items as a stream of NDJSON lines or CSV rows."""
+    return StreamingResponse(
+        export_chunks(format, where=crud.item.owned_by(current_user)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="items.{format.value}"'},
+    )
 
 
 @router.post("/", response_model=schemas.Item)
@@ -41,22 +187,79 @@ async def create_item(
     return item
 
 
+@router.post("/bulk", response_model=list[schemas.ItemBulkResult])
+async def create_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    items_in: list[schemas.ItemCreate],
+    batch_size: int = BatchSize,
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> Any:
+    """Create items in batches."""
+    results = await crud.item.create_many_with_owner(
+        db=db, objs_in=items_in, owner_id=current_user.id, batch_size=batch_size
+    )
+    return bulk_response(results)
+
+
+@router.put("/bulk", response_model=list[schemas.ItemBulkResult])
+async def update_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    items_in: list[schemas.ItemBulkUpdate],
+    batch_size: int = BatchSize,
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> Any:
+    """Update items in batches."""
+    results = await crud.item.update_many(
+        db=db,
+        objs_in=[item_in.model_dump(exclude_unset=True) for item_in in items_in],
+        batch_size=batch_size,
+        where=crud.item.owned_by(current_user),
+    )
+    return bulk_response(results)
+
+
+@router.delete("/bulk", response_model=list[schemas.ItemBulkResult])
+async def delete_items(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    ids: list[int] = Body(),
+    batch_size: int = BatchSize,
+    current_user: schemas.UserRead = Depends(current_active_user),
+) -> Any:
+    """Delete items in batches."""
+    results = await crud.item.remove_many(
+        db=db, ids=ids, batch_size=batch_size, where=crud.item.owned_by(current_user)
+    )
+    return bulk_response(results)
+
+
 @router.put("/{id}", response_model=schemas.Item)
 async def update_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
     id: int,
     item_in: schemas.ItemUpdate,
+    if_match: str | None = Header(default=None),
     current_user: schemas.UserRead = Depends(current_active_user),
 ) -> Any:
-    """Update an item."""
-    item = await crud.item.get(db=db, id=id)
+    """Update an item, if it is still at a version listed by `If-Match`."""
+    if if_match is None and settings.fastapi_require_if_match:
+        raise HTTPException(status_code=428)
+    try:
+        item = await crud.item.update_by_id(
+            db=db,
+            id=id,
+            obj_in=item_in,
+            where=crud.item.owned_by(current_user),
+            versions=None if if_match is None else match_versions(if_match),
+        )
+    except VersionMismatchError:
+        raise HTTPException(status_code=412)
     if not item:
         raise HTTPException(status_code=404)
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400)
-    item = await crud.item.update(db=db, db_obj=item, obj_in=item_in)
-    return item
+    return item_response(item, headers={"ETag": entity_tag(item.version_id)})
 
 
 @router.get("/{id}", response_model=schemas.Item)
@@ -64,18 +267,26 @@ async def read_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
     id: int,
+    if_none_match: str | None = Header(default=None),
     current_user: schemas.UserRead = Depends(current_active_user),
 ) -> Any:
-    """Read an item."""
+    """Read an item, or answer 304 if it is at a version listed by `If-None-Match`."""
+    if if_none_match is not None:
+        version = await crud.item.get_version_for(db=db, id=id, user=current_user)
+        if version is not None and (
+            tag := matching_tag(if_none_match, entity_tag(version))
+        ):
+            # the client's tag, which names the encoding of its copy
+            return not_modified(tag)
     item = await crud.item.get(db=db, id=id)
     if not item:
         raise HTTPException(status_code=404)
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400)
-    return item
+    return item_response(item, headers={"ETag": entity_tag(item.version_id)})
 
 
-@router.get("/{id}", response_model=schemas.Item)
+@router.delete("/{id}", response_model=schemas.Item)
 async def delete_item(
     *,
     db: AsyncSession = Depends(deps.get_db),
@@ -83,10 +294,7 @@ async def delete_item(
     current_user: schemas.UserRead = Depends(current_active_user),
 ) -> Any:
     """Delete an item."""
-    item = await crud.item.get(db=db, id=id)
+    item = await crud.item.remove(db=db, id=id, where=crud.item.owned_by(current_user))
     if not item:
         raise HTTPException(status_code=404)
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400)
-    item = await crud.item.remove(db=db, id=id)
     return item
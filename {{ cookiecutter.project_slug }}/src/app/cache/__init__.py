@@ -0,0 +1,4 @@
+from .entity import EntityCache as EntityCache  # noqa: F401
+from .invalidation import InvalidationBus as InvalidationBus  # noqa: F401
+from .lru import LRUCache as LRUCache  # noqa: F401
+from .singleflight import SingleFlight as SingleFlight  # noqa: F401
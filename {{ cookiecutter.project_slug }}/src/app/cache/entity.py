@@ -0,0 +1,124 @@
+import logging
+from typing import Any
+
+from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.cache.invalidation import InvalidationBus
+from app.cache.lru import LRUCache
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class EntityCache:
+    """
+    Two-tier cache of database rows keyed by primary key.
+
+    Rows are held as dicts of a schema's fields: in a per-worker LRU (L1) and
+    as JSON in Redis (L2). Invalidations delete the Redis entry and are
+    published on the `InvalidationBus` so every worker drops its L1 entry.
+    Redis failures, and Redis entries no longer valid for the schema, degrade
+    to cache misses.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        schema: type[BaseModel],
+        *,
+        redis: Redis,
+        bus: InvalidationBus,
+        ttl: int,
+        l1_maxsize: int,
+        l1_ttl: int,
+    ):
+        """
+        Object with an empty L1 registered on the invalidation bus.
+
+        :param namespace: prefix of the Redis keys and invalidation messages
+        :param schema: fields to cache, validated from the ORM object
+        :param redis:
+        :param bus:
+        :param ttl: seconds an entry lives in Redis
+        :param l1_maxsize:
+        :param l1_ttl: seconds an entry lives in-process
+        """
+        self.namespace = namespace
+        self.schema = schema
+        self.redis = redis
+        self.bus = bus
+        self.ttl = ttl
+        self.l1: LRUCache[str, dict[str, Any]] = LRUCache(l1_maxsize, ttl=l1_ttl)
+        bus.register(namespace, self.l1)
+
+    async def get(self, key: Any) -> dict[str, Any] | None:
+        """
+        Retrieve a row from L1, falling back to Redis.
+
+        :param key:
+        :return:
+        """
+        key = str(key)
+        if (row := self.l1.get(key)) is not None:
+            CACHE_REQUESTS.labels(self.namespace, "l1", "hit").inc()
+            return row
+        CACHE_REQUESTS.labels(self.namespace, "l1", "miss").inc()
+        try:
+            raw = await self.redis.get(self._name(key))
+        except RedisError:
+            logger.warning(f"Failed to read {self._name(key)} from Redis.")
+            raw = None
+        model = None
+        if raw is not None:
+            try:
+                model = self.schema.model_validate_json(raw)
+            except ValidationError:
+                logger.warning(f"Discarded invalid {self._name(key)} from Redis.")
+        if model is None:
+            CACHE_REQUESTS.labels(self.namespace, "l2", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels(self.namespace, "l2", "hit").inc()
+        row = model.model_dump()
+        self.l1.set(key, row)
+        return row
+
+    async def set(self, key: Any, obj: Any) -> None:
+        """
+        Store a row in both tiers.
+
+        :param key:
+        :param obj: ORM object or mapping with the schema's fields
+        :return:
+        """
+        key = str(key)
+        model = self.schema.model_validate(obj, from_attributes=True)
+        self.l1.set(key, model.model_dump())
+        try:
+            await self.redis.set(self._name(key), model.model_dump_json(), ex=self.ttl)
+        except RedisError:
+            logger.warning(f"Failed to write {self._name(key)} to Redis.")
+
+    async def invalidate(self, key: Any) -> None:
+        """
+        Remove a row from Redis and from L1 in every worker.
+
+        :param key:
+        :return:
+        """
+        key = str(key)
+        try:
+            await self.redis.delete(self._name(key))
+        except RedisError:
+            logger.warning(f"Failed to delete {self._name(key)} from Redis.")
+        await self.bus.publish(self.namespace, key)
+
+    def _name(self, key: str) -> str:
+        """
+        Build the Redis key of a row.
+
+        :param key:
+        :return:
+        """
+        return f"{self.namespace}:{key}"
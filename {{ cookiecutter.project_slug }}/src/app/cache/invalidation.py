@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.cache.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    Evict in-process cache entries in every worker through Redis pub/sub.
+
+    Messages are `<namespace>:<key>` strings published on one channel; each
+    worker runs `listen` and pops the key from the cache registered for the
+    namespace.
+    """
+
+    def __init__(self, redis: Redis, channel: str):
+        """
+        Object with no registered caches.
+
+        :param redis:
+        :param channel:
+        """
+        self.redis = redis
+        self.channel = channel
+        self._caches: dict[str, LRUCache[Any, Any]] = {}
+
+    def register(self, namespace: str, cache: LRUCache[Any, Any]) -> None:
+        """
+        Register the in-process cache of a namespace.
+
+        :param namespace:
+        :param cache:
+        :return:
+        """
+        self._caches[namespace] = cache
+
+    async def publish(self, namespace: str, key: str) -> None:
+        """
+        Evict a key locally and in every other worker.
+
+        :param namespace:
+        :param key:
+        :return:
+        """
+        self._evict(namespace, key)
+        try:
+            await self.redis.publish(self.channel, f"{namespace}:{key}")
+        except RedisError:
+            logger.warning(f"Failed to publish invalidation of {namespace}:{key}.")
+
+    async def listen(self, reconnect_delay: float = 1.0) -> None:
+        """
+        Apply invalidations published by other workers until cancelled.
+
+        Messages published while disconnected are lost, so every registered
+        cache is cleared when the subscription is (re)established.
+
+        :param reconnect_delay:
+        :return:
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    for cache in self._caches.values():
+                        cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            namespace, _, key = message["data"].decode().partition(":")
+                            self._evict(namespace, key)
+            except RedisError:
+                logger.warning(f"Lost subscription to {self.channel}, reconnecting.")
+                await asyncio.sleep(reconnect_delay)
+
+    def _evict(self, namespace: str, key: str) -> None:
+        """
+        Evict a key from the cache registered for a namespace.
+
+        :param namespace:
+        :param key:
+        :return:
+        """
+        if cache := self._caches.get(namespace):
+            cache.pop(key)
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class LRUCache(Generic[KeyType, ValueType]):
+    """
+    Bounded least recently used cache with expiring entries.
+
+    Not thread-safe; each event loop owns its caches.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        """
+        Object with an empty cache.
+
+        :param maxsize: entries kept before the least recently used is evicted
+        :param ttl: default seconds an entry lives, `None` to keep it until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[KeyType, tuple[ValueType, float | None]] = OrderedDict()
+
+    def get(self, key: KeyType) -> ValueType | None:
+        """
+        Retrieve a live entry and mark it as recently used.
+
+        :param key:
+        :return:
+        """
+        try:
+            value, expires_at = self._data[key]
+        except KeyError:
+            return None
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: KeyType, value: ValueType, ttl: float | None = None) -> None:
+        """
+        Store an entry, evicting the least recently used one when full.
+
+        :param key:
+        :param value:
+        :param ttl: seconds the entry lives, overriding the default
+        :return:
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: KeyType) -> None:
+        """
+        Remove an entry if it exists.
+
+        :param key:
+        :return:
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove every entry.
+
+        :return:
+        """
+        self._data.clear()
+
+    def __contains__(self, key: KeyType) -> bool:
+        """
+        Check for a live entry.
+
+        :param key:
+        :return:
+        """
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        """
+        Count the stored entries, including expired ones not yet evicted.
+
+        :return:
+        """
+        return len(self._data)
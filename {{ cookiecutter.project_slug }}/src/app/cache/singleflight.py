@@ -0,0 +1,57 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class SingleFlight(Generic[KeyType, ValueType]):
+    """
+    Share one in-flight call per key among the callers awaiting it at once.
+
+    The first caller of a key runs the call; callers arriving before it returns
+    receive its result or exception instead of running their own. If the first
+    caller is cancelled, the others run the call themselves. Not thread-safe;
+    each event loop owns its flights.
+    """
+
+    def __init__(self) -> None:
+        """Object with no calls in flight."""
+        self._flights: dict[KeyType, asyncio.Future[ValueType]] = {}
+
+    async def do(
+        self, key: KeyType, call: Callable[[], Awaitable[ValueType]]
+    ) -> tuple[ValueType, bool]:
+        """
+        Run a call, or join the one in flight for the key.
+
+        :param key:
+        :param call:
+        :return: the result, and whether it was shared from another caller
+        """
+        if (future := self._flights.get(key)) is not None:
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            return await call(), False
+
+        future = asyncio.get_running_loop().create_future()
+        # the outcome is retrieved even when no other caller joins
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._flights[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._flights[key]
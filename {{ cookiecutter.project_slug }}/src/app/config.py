@@ -1,13 +1,30 @@
 import logging
+import os
+import queue
 import secrets
 import sys
+import threading
+import traceback
 from enum import Enum
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, BinaryIO, ClassVar, Literal
 
+import orjson as json
 from loguru import logger
-from pydantic import AnyHttpUrl, Field, PostgresDsn, ValidationInfo, field_validator
+from pydantic import (
+    AnyHttpUrl,
+    Field,
+    PostgresDsn,
+    RedisDsn,
+    ValidationInfo,
+    field_validator,
+)
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.metrics import LOG_RECORDS_DROPPED
+
+if TYPE_CHECKING:
+    from loguru import Message, Record
+
 
 class APIPrefix(str, Enum):
     """API prefixes."""
@@ -16,6 +33,7 @@ class APIPrefix(str, Enum):
     auth = "/auth"
     users = "/users"
     items = "/items"
+    events = "/events"
 
 
 class APITags(str, Enum):
@@ -24,6 +42,30 @@ class APITags(str, Enum):
     auth = "auth"
     users = "users"
     items = "items"
+    events = "events"
+
+
+class ExportFormat(str, Enum):
+    """Export formats."""
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ContentEncoding(str, Enum):
+    """Response content encodings."""
+
+    zstd = "zstd"
+    br = "br"
+    gzip = "gzip"
+
+
+class RequestPriority(str, Enum):
+    """Request priority classes of admission control."""
+
+    auth = "auth"
+    write = "write"
+    read = "read"
 
 
 class DatabaseScheme(str, Enum):
@@ -48,11 +90,33 @@ class Settings(BaseSettings):
     uvicorn_backlog: int
     uvicorn_timeout_keep_alive: int
     uvicorn_timeout_graceful_shutdown: int
+    server_gc_freeze: bool
+    server_memory_report_interval: float
     fastapi_debug: bool
     fastapi_title: str
     fastapi_description: str
     fastapi_secret_key: str = Field(default=secrets.token_urlsafe(32))
     fastapi_access_token_expire_minutes: int
+    fastapi_orjson_response: bool
+    fastapi_server_timing: bool
+    fastapi_openapi_schema: str
+    fastapi_require_if_match: bool
+    fastapi_compression_encodings: list[ContentEncoding]
+    fastapi_compression_minimum_size: int
+    fastapi_compression_levels: dict[ContentEncoding, int]
+    fastapi_compression_excluded_handlers: list[str]
+    fastapi_admission_initial_limit: int
+    fastapi_admission_min_limit: int
+    fastapi_admission_max_limit: int
+    fastapi_admission_latency_target: float
+    fastapi_admission_pool_wait_target: float
+    fastapi_admission_backoff: float
+    fastapi_admission_priorities: dict[RequestPriority, float]
+    fastapi_admission_retry_after: int
+    fastapi_admission_excluded_handlers: list[str]
+    fastapi_users_cache_maxsize: int
+    fastapi_users_cache_ttl: int
+    fastapi_jwt_cache_maxsize: int
     oauth_name: str
     oauth_client_id: str
     oauth_client_secret: str
@@ -73,6 +137,8 @@ class Settings(BaseSettings):
     sqlalchemy_pool_recycle: int
     sqlalchemy_pool_timeout: int
     sqlalchemy_insertmanyvalues_page_size: int
+    sqlalchemy_bulk_batch_size: int
+    sqlalchemy_stream_yield_per: int
     sqlalchemy_scheme: str
     sqlalchemy_username: str
     sqlalchemy_password: str
@@ -80,9 +146,45 @@ class Settings(BaseSettings):
     sqlalchemy_port: int
     sqlalchemy_path: str
     sqlalchemy_dsn: PostgresDsn | str | None = Field(None)
+    sqlalchemy_reader_dsns: list[str]
+    sqlalchemy_read_your_writes_seconds: int
+    sqlalchemy_read_your_writes_maxsize: int
+    sqlalchemy_n_plus_one_threshold: int
+    sqlalchemy_coalesce_reads: bool
+    sqlalchemy_batch_reads: bool
+    sqlalchemy_batch_max_size: int
+    sqlalchemy_batch_wait: float
+    sqlalchemy_pool_advisor_interval: int
+    redis_scheme: str
+    redis_host: str
+    redis_port: int
+    redis_path: str
+    redis_dsn: RedisDsn | str | None = Field(None)
+    cache_enabled: bool
+    cache_ttl: int
+    cache_l1_maxsize: int
+    cache_l1_ttl: int
+    cache_invalidation_channel: str
+    events_enabled: bool
+    events_buffer_size: int
+    events_queue_maxsize: int
+    events_keepalive_seconds: float
+    events_retention_seconds: int
+    jobs_concurrency: int
+    jobs_poll_interval: float
+    jobs_timeout_seconds: float
+    jobs_lease_margin_seconds: float
+    jobs_max_attempts: int
+    jobs_backoff_seconds: float
+    jobs_backoff_max_seconds: float
+    jobs_metrics_port: int
     loguru_format: str
     loguru_level: str
     loguru_serialize: bool
+    loguru_enqueue: bool
+    loguru_queue_maxsize: int
+    loguru_queue_batch_size: int
+    loguru_queue_overflow: Literal["drop", "block"]
     prometheus_instrumentator_should_group_status_codes: bool
     prometheus_instrumentator_should_ignore_untemplated: bool
     prometheus_instrumentator_should_respect_env_var: bool
@@ -94,11 +196,15 @@ class Settings(BaseSettings):
     prometheus_instrumentator_inprogress_labels: bool
     prometheus_instrumentator_include_in_schema: bool
     prometheus_instrumentator_should_gzip: bool
+    prometheus_metrics_cache_seconds: float
     otel_service_name: str
     otel_metrics_exporter: str
     otel_traces_exporter: str
     otel_logs_exporter: str
     otel_exporter_otlp_traces_endpoint: str
+    otel_tail_sampling_latency_ms: int
+    otel_tail_sampling_ratio: float
+    otel_tail_sampling_max_traces: int
     otel_instrumentation_http_capture_headers_server_request: str
     otel_instrumentation_http_capture_headers_server_response: str
 
@@ -126,6 +232,26 @@ class Settings(BaseSettings):
             path=info.data["sqlalchemy_path"],
         )
 
+    @field_validator("redis_dsn", mode="before")
+    @classmethod
+    def build_redis_dsn(cls, v: str | None, info: ValidationInfo) -> str | RedisDsn:
+        """
+        Build Redis' DSN.
+
+        :param v:
+        :param info:
+        :return:
+        """
+        if isinstance(v, str):
+            return v
+
+        return RedisDsn.build(
+            scheme=info.data["redis_scheme"],
+            host=info.data["redis_host"],
+            port=info.data["redis_port"],
+            path=info.data["redis_path"],
+        )
+
     @field_validator("uvicorn_log_config", mode="before")
     @classmethod
     def build_uvicorn_logging_config(
@@ -166,10 +292,29 @@ class Settings(BaseSettings):
         }
 
 
+def intercepted_caller(record: "Record") -> None:
+    """
+    Attribute an intercepted record to the caller the standard library found.
+
+    :param record:
+    :return:
+    """
+    stdlib_record = record["extra"].pop("stdlib_record")
+    record["name"] = stdlib_record.name
+    record["function"] = stdlib_record.funcName
+    record["line"] = stdlib_record.lineno
+
+
+intercepted_logger = logger.patch(intercepted_caller)
+
+
 class InterceptHandler(logging.Handler):
     """
     Default handler from examples in loguru docs.
 
+    The caller is taken from the fields of the standard library record rather
+    than found by walking the stack.
+
     see: https://loguru.readthedocs.io/en/stable/overview.html#entirely-compatible-with-standard-logging
     """
 
@@ -186,27 +331,212 @@ class InterceptHandler(logging.Handler):
         except ValueError:
             level = str(record.levelno)
 
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            if frame.f_back is None:
-                # todo: mypy - define behavior when f_back=None
-                ...
-            else:
-                frame = frame.f_back
-            depth += 1
-
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage()
+        log = intercepted_logger
+        if record.exc_info:
+            log = log.opt(exception=record.exc_info)
+        # the message is passed as an argument, so braces in it are not formatted
+        log.log(level, "{}", record.getMessage(), stdlib_record=record)
+
+
+def serialize_record(record: "Record") -> bytes:
+    """
+    Serialize a loguru record into a JSON line.
+
+    :param record:
+    :return:
+    """
+    exception = record["exception"]
+    return json.dumps(
+        {
+            "time": record["time"],
+            "level": record["level"].name,
+            "message": record["message"],
+            "name": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "extra": record["extra"],
+            "exception": "".join(traceback.format_exception(*exception))
+            if exception
+            else None,
+        },
+        default=str,
+        option=json.OPT_APPEND_NEWLINE,
+    )
+
+
+class QueueSink:
+    """
+    Loguru sink that hands messages to a thread writing them in batches.
+
+    Logging calls only enqueue the message; serialization and writes happen on
+    the writer thread, one write and flush per batch. When the queue is full, a
+    message is dropped and counted, or with `block` the caller waits for room.
+    A batch that fails to write is reported to stderr and dropped; once the
+    stream is closed, every message is dropped.
+    A forked child gets a queue and writer thread of its own for the current
+    sink, the last one created and not stopped.
+    """
+
+    current: ClassVar["QueueSink | None"] = None
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        *,
+        maxsize: int,
+        batch_size: int,
+        block: bool,
+        serialize: bool,
+    ):
+        """
+        Object with a bounded queue and its writer thread.
+
+        :param stream:
+        :param maxsize:
+        :param batch_size:
+        :param block: wait for room instead of dropping messages
+        :param serialize: write records as JSON lines
+        """
+        self.stream = stream
+        self.batch_size = batch_size
+        self.block = block
+        self.serialize = serialize
+        self.dropped = 0
+        self.closed = False
+        self._maxsize = maxsize
+        self._start()
+        QueueSink.current = self
+
+    def _start(self) -> None:
+        """
+        Create the queue and start the writer thread.
+
+        :return:
+        """
+        self._queue: queue.Queue[Any] = queue.Queue(self._maxsize)
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
         )
+        self._thread.start()
+
+    def write(self, message: "Message") -> None:
+        """
+        Enqueue a message.
+
+        :param message:
+        :return:
+        """
+        if self.closed:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+            return
+        item = message.record if self.serialize else str(message)
+        if self.block:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    def stop(self) -> None:
+        """
+        Write the queued messages and stop the writer thread.
+
+        :return:
+        """
+        if QueueSink.current is self:
+            QueueSink.current = None
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        Write batches of queued messages until stopped.
+
+        :return:
+        """
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if self.stream.closed:
+                # consumed and dropped until stopped, so `stop` finds room
+                if not self.closed:
+                    self.closed = True
+                    self._report("Log stream closed, dropping records.\n")
+                self.dropped += len(batch)
+                LOG_RECORDS_DROPPED.inc(len(batch))
+            elif batch:
+                try:
+                    self.stream.write(
+                        b"".join(
+                            serialize_record(item) if self.serialize else item.encode()
+                            for item in batch
+                        )
+                    )
+                    self.stream.flush()
+                except Exception:
+                    # the writer outlives a failed batch, or later logging calls
+                    # would fill the queue and drop or block
+                    self._report(
+                        f"Failed to write {len(batch)} log records:\n"
+                        f"{traceback.format_exc()}"
+                    )
+            if stop:
+                return
+
+    @staticmethod
+    def _report(message: str) -> None:
+        """
+        Print an error of the writer thread to the original stderr.
+
+        :param message:
+        :return:
+        """
+        if sys.__stderr__ is not None:
+            sys.__stderr__.write(message)
+            sys.__stderr__.flush()
+
+
+def restart_queue_sink() -> None:
+    """
+    Start a writer thread for the current `QueueSink` in a forked child.
+
+    :return:
+    """
+    if QueueSink.current is not None:
+        QueueSink.current._start()
+
+
+os.register_at_fork(after_in_child=restart_queue_sink)
+
+
+def flush_logging() -> None:
+    """
+    Write the queued log records, before exiting without the atexit handlers.
+
+    Removing the handlers stops them, and a `QueueSink` joins its writer thread.
+
+    :return:
+    """
+    logger.remove()
 
 
-def setup_logging(log_level: str, json_logs: bool) -> None:
+def setup_logging(log_level: str, json_logs: bool, enqueue: bool = False) -> None:
     """
     Configure logging using loguru.
 
     :param log_level:
     :param json_logs:
+    :param enqueue: write through a `QueueSink` instead of directly to stdout
     :return:
     """
     logging.root.handlers = [InterceptHandler()]
@@ -216,7 +546,21 @@ def setup_logging(log_level: str, json_logs: bool) -> None:
         logging.getLogger(name=name).handlers = []
         logging.getLogger(name=name).propagate = True
 
-    logger.configure(handlers=[{"sink": sys.stdout, "serialize": json_logs}])
+    if not enqueue:
+        logger.configure(handlers=[{"sink": sys.stdout, "serialize": json_logs}])
+        return
+    sink = QueueSink(
+        sys.stdout.buffer,
+        maxsize=settings.loguru_queue_maxsize,
+        batch_size=settings.loguru_queue_batch_size,
+        block=settings.loguru_queue_overflow == "block",
+        serialize=json_logs,
+    )
+    # the record is serialized by the sink, so the message needs no formatting
+    handler: dict[str, Any] = {"sink": sink, "colorize": False}
+    if json_logs:
+        handler["format"] = "{message}"
+    logger.configure(handlers=[handler])
 
 
 settings = Settings()
@@ -1 +1,3 @@
 from .crud_item import item as item  # noqa: F401
+from .crud_item_event import item_event as item_event  # noqa: F401
+from .crud_job import job as job  # noqa: F401
@@ -1,39 +1,241 @@
-from collections.abc import Sequence
+import base64
+from collections.abc import AsyncIterator, Callable, Collection, Iterable, Sequence
+from dataclasses import dataclass
 from typing import Any, Generic, TypeVar
 
-from fastapi.encoders import jsonable_encoder
+import orjson as json
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Row, delete, insert, inspect, select, update
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from src.app.db.base_class import Base
+from app.cache import EntityCache, SingleFlight
+from app.crud.loader import BatchLoader
+from app.db.base_class import Base
+from app.db.session import async_session, reads_primary, reads_replica
+from app.metrics import CRUD_READS
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class VersionMismatchError(ValueError):
+    """Raised when a row exists but not at any of the expected versions."""
+
+
+@dataclass
+class BulkRowResult(Generic[ModelType]):
+    """Outcome of one row of a bulk action, in input order."""
+
+    index: int
+    obj: ModelType | None = None
+    error: str | None = None
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode keyset values into an opaque pagination cursor.
+
+    :param values:
+    :return:
+    """
+    return base64.urlsafe_b64encode(json.dumps(values)).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """
+    Decode an opaque pagination cursor into its keyset values.
+
+    :param cursor:
+    :param size:
+    :return:
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise InvalidCursorError(cursor) from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(cursor)
+    return values
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Base create, read, update, and delete actions."""
 
-    def __init__(self, model: type[ModelType]):
+    def __init__(
+        self,
+        model: type[ModelType],
+        *,
+        cache: EntityCache | None = None,
+        coalesce: bool = False,
+        batch_size: int | None = None,
+        batch_wait: float = 0.0,
+        session: Callable[[], AsyncSession] = async_session,
+    ):
         """
         Object with default database actions.
 
         :param model:
+        :param cache: cache of rows read by `get` from the primary, invalidated by
+            writes
+        :param coalesce: share the query of concurrent `get` calls for a row
+        :param batch_size: most rows of concurrent `get` calls loaded in one
+            query, or None to query each row on its own
+        :param batch_wait: seconds to collect a batch, or 0 for one loop tick
+        :param session: factory of the sessions loading batches, which check out
+            a connection of their own
         """
         self.model = model
+        self.cache = cache
+        self.session = session
+        self.flights: SingleFlight[Any, dict[str, Any] | None] | None = (
+            SingleFlight() if coalesce else None
+        )
+        self.loader: BatchLoader[Any, dict[str, Any]] | None = (
+            BatchLoader(
+                self._load_many,
+                name=model.__name__,
+                max_batch_size=batch_size,
+                wait=batch_wait,
+            )
+            if batch_size
+            else None
+        )
 
     async def get(self, db: AsyncSession, id: Any) -> ModelType | None:
         """
         Retrieve a row.
 
+        Unless the session has written, a read may be shared: with coalescing
+        it joins the query of a concurrent `get` for the same row, and with
+        batching the rows of concurrent `get` calls are loaded in one query, on
+        a session of its own. Shared rows are copied into the caller's session.
+        Batching only applies to a session holding no connection, as callers
+        each holding one while waiting on another could exhaust the pool.
+
+        :param db:
+        :param id:
+        :return:
+        """
+        if self.cache is not None and (row := await self.cache.get(id)) is not None:
+            return await self._merge(db, row)
+        batch = self.loader is not None and not db.in_transaction()
+        if (self.flights is None and not batch) or reads_primary(db):
+            return await self._load(db, id)
+
+        db_obj = None
+
+        async def load() -> dict[str, Any] | None:
+            nonlocal db_obj
+            if batch and self.loader is not None:
+                return await self.loader.load(id)
+            db_obj = await self._load(db, id)
+            return None if db_obj is None else self._row(db_obj)
+
+        if self.flights is None:
+            row, shared = await load(), False
+        else:
+            row, shared = await self.flights.do(id, load)
+        result = "coalesced" if shared else "batched" if batch else "queried"
+        CRUD_READS.labels(model=self.model.__name__, result=result).inc()
+        if db_obj is not None or row is None:
+            return db_obj
+        return await self._merge(db, row)
+
+    async def _load_many(self, ids: Sequence[Any]) -> dict[Any, dict[str, Any]]:
+        """
+        Query rows in one statement on a session of their own, and cache them.
+
+        Rows read from a replica are not cached.
+
+        :param ids:
+        :return: copies of the rows found, by primary key
+        """
+        async with self.session() as db:
+            result = await db.execute(select(self.model).where(self.model.id.in_(ids)))
+            db_objs = result.unique().scalars().all()
+            if self.cache is not None and not reads_replica(db):
+                for db_obj in db_objs:
+                    await self.cache.set(db_obj.id, db_obj)
+            return {db_obj.id: self._row(db_obj) for db_obj in db_objs}
+
+    async def _load(self, db: AsyncSession, id: Any) -> ModelType | None:
+        """
+        Query a row, and cache it unless read from a replica.
+
         :param db:
         :param id:
         :return:
         """
         result = await db.execute(select(self.model).where(self.model.id == id))
-        return result.unique().scalar_one_or_none()
+        db_obj = result.unique().scalar_one_or_none()
+        if self.cache is not None and db_obj is not None and not reads_replica(db):
+            await self.cache.set(id, db_obj)
+        return db_obj
+
+    @staticmethod
+    def _row(db_obj: ModelType) -> dict[str, Any]:
+        """
+        Copy the loaded column values of a row.
+
+        :param db_obj:
+        :return:
+        """
+        state = inspect(db_obj)
+        return {
+            attr.key: state.dict[attr.key]
+            for attr in state.mapper.column_attrs
+            if attr.key in state.dict
+        }
+
+    async def get_version(
+        self,
+        db: AsyncSession,
+        *,
+        id: Any,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> int | None:
+        """
+        Retrieve the version of a row by selecting its version column alone.
+
+        :param db:
+        :param id:
+        :param where: additional filter criteria, rows outside it are not found
+        :return: the version, or None if no row matched or the model is unversioned
+        """
+        version_col = inspect(self.model).version_id_col
+        if version_col is None:
+            return None
+        return await db.scalar(select(version_col).where(self.model.id == id, *where))
+
+    async def _merge(self, db: AsyncSession, row: dict[str, Any]) -> ModelType:
+        """
+        Attach a cached row to the session as a persistent object without loading it.
+
+        :param db:
+        :param row:
+        :return:
+        """
+        db_obj = self.model(**row)
+        make_transient_to_detached(db_obj)
+        return await db.merge(db_obj, load=False)
+
+    async def _invalidate(self, ids: Iterable[Any]) -> None:
+        """
+        Drop written rows from the cache.
+
+        :param ids:
+        :return:
+        """
+        if self.cache is not None:
+            for id in ids:
+                await self.cache.invalidate(id)
 
     async def get_multi(
         self, db: AsyncSession, *, skip: int = 0, limit: int = 100
@@ -49,6 +251,71 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         result = await db.execute(select(self.model).offset(skip).limit(limit))
         return result.scalars().all()
 
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        after: str | None = None,
+        limit: int = 100,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> tuple[Sequence[ModelType], str | None]:
+        """
+        Retrieve a page of rows ordered by primary key.
+
+        Pages are addressed by the last seen primary key rather than an offset,
+        so the database seeks straight to the page through the index.
+
+        :param db:
+        :param after: cursor returned with the previous page
+        :param limit:
+        :param where: additional filter criteria
+        :return: the rows and the cursor of the next page, if any
+        """
+        statement = (
+            select(self.model).where(*where).order_by(self.model.id).limit(limit + 1)
+        )
+        if after is not None:
+            (last_id,) = decode_cursor(after, size=1)
+            try:
+                last_id = inspect(self.model).primary_key[0].type.python_type(last_id)
+            except (TypeError, ValueError) as e:
+                raise InvalidCursorError(after) from e
+            statement = statement.where(self.model.id > last_id)
+        result = await db.execute(statement)
+        rows = result.scalars().all()
+        if len(rows) > limit:
+            return rows[:limit], encode_cursor(rows[limit - 1].id)
+        return rows, None
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Sequence[str],
+        yield_per: int,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> AsyncIterator[Sequence[Row[Any]]]:
+        """
+        Stream columns of rows in primary key order through a server-side cursor.
+
+        Rows are fetched and yielded `yield_per` at a time, so memory use does
+        not grow with the number of rows.
+
+        :param db:
+        :param columns:
+        :param yield_per:
+        :param where: additional filter criteria
+        :return:
+        """
+        result = await db.stream(
+            select(*(getattr(self.model, column) for column in columns))
+            .where(*where)
+            .order_by(self.model.id)
+            .execution_options(yield_per=yield_per)
+        )
+        async for partition in result.partitions():
+            yield partition
+
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         """
         Create a row.
@@ -57,13 +324,207 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         :param obj_in:
         :return:
         """
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)
-        db.add(db_obj)
+        return await self._create(db, values=obj_in.model_dump())
+
+    async def _create(self, db: AsyncSession, *, values: dict[str, Any]) -> ModelType:
+        """
+        Create a row with one INSERT ... RETURNING.
+
+        :param db:
+        :param values:
+        :return:
+        """
+        db_obj = await db.scalar(
+            insert(self.model).values(values).returning(self.model)
+        )
         await db.commit()
-        await db.refresh(db_obj)
         return db_obj
 
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[CreateSchemaType],
+        batch_size: int,
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Create rows in batches.
+
+        :param db:
+        :param objs_in:
+        :param batch_size:
+        :return:
+        """
+        return await self._create_many(
+            db, rows=[obj_in.model_dump() for obj_in in objs_in], batch_size=batch_size
+        )
+
+    async def _create_many(
+        self, db: AsyncSession, *, rows: Sequence[dict[str, Any]], batch_size: int
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Create rows in batches of one multi-row INSERT and one commit each.
+
+        A failed batch is rolled back as a whole and reported on each of its rows.
+
+        :param db:
+        :param rows:
+        :param batch_size:
+        :return:
+        """
+        statement = insert(self.model).returning(
+            self.model, sort_by_parameter_order=True
+        )
+        results: list[BulkRowResult[ModelType]] = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            try:
+                db_objs = (await db.scalars(statement, batch)).all()
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                results += self._failed(start, len(batch), e)
+                continue
+            self._detach(db, db_objs)
+            results += [
+                BulkRowResult(index=start + i, obj=db_obj)
+                for i, db_obj in enumerate(db_objs)
+            ]
+        return results
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[dict[str, Any]],
+        batch_size: int,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Update rows by primary key in batches.
+
+        Each batch locks its rows with one SELECT ... FOR UPDATE, which reads
+        them from the primary, and flushes the changes as executemany UPDATEs
+        in one commit.
+
+        :param db:
+        :param objs_in: changed fields of each row, including its `id`
+        :param batch_size:
+        :param where: additional filter criteria, rows outside it are not found
+        :return:
+        """
+        results: list[BulkRowResult[ModelType]] = []
+        for start in range(0, len(objs_in), batch_size):
+            batch = objs_in[start : start + batch_size]
+            try:
+                # locked reads are routed to the primary: a replica's stale
+                # version would fail the flush
+                result = await db.scalars(
+                    select(self.model)
+                    .where(self.model.id.in_({row["id"] for row in batch}), *where)
+                    .with_for_update(of=self.model)
+                )
+                db_objs = {db_obj.id: db_obj for db_obj in result.unique()}
+                for row in batch:
+                    if db_obj := db_objs.get(row["id"]):
+                        for field, value in row.items():
+                            setattr(db_obj, field, value)
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                results += self._failed(start, len(batch), e)
+                continue
+            self._detach(db, db_objs.values())
+            await self._invalidate(db_objs)
+            results += self._matched(start, batch, db_objs)
+        return results
+
+    async def remove_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        batch_size: int,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Remove rows by primary key in batches of one DELETE and one commit each.
+
+        :param db:
+        :param ids:
+        :param batch_size:
+        :param where: additional filter criteria, rows outside it are not found
+        :return:
+        """
+        results: list[BulkRowResult[ModelType]] = []
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            try:
+                result = await db.scalars(
+                    delete(self.model)
+                    .where(self.model.id.in_(set(batch)), *where)
+                    .returning(self.model)
+                )
+                db_objs = {db_obj.id: db_obj for db_obj in result.all()}
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                results += self._failed(start, len(batch), e)
+                continue
+            self._detach(db, db_objs.values())
+            await self._invalidate(db_objs)
+            results += self._matched(start, [{"id": id} for id in batch], db_objs)
+        return results
+
+    @staticmethod
+    def _detach(db: AsyncSession, db_objs: Iterable[ModelType]) -> None:
+        """
+        Detach committed rows so a later rollback does not expire them.
+
+        :param db:
+        :param db_objs:
+        :return:
+        """
+        for db_obj in db_objs:
+            if db_obj in db:
+                db.expunge(db_obj)
+
+    @staticmethod
+    def _failed(
+        start: int, size: int, error: SQLAlchemyError
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Report every row of a failed batch.
+
+        :param start:
+        :param size:
+        :param error:
+        :return:
+        """
+        return [
+            BulkRowResult(index=start + i, error=type(error).__name__)
+            for i in range(size)
+        ]
+
+    @staticmethod
+    def _matched(
+        start: int, batch: Sequence[dict[str, Any]], db_objs: dict[Any, ModelType]
+    ) -> list[BulkRowResult[ModelType]]:
+        """
+        Report the rows of a batch that were found or not found.
+
+        :param start:
+        :param batch:
+        :param db_objs:
+        :return:
+        """
+        return [
+            BulkRowResult(index=start + i, obj=db_objs[row["id"]])
+            if row["id"] in db_objs
+            else BulkRowResult(index=start + i, error="NotFound")
+            for i, row in enumerate(batch)
+        ]
+
     async def update(
         self,
         db: AsyncSession,
@@ -79,29 +540,88 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         :param obj_in:
         :return:
         """
-        obj_data = jsonable_encoder(db_obj)
+        updated = await self.update_by_id(db, id=db_obj.id, obj_in=obj_in)
+        return updated if updated is not None else db_obj
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: Any,
+        obj_in: UpdateSchemaType | dict[str, Any],
+        where: Sequence[ColumnElement[bool]] = (),
+        versions: Collection[int] | None = None,
+    ) -> ModelType | None:
+        """
+        Update a row by primary key with one UPDATE ... RETURNING.
+
+        The version column of a versioned model is incremented with the row.
+
+        :param db:
+        :param id:
+        :param obj_in:
+        :param where: additional filter criteria, rows outside it are not found
+        :param versions: update the row only at one of these versions
+        :return: the updated row, or None if no row matched
+        :raises VersionMismatchError: the row matched at another version
+        """
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.model_dump(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
+        mapper = inspect(self.model)
+        values: dict[Any, Any] = {
+            field: value
+            for field, value in update_data.items()
+            if field in mapper.column_attrs
+        }
+        criteria = (self.model.id == id, *where)
+        version_col = mapper.version_id_col
+        if version_col is not None and versions is not None:
+            criteria += (version_col.in_(versions),)
+        if not values:
+            db_obj = await db.scalar(select(self.model).where(*criteria))
+        else:
+            if version_col is not None:
+                values[version_col] = version_col + 1
+            db_obj = await db.scalar(
+                update(self.model)
+                .where(*criteria)
+                .values(values)
+                .returning(self.model)
+                .execution_options(synchronize_session=False, populate_existing=True)
+            )
+            await db.commit()
+            if db_obj is not None:
+                await self._invalidate([id])
+        if db_obj is None and versions is not None:
+            if await self.get_version(db, id=id, where=where) is not None:
+                raise VersionMismatchError(id)
         return db_obj
 
-    async def remove(self, db: AsyncSession, *, id: Any) -> ModelType:
+    async def remove(
+        self,
+        db: AsyncSession,
+        *,
+        id: Any,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> ModelType | None:
         """
-        Remove a row.
+        Remove a row by primary key with one DELETE ... RETURNING.
 
         :param db:
         :param id:
-        :return:
+        :param where: additional filter criteria, rows outside it are not found
+        :return: the removed row, or None if no row matched
         """
-        result = await db.execute(select(self.model).where(self.model.id == id))
-        db_obj = result.scalar_one()
-        await db.delete(db_obj)
+        db_obj = await db.scalar(
+            delete(self.model)
+            .where(self.model.id == id, *where)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
         await db.commit()
+        if db_obj is not None:
+            self._detach(db, [db_obj])
+            await self._invalidate([id])
         return db_obj
@@ -1,13 +1,21 @@
 from collections.abc import Sequence
 from uuid import UUID
 
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
-from app.crud.base import CRUDBase
-from src.app.models.item import Item
+from app.cache import EntityCache
+from app.config import settings
+from app.crud.base import (
+    BulkRowResult,
+    CRUDBase,
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+)
+from app.db.redis import invalidation_bus, redis
+from app.models.item import SEARCH_CONFIG, Item
 from app.schemas.item import ItemCreate, ItemUpdate
 
 
@@ -25,12 +33,63 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
         :param owner_id:
         :return:
         """
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data, owner_id=owner_id)
-        db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        return await self._create(
+            db, values={**obj_in.model_dump(), "owner_id": owner_id}
+        )
+
+    async def create_many_with_owner(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[schemas.ItemCreate],
+        owner_id: UUID,
+        batch_size: int,
+    ) -> list[BulkRowResult[models.Item]]:
+        """
+        Create Items in batches that are owned by a User.
+
+        :param db:
+        :param objs_in:
+        :param owner_id:
+        :param batch_size:
+        :return:
+        """
+        return await self._create_many(
+            db,
+            rows=[{**obj_in.model_dump(), "owner_id": owner_id} for obj_in in objs_in],
+            batch_size=batch_size,
+        )
+
+    def owned_by(self, user: schemas.UserRead) -> tuple[ColumnElement[bool], ...]:
+        """
+        Filter criteria for the items a User may access.
+
+        :param user:
+        :return:
+        """
+        if user.is_superuser:
+            return ()
+        return (self.model.owner_id == user.id,)
+
+    async def get_version_for(
+        self, db: AsyncSession, *, id: int, user: schemas.UserRead
+    ) -> int | None:
+        """
+        Retrieve the version of an item a User may access, without loading the item.
+
+        The version is read from the cache when it holds the item, otherwise
+        from the version column alone.
+
+        :param db:
+        :param id:
+        :param user:
+        :return: the version, or None if the item was not found
+        """
+        if self.cache is not None and (row := await self.cache.get(id)) is not None:
+            if user.is_superuser or row["owner_id"] == user.id:
+                return row["version_id"]
+            return None
+        return await self.get_version(db, id=id, where=self.owned_by(user))
 
     async def get_multi_by_owner(
         self, db: AsyncSession, *, owner_id: UUID, skip: int = 0, limit: int = 100
@@ -46,11 +105,96 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
         """
         result = await db.execute(
             select(self.model)
-            .where(self.model.id == owner_id)
+            .where(self.model.owner_id == owner_id)
             .offset(skip)
             .limit(limit)
         )
         return result.scalars().all()
 
+    async def get_page_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: UUID,
+        after: str | None = None,
+        limit: int = 100,
+    ) -> tuple[Sequence[models.Item], str | None]:
+        """
+        Retrieve a page of items that are owned by a User.
+
+        :param db:
+        :param owner_id:
+        :param after:
+        :param limit:
+        :return:
+        """
+        return await self.get_page(
+            db, after=after, limit=limit, where=(self.model.owner_id == owner_id,)
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        q: str,
+        after: str | None = None,
+        limit: int = 100,
+        where: Sequence[ColumnElement[bool]] = (),
+    ) -> tuple[Sequence[models.Item], str | None]:
+        """
+        Retrieve a page of items matching a web search query, most relevant first.
+
+        Matches are found through the GIN index of the generated `search_vector`
+        and paged by the last seen rank and primary key.
+
+        :param db:
+        :param q: query in web search syntax, e.g. `"exact phrase" -excluded`
+        :param after: cursor returned with the previous page
+        :param limit:
+        :param where: additional filter criteria
+        :return: the items and the cursor of the next page, if any
+        """
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank(self.model.search_vector, query)
+        statement = (
+            select(self.model, rank)
+            .where(self.model.search_vector.bool_op("@@")(query), *where)
+            .order_by(rank.desc(), self.model.id)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            last_rank, last_id = decode_cursor(after, size=2)
+            if not isinstance(last_rank, int | float) or not isinstance(last_id, int):
+                raise InvalidCursorError(after)
+            statement = statement.where(
+                or_(
+                    rank < last_rank,
+                    and_(rank == last_rank, self.model.id > last_id),
+                )
+            )
+        rows = (await db.execute(statement)).all()
+        items = [row[0] for row in rows[:limit]]
+        if len(rows) > limit:
+            return items, encode_cursor(rows[limit - 1][1], rows[limit - 1][0].id)
+        return items, None
+
 
-item = CRUDItem(models.Item)
+item = CRUDItem(
+    models.Item,
+    cache=EntityCache(
+        "item",
+        schemas.ItemInDB,
+        redis=redis,
+        bus=invalidation_bus,
+        ttl=settings.cache_ttl,
+        l1_maxsize=settings.cache_l1_maxsize,
+        l1_ttl=settings.cache_l1_ttl,
+    )
+    if settings.cache_enabled
+    else None,
+    coalesce=settings.sqlalchemy_coalesce_reads,
+    batch_size=settings.sqlalchemy_batch_max_size
+    if settings.sqlalchemy_batch_reads
+    else None,
+    batch_wait=settings.sqlalchemy_batch_wait,
+)
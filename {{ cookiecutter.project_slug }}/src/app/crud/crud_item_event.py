@@ -0,0 +1,64 @@
+from collections.abc import Sequence
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.crud.base import CRUDBase
+from app.models.item_event import ItemEvent
+
+
+class CRUDItemEvent(CRUDBase[ItemEvent, BaseModel, BaseModel]):
+    """Item event read and prune actions; events are written by a trigger."""
+
+    async def get_last_id(self, db: AsyncSession) -> int:
+        """
+        Retrieve the id of the latest event.
+
+        :param db:
+        :return: 0 when there are no events
+        """
+        return await db.scalar(select(func.coalesce(func.max(self.model.id), 0)))
+
+    async def get_after(
+        self,
+        db: AsyncSession,
+        *,
+        after: int,
+        owner_id: UUID | None = None,
+        limit: int = 100,
+    ) -> Sequence[models.ItemEvent]:
+        """
+        Retrieve the events following an event id, oldest first.
+
+        :param db:
+        :param after: event id
+        :param owner_id: only events of this User's items, or None for all
+        :param limit:
+        :return:
+        """
+        statement = select(self.model).where(self.model.id > after)
+        if owner_id is not None:
+            statement = statement.where(self.model.owner_id == owner_id)
+        result = await db.execute(statement.order_by(self.model.id).limit(limit))
+        return result.scalars().all()
+
+    async def remove_before(self, db: AsyncSession, *, before: datetime) -> int:
+        """
+        Delete the events recorded before a time.
+
+        :param db:
+        :param before:
+        :return: the number of events deleted
+        """
+        result = await db.execute(
+            delete(self.model).where(self.model.created_at < before)
+        )
+        await db.commit()
+        return result.rowcount
+
+
+item_event = CRUDItemEvent(models.ItemEvent)
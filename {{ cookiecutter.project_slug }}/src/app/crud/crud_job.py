@@ -0,0 +1,209 @@
+from collections.abc import Collection, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.crud.base import CRUDBase
+from app.models.job import Job
+
+PENDING = "pending"
+RUNNING = "running"
+FAILED = "failed"
+
+
+class CRUDJob(CRUDBase[Job, BaseModel, BaseModel]):
+    """Background job enqueue, claim and settle actions."""
+
+    def enqueue(
+        self,
+        db: AsyncSession,
+        *,
+        kind: str,
+        payload: dict[str, Any],
+        max_attempts: int,
+        run_at: datetime | None = None,
+    ) -> models.Job:
+        """
+        Add a job to the session, queued once the session commits.
+
+        Enqueuing in the transaction of the change that requires the job, before
+        it commits, queues both or neither; after it commits, the job is queued
+        in a transaction of its own and is lost if that one fails.
+
+        :param db:
+        :param kind:
+        :param payload: JSON serializable arguments of the job
+        :param max_attempts:
+        :param run_at: not before this time, or now
+        :return:
+        """
+        db_obj = self.model(
+            kind=kind,
+            payload=payload,
+            status=PENDING,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=run_at or datetime.now(timezone.utc),
+        )
+        db.add(db_obj)
+        return db_obj
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        *,
+        kinds: Collection[str],
+        limit: int,
+        lease: float,
+    ) -> Sequence[models.Job]:
+        """
+        Claim the jobs due to run, oldest due first, and commit.
+
+        Jobs locked by another worker's claim are skipped rather than waited
+        for. A claimed job stays running until its lease expires, after which
+        it is due again, so the jobs of a worker that died are retried; a job
+        whose lease expires on its last attempt, such as one killing its
+        worker, is failed instead.
+
+        :param db:
+        :param kinds: claim only jobs of these kinds
+        :param limit:
+        :param lease: seconds
+        :return:
+        """
+        now = datetime.now(timezone.utc)
+        await db.execute(
+            update(self.model)
+            .where(
+                self.model.status == RUNNING,
+                self.model.run_at <= now,
+                self.model.attempts >= self.model.max_attempts,
+                self.model.kind.in_(kinds),
+            )
+            .values(status=FAILED, last_error="Lease expired on the last attempt.")
+            .execution_options(synchronize_session=False)
+        )
+        due = (
+            select(self.model.id)
+            .where(
+                self.model.status.in_((PENDING, RUNNING)),
+                self.model.run_at <= now,
+                self.model.attempts < self.model.max_attempts,
+                self.model.kind.in_(kinds),
+            )
+            .order_by(self.model.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.scalars(
+            update(self.model)
+            .where(self.model.id.in_(due.scalar_subquery()))
+            .values(
+                status=RUNNING,
+                attempts=self.model.attempts + 1,
+                run_at=now + timedelta(seconds=lease),
+            )
+            .returning(self.model),
+            execution_options={"synchronize_session": False, "populate_existing": True},
+        )
+        jobs = result.all()
+        await db.commit()
+        return jobs
+
+    def _claimed(self, id: int, attempts: int) -> tuple[ColumnElement[bool], ...]:
+        """
+        Build the criteria of a job still held by the claim of an attempt.
+
+        Once its lease expires, the job may be claimed again by another attempt,
+        which the first may no longer settle.
+
+        :param id:
+        :param attempts: of the job when claimed
+        :return:
+        """
+        return (
+            self.model.id == id,
+            self.model.status == RUNNING,
+            self.model.attempts == attempts,
+        )
+
+    async def complete(self, db: AsyncSession, *, id: int, attempts: int) -> bool:
+        """
+        Delete a job that succeeded.
+
+        :param db:
+        :param id:
+        :param attempts: of the job when claimed
+        :return: whether the claim still held the job
+        """
+        result = await db.execute(
+            delete(self.model).where(*self._claimed(id, attempts))
+        )
+        await db.commit()
+        return bool(result.rowcount)
+
+    async def retry(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        attempts: int,
+        error: str,
+        run_at: datetime,
+    ) -> bool:
+        """
+        Queue a job that failed again.
+
+        :param db:
+        :param id:
+        :param attempts: of the job when claimed
+        :param error:
+        :param run_at: not before this time
+        :return: whether the claim still held the job
+        """
+        result = await db.execute(
+            update(self.model)
+            .where(*self._claimed(id, attempts))
+            .values(status=PENDING, run_at=run_at, last_error=error)
+        )
+        await db.commit()
+        return bool(result.rowcount)
+
+    async def fail(
+        self, db: AsyncSession, *, id: int, attempts: int, error: str
+    ) -> bool:
+        """
+        Keep a job that failed its last attempt, without running it again.
+
+        :param db:
+        :param id:
+        :param attempts: of the job when claimed
+        :param error:
+        :return: whether the claim still held the job
+        """
+        result = await db.execute(
+            update(self.model)
+            .where(*self._claimed(id, attempts))
+            .values(status=FAILED, last_error=error)
+        )
+        await db.commit()
+        return bool(result.rowcount)
+
+    async def count_by_status(self, db: AsyncSession) -> dict[str, int]:
+        """
+        Count the jobs in each status.
+
+        :param db:
+        :return:
+        """
+        result = await db.execute(
+            select(self.model.status, func.count()).group_by(self.model.status)
+        )
+        return {PENDING: 0, RUNNING: 0, FAILED: 0, **dict(result.tuples().all())}
+
+
+job = CRUDJob(models.Job)
@@ -0,0 +1,104 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+from typing import Generic, TypeVar
+
+from app.metrics import CRUD_BATCH_SIZE
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+class BatchLoader(Generic[KeyType, ValueType]):
+    """
+    Collect the keys requested within a wait window and load them in one call.
+
+    A batch is dispatched when the window ends or it reaches `max_batch_size`
+    keys; with no window, it holds the keys requested in the same tick of the
+    event loop. Keys requested twice in a batch are loaded once. Not
+    thread-safe; each event loop owns its loaders.
+    """
+
+    def __init__(
+        self,
+        load_many: Callable[
+            [Sequence[KeyType]], Awaitable[Mapping[KeyType, ValueType]]
+        ],
+        *,
+        name: str,
+        max_batch_size: int,
+        wait: float = 0.0,
+    ):
+        """
+        Object with no pending keys.
+
+        :param load_many: load the values of keys, leaving out those not found
+        :param name: label of the batch size metric
+        :param max_batch_size:
+        :param wait: seconds of the window, or 0 for one tick
+        """
+        self.load_many = load_many
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.wait = wait
+        self._pending: dict[KeyType, asyncio.Future[ValueType | None]] = {}
+        self._handle: asyncio.TimerHandle | asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: KeyType) -> ValueType | None:
+        """
+        Load the value of a key in the next batch.
+
+        :param key:
+        :return: None if not found
+        """
+        if (future := self._pending.get(key)) is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch_size:
+                self.dispatch()
+            elif self._handle is None:
+                self._handle = (
+                    loop.call_later(self.wait, self.dispatch)
+                    if self.wait
+                    else loop.call_soon(self.dispatch)
+                )
+        # a cancelled caller leaves the batch to the others
+        return await asyncio.shield(future)
+
+    def dispatch(self) -> None:
+        """
+        Start loading the pending keys.
+
+        :return:
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._load(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load(
+        self, batch: dict[KeyType, asyncio.Future[ValueType | None]]
+    ) -> None:
+        """
+        Load a batch and settle the futures of its keys.
+
+        :param batch:
+        :return:
+        """
+        CRUD_BATCH_SIZE.labels(model=self.name).observe(len(batch))
+        try:
+            values = await self.load_many(list(batch))
+        except Exception as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+                    # retrieved even when every caller was cancelled
+                    future.add_done_callback(lambda done: done.exception())
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
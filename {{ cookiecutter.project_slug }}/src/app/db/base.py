@@ -1,5 +1,7 @@
 # Import all the models, so that Base has them before being
 # imported by Alembic
-from src.app.db.base_class import Base  # noqa: F401
-from src.app.models.item import Item  # noqa: F401
-from src.app.models.user import User  # noqa: F401
+from app.db.base_class import Base  # noqa: F401
+from app.models.item import Item  # noqa: F401
+from app.models.item_event import ItemEvent  # noqa: F401
+from app.models.job import Job  # noqa: F401
+from app.models.user import User  # noqa: F401
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class SharedPins(LRUCache[bytes, bool]):
+    """
+    Keys that wrote within the read-your-writes window, shared by every worker.
+
+    Pins are kept in-process, where the sync routing of a session reads them,
+    and in Redis with the window as their TTL. A session's key is loaded from
+    Redis before it runs, so a client that wrote through one worker reads from
+    the primary on every other. The Redis write is started on commit without
+    blocking it, and usually lands before the response is sent; Redis failures
+    degrade to pins holding within one worker.
+    """
+
+    def __init__(self, redis: Redis, *, prefix: str, maxsize: int, ttl: int):
+        """
+        Object with no pins.
+
+        :param redis:
+        :param prefix: of the Redis keys
+        :param maxsize: pins kept in-process
+        :param ttl: seconds of the read-your-writes window
+        """
+        super().__init__(maxsize, ttl=ttl)
+        self.redis = redis
+        self.prefix = prefix
+        self._tasks: set[asyncio.Task[Any]] = set()
+
+    def set(self, key: bytes, value: bool, ttl: float | None = None) -> None:
+        """
+        Pin a key in this worker, and in Redis when an event loop is running.
+
+        :param key:
+        :param value:
+        :param ttl: seconds, overriding the window
+        :return:
+        """
+        super().set(key, value, ttl)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._publish(key, self.ttl if ttl is None else ttl))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def load(self, key: bytes) -> bool:
+        """
+        Copy the pin of a key from Redis to this worker.
+
+        :param key:
+        :return: whether the key is pinned
+        """
+        if key in self:
+            return True
+        try:
+            ttl = await self.redis.pttl(self._name(key))
+        except RedisError:
+            logger.warning("Failed to read a read-your-writes pin from Redis.")
+            return False
+        if ttl <= 0:
+            return False
+        super().set(key, True, ttl / 1000)
+        return True
+
+    async def _publish(self, key: bytes, ttl: float | None) -> None:
+        """
+        Write a pin to Redis.
+
+        :param key:
+        :param ttl: seconds
+        :return:
+        """
+        try:
+            await self.redis.set(
+                self._name(key), 1, px=None if ttl is None else int(ttl * 1000)
+            )
+        except RedisError:
+            logger.warning("Failed to write a read-your-writes pin to Redis.")
+
+    def _name(self, key: bytes) -> str:
+        """
+        Build the Redis key of a pin.
+
+        :param key:
+        :return:
+        """
+        return f"{self.prefix}{key.hex()}"
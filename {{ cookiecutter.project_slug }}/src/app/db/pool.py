@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from app.db.query_stats import query_stats
+from app.metrics import (
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTION_AGE,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_RECONNECTS,
+    DB_POOL_SUGGESTED_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool exporting its connection counts and checkout waits to Prometheus.
+
+    Pools are labeled by their `pool_logging_name`. Checkout waits are also
+    added to the stats of the current request. The peak of connections
+    checked out at once is kept for the `PoolAdvisor`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        """
+        Object with the arguments of `AsyncAdaptedQueuePool`.
+
+        :param args:
+        :param kwargs:
+        """
+        super().__init__(*args, **kwargs)
+        self.name = self._orig_logging_name or "default"
+        self.peak_checked_out = 0
+        self.timeouts = 0
+        # a recreated pool inherits the listeners of the pool it replaces
+        if "_dispatch" not in kwargs:
+            listen_reconnects(self)
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        """
+        Check out a connection, timing the wait for it.
+
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(pool=self.name).inc()
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            DB_POOL_CHECKOUT_WAIT.labels(pool=self.name).observe(wait)
+            if (stats := query_stats.get()) is not None:
+                stats.pool_wait += wait
+        DB_POOL_CONNECTION_AGE.labels(pool=self.name).observe(
+            time.time() - record.starttime  # type: ignore[attr-defined]
+        )
+        self.peak_checked_out = max(self.peak_checked_out, self.checkedout())
+        self.export_connections()
+        return record
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        """
+        Check in a connection.
+
+        :param record:
+        :return:
+        """
+        super()._do_return_conn(record)
+        self.export_connections()
+
+    def export_connections(self) -> None:
+        """
+        Export the checked out, idle and overflow connection counts.
+
+        :return:
+        """
+        for state, value in (
+            ("checked_out", self.checkedout()),
+            ("idle", self.checkedin()),
+            ("overflow", max(self.overflow(), 0)),
+        ):
+            DB_POOL_CONNECTIONS.labels(pool=self.name, state=state).set(value)
+
+
+def listen_reconnects(pool: InstrumentedPool) -> None:
+    """
+    Count the connections of a pool replaced after an invalidation or recycle.
+
+    :param pool:
+    :return:
+    """
+    name = pool.name
+
+    def on_invalidate(_: Any, connection_record: ConnectionPoolEntry, __: Any) -> None:
+        connection_record.record_info["invalidated"] = True
+        DB_POOL_RECONNECTS.labels(pool=name, reason="invalidate").inc()
+
+    def on_connect(_: Any, connection_record: ConnectionPoolEntry) -> None:
+        record_info = connection_record.record_info
+        invalidated = record_info.pop("invalidated", False)
+        if record_info.get("connected") and not invalidated:
+            DB_POOL_RECONNECTS.labels(pool=name, reason="recycle").inc()
+        record_info["connected"] = True
+
+    event.listen(pool, "invalidate", on_invalidate)
+    event.listen(pool, "connect", on_connect)
+
+
+class PoolAdvisor:
+    """
+    Suggest pool sizes from the peak concurrency observed per interval.
+
+    A pool whose peak stays below its `pool_size` holds idle connections in
+    every worker, while one that timed out or reached its overflow limit is too
+    small. Suggestions are logged with the total over `workers` processes, and
+    exported as a gauge.
+    """
+
+    def __init__(self, pool: InstrumentedPool, *, workers: int):
+        """
+        Object advising on one pool.
+
+        :param pool:
+        :param workers: worker processes, each with its own pool
+        """
+        self.pool = pool
+        self.workers = workers
+
+    def advise(self) -> str | None:
+        """
+        Suggest a pool size from the peak since the last advice, and reset it.
+
+        :return: the suggestion, or None if the pool is sized right
+        """
+        pool, peak, timeouts = self.pool, self.pool.peak_checked_out, self.pool.timeouts
+        pool.peak_checked_out, pool.timeouts = pool.checkedout(), 0
+        limit = pool.size() + pool._max_overflow
+        if timeouts or peak >= limit:
+            suggested = max(math.ceil(limit * 1.5), limit + 1)
+            reason = f"{timeouts} checkout timeouts, peak {peak} of {limit}"
+        elif peak < pool.size():
+            suggested = max(peak, 1)
+            reason = f"peak {peak} below pool_size {pool.size()}"
+        else:
+            DB_POOL_SUGGESTED_SIZE.labels(pool=pool.name).set(pool.size())
+            return None
+        DB_POOL_SUGGESTED_SIZE.labels(pool=pool.name).set(suggested)
+        return (
+            f"{pool.name} pool: {reason}; suggest pool_size={suggested}, "
+            f"{suggested * self.workers} connections over {self.workers} workers"
+        )
+
+    async def run(self, interval: float) -> None:
+        """
+        Log a suggestion every interval.
+
+        :param interval: seconds
+        :return:
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if advice := self.advise():
+                logger.info(advice)
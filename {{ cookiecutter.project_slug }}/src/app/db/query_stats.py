@@ -0,0 +1,78 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import ExceptionContext
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+@dataclass
+class QueryStats:
+    """Statements run and connection checkouts waited for by one request."""
+
+    count: int = 0
+    duration: float = 0.0
+    pool_wait: float = 0.0
+    tables: Counter[str] = field(default_factory=Counter)
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def before_cursor_execute(conn: Any, _cursor: Any, _statement: str, *_: Any) -> None:
+    """
+    Record the start of a statement.
+
+    :param conn:
+    :param _cursor:
+    :param _statement:
+    :param _:
+    :return:
+    """
+    if query_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn: Any, _cursor: Any, statement: str, *_: Any) -> None:
+    """
+    Add a finished statement to the stats of the current request.
+
+    :param conn:
+    :param _cursor:
+    :param statement:
+    :param _:
+    :return:
+    """
+    if (stats := query_stats.get()) is None or not conn.info.get("query_start"):
+        return
+    stats.count += 1
+    stats.duration += time.perf_counter() - conn.info["query_start"].pop()
+    stats.tables.update(set(TABLE_PATTERN.findall(statement)))
+
+
+def handle_error(context: ExceptionContext) -> None:
+    """
+    Add a failed statement to the stats, so its start is not left on the connection.
+
+    :param context:
+    :return:
+    """
+    if context.connection is not None and context.statement is not None:
+        after_cursor_execute(context.connection, None, context.statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Count and time the statements of an engine in the current request's stats.
+
+    :param engine:
+    :return:
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
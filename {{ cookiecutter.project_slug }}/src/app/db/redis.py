@@ -0,0 +1,7 @@
+from redis.asyncio import Redis
+
+from app.cache import InvalidationBus
+from app.config import settings
+
+redis = Redis.from_url(str(settings.redis_dsn))
+invalidation_bus = InvalidationBus(redis, channel=settings.cache_invalidation_channel)
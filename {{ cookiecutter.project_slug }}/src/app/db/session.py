@@ -1,20 +1,267 @@
+import functools
+import random
+from collections.abc import Sequence
+from typing import Any
+
 import orjson as json
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy import Engine, Select, event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
 
+from app.cache import LRUCache
 from app.config import settings
+from app.db.pins import SharedPins
+from app.db.pool import InstrumentedPool
+from app.db.query_stats import instrument_engine
+from app.db.redis import redis
+
+
+def build_engine(url: str, name: str) -> AsyncEngine:
+    """
+    Build an async engine with the configured pool and serializers.
+
+    Its statements are counted in the stats of the request running them, and
+    its pool is exported to Prometheus labeled by `name`.
+
+    :param url:
+    :param name:
+    :return:
+    """
+    engine = create_async_engine(
+        url=url,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        echo=settings.sqlalchemy_echo,
+        echo_pool=settings.sqlalchemy_echo_pool,
+        pool_pre_ping=settings.sqlalchemy_pool_pre_ping,
+        pool_size=settings.sqlalchemy_pool_size,
+        max_overflow=settings.sqlalchemy_max_overflow,
+        pool_recycle=settings.sqlalchemy_pool_recycle,
+        pool_timeout=settings.sqlalchemy_pool_timeout,
+        insertmanyvalues_page_size=settings.sqlalchemy_insertmanyvalues_page_size,
+        json_deserializer=json.loads,
+        json_serializer=json.dumps,
+        future=True,
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica and everything else to the primary.
+
+    A plain SELECT goes to a replica chosen once per session, unless the session
+    has written, or its `info["pin_key"]` wrote within the read-your-writes
+    window. Writes, locking reads and flushes always use the primary. Pins are
+    read from `pins` as is; with `SharedPins`, load the key first to see the
+    writes of other workers.
+    """
+
+    def __init__(
+        self,
+        *,
+        replicas: Sequence[AsyncEngine] = (),
+        pins: LRUCache[Any, bool] | None = None,
+        **kwargs: Any,
+    ):
+        """
+        Object routing between the primary `bind` and the replicas.
+
+        :param replicas:
+        :param pins: keys that wrote recently, expiring after the window
+        :param kwargs:
+        """
+        super().__init__(**kwargs)
+        self.replicas = [replica.sync_engine for replica in replicas]
+        self.pins = pins
+        self._replica: Engine | None = None
+
+    def get_bind(self, mapper: Any = None, **kwargs: Any) -> Any:
+        """
+        Choose the engine of a statement.
+
+        :param mapper:
+        :param kwargs:
+        :return:
+        """
+        clause = kwargs.get("clause")
+        if (
+            not self.replicas
+            or self._flushing
+            or not isinstance(clause, Select)
+            or clause._for_update_arg is not None
+            or self.info.get("wrote")
+            or self._pinned()
+        ):
+            return super().get_bind(mapper, **kwargs)
+        if self._replica is None:
+            self._replica = random.choice(self.replicas)  # noqa: S311
+        return self._replica
+
+    def _pinned(self) -> bool:
+        """
+        Check if the session's pin key wrote within the read-your-writes window.
+
+        :return:
+        """
+        pin_key = self.info.get("pin_key")
+        return pin_key is not None and self.pins is not None and pin_key in self.pins
+
+
+def reads_primary(db: AsyncSession) -> bool:
+    """
+    Check if a session reads from the primary database to see its own writes.
+
+    Its reads may then differ from those of other sessions, and are not shared.
+
+    :param db:
+    :return:
+    """
+    session = db.sync_session
+    return bool(db.info.get("wrote")) or (
+        isinstance(session, RoutingSession) and session._pinned()
+    )
+
+
+def reads_replica(db: AsyncSession) -> bool:
+    """
+    Check if a session's plain reads may go to a replica, which may lag.
+
+    Rows it reads are then not cached, as a replica may return a row older than
+    the last invalidation.
+
+    :param db:
+    :return:
+    """
+    session = db.sync_session
+    return (
+        isinstance(session, RoutingSession)
+        and bool(session.replicas)
+        and not reads_primary(db)
+    )
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def track_write_statement(orm_execute_state: ORMExecuteState) -> None:
+    """
+    Keep a session on the primary once it executes a write statement.
+
+    :param orm_execute_state:
+    :return:
+    """
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
 
-engine = create_async_engine(
-    url=str(settings.sqlalchemy_dsn),
-    echo=settings.sqlalchemy_echo,
-    echo_pool=settings.sqlalchemy_echo_pool,
-    pool_pre_ping=settings.sqlalchemy_pool_pre_ping,
-    pool_size=settings.sqlalchemy_pool_size,
-    max_overflow=settings.sqlalchemy_max_overflow,
-    pool_recycle=settings.sqlalchemy_pool_recycle,
-    pool_timeout=settings.sqlalchemy_pool_timeout,
-    insertmanyvalues_page_size=settings.sqlalchemy_insertmanyvalues_page_size,
-    json_deserializer=json.loads,
-    json_serializer=json.dumps,
-    future=True,
+
+@event.listens_for(RoutingSession, "after_flush")
+def track_flush(session: Session, _: Any) -> None:
+    """
+    Keep a session on the primary once it flushes.
+
+    :param session:
+    :param _:
+    :return:
+    """
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def pin_after_commit(session: Session) -> None:
+    """
+    Pin the session's key to the primary after it commits a write.
+
+    :param session:
+    :return:
+    """
+    pins = getattr(session, "pins", None)
+    pin_key = session.info.get("pin_key")
+    if session.info.get("wrote") and pins is not None and pin_key is not None:
+        pins.set(pin_key, True)
+
+
+@event.listens_for(RoutingSession, "after_transaction_create")
+def reset_replica(session: Session, transaction: SessionTransaction) -> None:
+    """
+    Choose the replica again for each top-level transaction.
+
+    :param session:
+    :param transaction:
+    :return:
+    """
+    if transaction.parent is None and isinstance(session, RoutingSession):
+        session._replica = None
+
+
+@functools.cache
+def get_engine() -> AsyncEngine:
+    """
+    Retrieve the engine of the primary database, built on first use.
+
+    :return:
+    """
+    return build_engine(str(settings.sqlalchemy_dsn), "primary")
+
+
+@functools.cache
+def get_reader_engines() -> tuple[AsyncEngine, ...]:
+    """
+    Retrieve the engines of the replica databases, built on first use.
+
+    :return:
+    """
+    return tuple(
+        build_engine(dsn, f"replica{i}")
+        for i, dsn in enumerate(settings.sqlalchemy_reader_dsns)
+    )
+
+
+pinned = SharedPins(
+    redis,
+    prefix="pin:",
+    maxsize=settings.sqlalchemy_read_your_writes_maxsize,
+    ttl=settings.sqlalchemy_read_your_writes_seconds,
 )
-async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@functools.cache
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """
+    Retrieve the session factory, building the engines on first use.
+
+    :return:
+    """
+    return async_sessionmaker(
+        get_engine(),
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        replicas=get_reader_engines(),
+        pins=pinned,
+    )
+
+
+def async_session() -> AsyncSession:
+    """
+    Open a database session.
+
+    :return:
+    """
+    return get_sessionmaker()()
+
+
+async def dispose_engines() -> None:
+    """
+    Close the connections of the engines that were built.
+
+    :return:
+    """
+    if get_engine.cache_info().currsize:
+        await get_engine().dispose()
+    if get_reader_engines.cache_info().currsize:
+        for reader_engine in get_reader_engines():
+            await reader_engine.dispose()
@@ -0,0 +1,104 @@
+from typing import Any
+from uuid import UUID
+
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.cache import LRUCache
+from app.config import settings
+from app.db.base_class import Base
+from app.db.redis import invalidation_bus
+from app.models import User
+from app.models.user import OAuthAccount
+
+user_cache: LRUCache[str, dict[str, Any]] = LRUCache(
+    settings.fastapi_users_cache_maxsize, ttl=settings.fastapi_users_cache_ttl
+)
+invalidation_bus.register("user", user_cache)
+
+
+async def invalidate_user(id: Any) -> None:
+    """
+    Drop a User from the cache of this and, with the cache enabled, every worker.
+
+    :param id:
+    :return:
+    """
+    user_cache.pop(str(id))
+    if settings.cache_enabled:
+        await invalidation_bus.publish("user", str(id))
+
+
+def _row(obj: Base) -> dict[str, Any]:
+    """
+    Copy the loaded column values of a row.
+
+    :param obj:
+    :return:
+    """
+    state = inspect(obj)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _snapshot(user: User) -> dict[str, Any]:
+    """
+    Copy a User and its OAuth accounts, detached from any session.
+
+    :param user:
+    :return:
+    """
+    return {
+        **_row(user),
+        "oauth_accounts": [_row(account) for account in user.oauth_accounts],
+    }
+
+
+def _restore(row: dict[str, Any]) -> User:
+    """
+    Rebuild a detached User from its snapshot, as if loaded from the database.
+
+    :param row:
+    :return:
+    """
+    user = User(**{key: value for key, value in row.items() if key != "oauth_accounts"})
+    make_transient_to_detached(user)
+    accounts = []
+    for account_row in row["oauth_accounts"]:
+        account = OAuthAccount(**account_row)
+        make_transient_to_detached(account)
+        accounts.append(account)
+    set_committed_value(user, "oauth_accounts", accounts)
+    return user
+
+
+class CachedSQLAlchemyUserDatabase(SQLAlchemyUserDatabase[User, UUID]):
+    """
+    User database that serves active users by id from a bounded TTL cache.
+
+    Users are cached as copies of their columns, rebuilt and merged into the
+    session without loading, so the authentication of a request costs no query
+    and outlives the session that loaded them. `UserManager` hooks invalidate
+    users when they change; `FASTAPI_USERS_CACHE_TTL` bounds how stale a user
+    may be otherwise, and 0 disables the cache.
+    """
+
+    async def get(self, id: UUID) -> User | None:
+        """
+        Retrieve a User by id.
+
+        :param id:
+        :return:
+        """
+        key = str(id)
+        if (row := user_cache.get(key)) is not None:
+            return await self.session.merge(_restore(row), load=False)
+        user = await super().get(id)
+        if user is not None and user.is_active and settings.fastapi_users_cache_ttl:
+            user_cache.set(key, _snapshot(user))
+        return user
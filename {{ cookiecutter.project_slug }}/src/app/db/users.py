@@ -1,33 +1,50 @@
+import functools
+import hashlib
 import logging
+import time
 import uuid
 from collections.abc import AsyncIterator
+from typing import Any, cast
 
+import jwt
 from fastapi import Depends, Request
-from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
+from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin, exceptions
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
     JWTStrategy,
 )
+from fastapi_users.jwt import decode_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from httpx_oauth.oauth2 import OAuth2
 
 from app import models
 from app.api.deps import get_user_db
+from app.cache import LRUCache
 from app.config import settings
+from app.db.user_cache import invalidate_user
+from app.jobs import enqueue
 from app.models import User
 
 logger = logging.getLogger(__name__)
 
-oauth_client = OAuth2(
-    name=settings.oauth_name,
-    client_id=settings.oauth_client_id,
-    client_secret=settings.oauth_client_secret,
-    authorize_endpoint=settings.oauth_authorize_endpoint,
-    access_token_endpoint=settings.oauth_access_token_endpoint,
-    refresh_token_endpoint=settings.oauth_refresh_token_endpoint,
-    revoke_token_endpoint=settings.oauth_revoke_token_endpoint,
-)
+
+@functools.cache
+def get_oauth_client() -> OAuth2:
+    """
+    Retrieve the OAuth2 client, built on first use.
+
+    :return:
+    """
+    return OAuth2(
+        name=settings.oauth_name,
+        client_id=settings.oauth_client_id,
+        client_secret=settings.oauth_client_secret,
+        authorize_endpoint=settings.oauth_authorize_endpoint,
+        access_token_endpoint=settings.oauth_access_token_endpoint,
+        refresh_token_endpoint=settings.oauth_refresh_token_endpoint,
+        revoke_token_endpoint=settings.oauth_revoke_token_endpoint,
+    )
 
 
 class UserManager(UUIDIDMixin, BaseUserManager[models.User, uuid.UUID]):
@@ -36,6 +53,24 @@ class UserManager(UUIDIDMixin, BaseUserManager[models.User, uuid.UUID]):
     reset_password_token_secret = settings.fastapi_secret_key
     verification_token_secret = settings.fastapi_secret_key
 
+    async def enqueue(self, kind: str, payload: dict[str, Any]) -> None:
+        """
+        Queue a job in the User database's session, for the job worker to run.
+
+        FastAPI Users runs the hooks after committing the change to the User, so
+        the job commits in a transaction of its own: it is not atomic with the
+        change, and a failure in between leaves the change without its job.
+        The payload is stored in plaintext in `job.payload` until the job
+        completes, and kept if it fails.
+
+        :param kind:
+        :param payload:
+        :return:
+        """
+        session = cast(SQLAlchemyUserDatabase[User, uuid.UUID], self.user_db).session
+        enqueue(session, kind, payload)
+        await session.commit()
+
     async def on_after_register(
         self, user: models.User, request: Request | None = None
     ) -> None:
@@ -46,7 +81,7 @@ class UserManager(UUIDIDMixin, BaseUserManager[models.User, uuid.UUID]):
         :param request:
         :return:
         """
-        logger.info(f"User {user.id} has registered.")
+        await self.enqueue("user.registered", {"user_id": str(user.id)})
 
     async def on_after_forgot_password(
         self, user: models.User, token: str, request: Request | None = None
@@ -54,12 +89,17 @@ class UserManager(UUIDIDMixin, BaseUserManager[models.User, uuid.UUID]):
         """
         Run after a User forgets their password.
 
+        The token is stored in plaintext in the job's payload, usable by anyone
+        reading the job table until it expires.
+
         :param user:
         :param token:
         :param request:
         :return:
         """
-        logger.info(f"User {user.id} has forgot their password. Reset token: {token}")
+        await self.enqueue(
+            "user.forgot_password", {"user_id": str(user.id), "token": token}
+        )
 
     async def on_after_request_verify(
         self, user: models.User, token: str, request: Request | None = None
@@ -67,15 +107,70 @@ class UserManager(UUIDIDMixin, BaseUserManager[models.User, uuid.UUID]):
         """
         Run after a User requests to verify.
 
+        The token is stored in plaintext in the job's payload, usable by anyone
+        reading the job table until it expires.
+
         :param user:
         :param token:
         :param request:
         :return:
         """
-        logger.info(
-            f"Verification requested for user {user.id}. Verification token: {token}"
+        await self.enqueue(
+            "user.request_verify", {"user_id": str(user.id), "token": token}
         )
 
+    async def on_after_update(
+        self,
+        user: models.User,
+        update_dict: dict[str, Any],
+        request: Request | None = None,
+    ) -> None:
+        """
+        Run after a User is updated, including deactivation.
+
+        :param user:
+        :param update_dict:
+        :param request:
+        :return:
+        """
+        await invalidate_user(user.id)
+
+    async def on_after_verify(
+        self, user: models.User, request: Request | None = None
+    ) -> None:
+        """
+        Run after a User is verified.
+
+        :param user:
+        :param request:
+        :return:
+        """
+        await invalidate_user(user.id)
+
+    async def on_after_reset_password(
+        self, user: models.User, request: Request | None = None
+    ) -> None:
+        """
+        Run after a User resets their password.
+
+        :param user:
+        :param request:
+        :return:
+        """
+        await invalidate_user(user.id)
+
+    async def on_after_delete(
+        self, user: models.User, request: Request | None = None
+    ) -> None:
+        """
+        Run after a User is deleted.
+
+        :param user:
+        :param request:
+        :return:
+        """
+        await invalidate_user(user.id)
+
 
 async def get_user_manager(
     user_db: SQLAlchemyUserDatabase[User, uuid.UUID] = Depends(get_user_db),
@@ -92,13 +187,78 @@ async def get_user_manager(
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
 
+class CachedJWTStrategy(JWTStrategy[models.User, uuid.UUID]):
+    """
+    JSON web token strategy that remembers verified tokens until they expire.
+
+    Tokens are keyed by their SHA-256 digest, so the cache never holds a usable
+    token, and map to the subject whose signature and claims were verified.
+    """
+
+    def __init__(self, *args: Any, maxsize: int, **kwargs: Any):
+        """
+        Object with an empty verified-token cache.
+
+        :param args:
+        :param maxsize:
+        :param kwargs:
+        """
+        super().__init__(*args, **kwargs)
+        self.verified: LRUCache[bytes, str] = LRUCache(maxsize)
+
+    async def read_token(
+        self,
+        token: str | None,
+        user_manager: BaseUserManager[models.User, uuid.UUID],
+    ) -> models.User | None:
+        """
+        Retrieve the User of a token, verifying it only on the first use.
+
+        :param token:
+        :param user_manager:
+        :return:
+        """
+        if token is None:
+            return None
+
+        key = hashlib.sha256(token.encode()).digest()
+        if (user_id := self.verified.get(key)) is None:
+            try:
+                data = decode_jwt(
+                    token,
+                    self.decode_key,
+                    self.token_audience,
+                    algorithms=[self.algorithm],
+                )
+            except jwt.PyJWTError:
+                return None
+            if (user_id := data.get("sub")) is None:
+                return None
+            if (expires_at := data.get("exp")) is None:
+                self.verified.set(key, user_id)
+            elif (ttl := expires_at - time.time()) > 0:
+                self.verified.set(key, user_id, ttl=ttl)
+
+        try:
+            return await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+
+jwt_strategy = CachedJWTStrategy(
+    secret=settings.fastapi_secret_key,
+    lifetime_seconds=3600,
+    maxsize=settings.fastapi_jwt_cache_maxsize,
+)
+
+
 def get_jwt_strategy() -> JWTStrategy[User, uuid.UUID]:
     """
-    JSON web token authentication strategy.
+    JSON web token authentication strategy, built once per process.
 
     :return:
     """
-    return JWTStrategy(secret=settings.fastapi_secret_key, lifetime_seconds=3600)
+    return jwt_strategy
 
 
 auth_backend = AuthenticationBackend(
@@ -0,0 +1,327 @@
+"""
+Fan item change events out to the subscribers of each worker.
+
+A trigger on `item` records every create, update and delete in `item_event` and
+notifies the `item_events` channel when its transaction commits. Each worker
+holds one connection listening on the channel, keeps the latest events in
+memory, and hands them to its subscribers; a subscriber resuming from an older
+event id is caught up from the table first.
+
+Event ids come from a sequence, so events of concurrent transactions may commit
+out of id order; they are delivered in commit order, and a client resuming from
+an id may miss an event with a lower id committed just before it disconnected.
+Events are hints to read the item again rather than a log of its values.
+"""
+import asyncio
+import logging
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.config import settings
+from app.db.session import get_engine
+from app.metrics import (
+    ITEM_EVENTS_RECEIVED,
+    ITEM_EVENTS_SUBSCRIBERS,
+    ITEM_EVENTS_SUBSCRIBERS_DROPPED,
+)
+
+logger = logging.getLogger(__name__)
+
+ITEM_EVENTS_CHANNEL = "item_events"
+
+
+def primary_session() -> AsyncSession:
+    """
+    Open a session on the primary database, which replicas may lag behind.
+
+    :return:
+    """
+    return AsyncSession(get_engine(), expire_on_commit=False)
+
+
+def listen_dsn() -> str:
+    """
+    Build the asyncpg DSN of the primary database from SQLAlchemy's.
+
+    :return:
+    """
+    return (
+        make_url(str(settings.sqlalchemy_dsn))
+        .set(drivername="postgresql")
+        .render_as_string(hide_password=False)
+    )
+
+
+class Subscription:
+    """Queue of the events of one subscriber."""
+
+    def __init__(self, owner_id: UUID | None, maxsize: int):
+        """
+        Object with an empty queue.
+
+        :param owner_id: receive only events of this User's items, or None for all
+        :param maxsize:
+        """
+        self.owner_id = owner_id
+        self.queue: asyncio.Queue[schemas.ItemEvent | None] = asyncio.Queue(maxsize)
+
+    def wants(self, event: schemas.ItemEvent) -> bool:
+        """
+        Check if the subscriber receives an event.
+
+        :param event:
+        :return:
+        """
+        return self.owner_id is None or event.owner_id == self.owner_id
+
+
+class EventHub:
+    """
+    In-memory fan-out of item change events to the subscribers of a worker.
+
+    The latest `buffer_size` events are kept to resume subscribers without a
+    database query. A subscriber whose queue fills up is disconnected, to
+    resume from its last event id, rather than slowing down the others.
+    """
+
+    def __init__(
+        self,
+        *,
+        buffer_size: int,
+        queue_maxsize: int,
+        session: Callable[[], AsyncSession] = primary_session,
+    ):
+        """
+        Object with no subscribers.
+
+        :param buffer_size: events kept in memory
+        :param queue_maxsize: events queued per subscriber
+        :param session: factory of the sessions reading `item_event`
+        """
+        self.buffer: deque[schemas.ItemEvent] = deque(maxlen=buffer_size)
+        self.buffered: set[int] = set()
+        self.queue_maxsize = queue_maxsize
+        self.session = session
+        self.subscriptions: set[Subscription] = set()
+        # every event after this id is in the buffer; None until listening
+        self.horizon: int | None = None
+        self.last_id = 0
+
+    def publish(self, event: schemas.ItemEvent) -> None:
+        """
+        Buffer an event and queue it for its subscribers, unless already buffered.
+
+        An event may be both notified and read from the table while catching
+        up, and is published once.
+
+        :param event:
+        :return:
+        """
+        if event.id in self.buffered:
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            evicted = self.buffer[0].id
+            self.buffered.discard(evicted)
+            if self.horizon is not None:
+                self.horizon = max(self.horizon, evicted)
+        self.buffer.append(event)
+        self.buffered.add(event.id)
+        self.last_id = max(self.last_id, event.id)
+        for subscription in list(self.subscriptions):
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        """
+        Disconnect a subscriber that fell behind.
+
+        :param subscription:
+        :return:
+        """
+        self.subscriptions.discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        ITEM_EVENTS_SUBSCRIBERS_DROPPED.inc()
+
+    async def fetch_after(
+        self, after: int, owner_id: UUID | None
+    ) -> AsyncIterator[schemas.ItemEvent]:
+        """
+        Yield the recorded events following an event id, oldest first.
+
+        :param after: event id
+        :param owner_id: only events of this User's items, or None for all
+        :return:
+        """
+        limit = self.buffer.maxlen or 100
+        async with self.session() as db:
+            while True:
+                rows = await crud.item_event.get_after(
+                    db, after=after, owner_id=owner_id, limit=limit
+                )
+                for row in rows:
+                    yield schemas.ItemEvent.model_validate(row)
+                if len(rows) < limit:
+                    return
+                after = rows[-1].id
+
+    async def subscribe(
+        self, *, owner_id: UUID | None, after: int | None, keepalive: float
+    ) -> AsyncIterator[schemas.ItemEvent | None]:
+        """
+        Yield the events following an event id, then those published from now on.
+
+        :param owner_id: only events of this User's items, or None for all
+        :param after: event id to resume from, or None for new events only
+        :param keepalive: seconds without events after which None is yielded
+        :return:
+        """
+        subscription = Subscription(owner_id, self.queue_maxsize)
+        # the buffer is read and the subscription registered without awaiting,
+        # so no event falls between them
+        if after is None:
+            missed = []
+        elif self.horizon is not None and after >= self.horizon:
+            missed = [
+                event
+                for event in self.buffer
+                if event.id > after and subscription.wants(event)
+            ]
+        else:
+            missed = None
+        self.subscriptions.add(subscription)
+        ITEM_EVENTS_SUBSCRIBERS.inc()
+        try:
+            seen: set[int] = set()
+            if missed is None and after is not None:
+                async for event in self.fetch_after(after, owner_id):
+                    seen.add(event.id)
+                    yield event
+            for event in missed or ():
+                yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                if event.id not in seen:
+                    yield event
+        finally:
+            self.subscriptions.discard(subscription)
+            ITEM_EVENTS_SUBSCRIBERS.dec()
+
+    async def catch_up(self) -> None:
+        """
+        Publish the events recorded since the last one received.
+
+        On the first connection the buffer starts empty from the latest event.
+
+        :return:
+        """
+        if self.horizon is None:
+            async with self.session() as db:
+                self.last_id = self.horizon = await crud.item_event.get_last_id(db)
+            return
+        async for event in self.fetch_after(self.last_id, None):
+            self.publish(event)
+
+    async def prune(self, retention: float) -> None:
+        """
+        Delete the recorded events older than the retention.
+
+        :param retention: seconds
+        :return:
+        """
+        before = datetime.now(timezone.utc) - timedelta(seconds=retention)
+        async with self.session() as db:
+            count = await crud.item_event.remove_before(db, before=before)
+        if count:
+            logger.info(f"Pruned {count} item events.")
+
+    def _notified(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        """
+        Publish the event of a notification.
+
+        :param connection:
+        :param pid: of the notifying backend
+        :param channel:
+        :param payload:
+        :return:
+        """
+        ITEM_EVENTS_RECEIVED.inc()
+        self.publish(schemas.ItemEvent.model_validate_json(payload))
+
+    async def listen(
+        self,
+        dsn: str,
+        *,
+        retention: float,
+        ping_interval: float,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        """
+        Receive the events of the database until cancelled.
+
+        The connection is pinged every `ping_interval` seconds, and the events
+        recorded while disconnected are published once reconnected. Events older
+        than the retention are pruned every tenth of it.
+
+        :param dsn: asyncpg DSN of the primary database
+        :param retention: seconds
+        :param ping_interval: seconds
+        :param reconnect_delay: seconds
+        :return:
+        """
+        next_prune = 0.0
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+                try:
+                    await connection.add_listener(ITEM_EVENTS_CHANNEL, self._notified)
+                    await self.catch_up()
+                    while True:
+                        if asyncio.get_running_loop().time() >= next_prune:
+                            await self.prune(retention)
+                            next_prune = asyncio.get_running_loop().time() + (
+                                retention / 10
+                            )
+                        await asyncio.sleep(ping_interval)
+                        await connection.execute("SELECT 1", timeout=ping_interval)
+                finally:
+                    connection.terminate()
+            except (
+                OSError,
+                asyncio.TimeoutError,
+                asyncpg.PostgresError,
+                asyncpg.InterfaceError,
+                SQLAlchemyError,
+            ):
+                logger.warning(
+                    f"Lost the {ITEM_EVENTS_CHANNEL} listener connection, "
+                    "reconnecting."
+                )
+                await asyncio.sleep(reconnect_delay)
+
+
+item_events = EventHub(
+    buffer_size=settings.events_buffer_size,
+    queue_maxsize=settings.events_queue_maxsize,
+)
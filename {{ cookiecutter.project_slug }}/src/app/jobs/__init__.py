@@ -0,0 +1,3 @@
+from .registry import JobRegistry as JobRegistry  # noqa: F401
+from .registry import enqueue as enqueue  # noqa: F401
+from .registry import registry as registry  # noqa: F401
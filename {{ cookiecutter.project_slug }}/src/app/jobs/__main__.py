@@ -0,0 +1,3 @@
+from app.jobs.worker import main
+
+main()
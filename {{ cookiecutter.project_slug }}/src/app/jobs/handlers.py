@@ -0,0 +1,45 @@
+import logging
+from typing import Any
+
+from app.jobs.registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+@registry.register("user.registered")
+async def user_registered(payload: dict[str, Any]) -> None:
+    """
+    Welcome a User who registered.
+
+    :param payload: `user_id`
+    :return:
+    """
+    logger.info(f"User {payload['user_id']} has registered.")
+
+
+@registry.register("user.forgot_password")
+async def user_forgot_password(payload: dict[str, Any]) -> None:
+    """
+    Send a User who forgot their password the reset token.
+
+    :param payload: `user_id` and `token`
+    :return:
+    """
+    logger.info(
+        f"User {payload['user_id']} has forgot their password. "
+        f"Reset token: {payload['token']}"
+    )
+
+
+@registry.register("user.request_verify")
+async def user_request_verify(payload: dict[str, Any]) -> None:
+    """
+    Send a User who requested to verify the verification token.
+
+    :param payload: `user_id` and `token`
+    :return:
+    """
+    logger.info(
+        f"Verification requested for user {payload['user_id']}. "
+        f"Verification token: {payload['token']}"
+    )
@@ -0,0 +1,73 @@
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models
+from app.config import settings
+
+JobFunc = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class JobHandler:
+    """Function running the jobs of a kind, and how many may run at once."""
+
+    func: JobFunc
+    concurrency: int | None = None
+
+
+class JobRegistry:
+    """Handlers of the job kinds a worker runs."""
+
+    def __init__(self) -> None:
+        """Object with no handlers."""
+        self.handlers: dict[str, JobHandler] = {}
+
+    def register(
+        self, kind: str, *, concurrency: int | None = None
+    ) -> Callable[[JobFunc], JobFunc]:
+        """
+        Register the decorated function as the handler of a job kind.
+
+        :param kind:
+        :param concurrency: most jobs of the kind run at once per worker, or
+            None for the worker's limit alone
+        :return:
+        """
+
+        def decorator(func: JobFunc) -> JobFunc:
+            self.handlers[kind] = JobHandler(func, concurrency)
+            return func
+
+        return decorator
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any],
+    *,
+    run_at: datetime | None = None,
+) -> models.Job:
+    """
+    Add a job to the session, queued once the session commits.
+
+    :param db:
+    :param kind:
+    :param payload: JSON serializable arguments of the job
+    :param run_at: not before this time, or now
+    :return:
+    """
+    return crud.job.enqueue(
+        db,
+        kind=kind,
+        payload=payload,
+        max_attempts=settings.jobs_max_attempts,
+        run_at=run_at,
+    )
+
+
+registry = JobRegistry()
@@ -0,0 +1,291 @@
+"""
+Run the background jobs queued in the `job` table.
+
+Any number of workers may run at once; each claims due jobs with
+`FOR UPDATE SKIP LOCKED`, so a job is never claimed twice while its lease lasts::
+
+    python -m app.jobs
+"""
+import asyncio
+import logging
+import random
+import signal
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from prometheus_client import start_http_server
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models
+from app.config import settings, setup_logging
+from app.db.session import async_session, dispose_engines
+from app.jobs.registry import JobRegistry, registry
+from app.metrics import JOBS_DURATION, JOBS_PROCESSED, JOBS_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts: int, base: float, cap: float) -> float:
+    """
+    Compute the delay before retrying a job, doubling with each attempt.
+
+    The delay is jittered down by up to half, so jobs failing together do not
+    retry together.
+
+    :param attempts: made so far
+    :param base: seconds before the first retry
+    :param cap: seconds
+    :return: seconds
+    """
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1)  # noqa: S311
+
+
+class Worker:
+    """
+    Claim due jobs and run them concurrently until stopped.
+
+    A job that raises or outlives the timeout is retried with backoff, and kept
+    as failed after its last attempt. On stop, running jobs are given the
+    timeout to finish; those cancelled are retried once their lease expires.
+    """
+
+    def __init__(
+        self,
+        registry: JobRegistry,
+        *,
+        concurrency: int,
+        poll_interval: float,
+        timeout: float,
+        lease_margin: float,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+        session: Callable[[], AsyncSession] = async_session,
+    ):
+        """
+        Object running no jobs.
+
+        :param registry: handlers of the job kinds to run
+        :param concurrency: most jobs running at once
+        :param poll_interval: seconds between claims while idle
+        :param timeout: seconds a job may run
+        :param lease_margin: seconds its claim outlasts the timeout, to settle it
+        :param backoff_seconds: see `backoff`
+        :param backoff_max_seconds: see `backoff`
+        :param session: factory of the sessions reading and settling jobs
+        """
+        self.registry = registry
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.lease_margin = lease_margin
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.session = session
+        self.running: dict[asyncio.Task[None], str] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """
+        Stop claiming jobs and shut down.
+
+        :return:
+        """
+        self._stopping.set()
+
+    def _claims(self) -> list[tuple[list[str], int]]:
+        """
+        Plan the claims filling the free slots within the limit of each kind.
+
+        :return: kinds and number of jobs of each claim
+        """
+        free = self.concurrency - len(self.running)
+        if free <= 0:
+            return []
+        unlimited = []
+        claims = []
+        running = list(self.running.values())
+        for kind, handler in self.registry.handlers.items():
+            if handler.concurrency is None:
+                unlimited.append(kind)
+            elif (limit := handler.concurrency - running.count(kind)) > 0:
+                claims.append(([kind], min(free, limit)))
+        if unlimited:
+            claims.insert(0, (unlimited, free))
+        return claims
+
+    async def claim(self) -> int:
+        """
+        Claim due jobs into the free slots and start running them.
+
+        :return: the number of jobs started
+        """
+        started = 0
+        for kinds, limit in self._claims():
+            limit = min(limit, self.concurrency - len(self.running))
+            if limit <= 0:
+                break
+            async with self.session() as db:
+                jobs = await crud.job.claim(
+                    db, kinds=kinds, limit=limit, lease=self.timeout + self.lease_margin
+                )
+            for job in jobs:
+                task = asyncio.create_task(self.execute(job))
+                self.running[task] = job.kind
+                task.add_done_callback(self.running.pop)
+            started += len(jobs)
+        return started
+
+    async def execute(self, job: models.Job) -> None:
+        """
+        Run a job and settle it.
+
+        :param job:
+        :return:
+        """
+        handler = self.registry.handlers[job.kind]
+        start = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(handler.func(job.payload), self.timeout)
+        except Exception as exc:
+            error = repr(exc)
+        if error is None:
+            result = "done"
+        elif job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.id} ({job.kind}) failed, giving up: {error}")
+            result = "failed"
+        else:
+            logger.warning(
+                f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}, "
+                f"retrying: {error}"
+            )
+            result = "retried"
+        JOBS_DURATION.labels(kind=job.kind).observe(time.perf_counter() - start)
+        JOBS_PROCESSED.labels(kind=job.kind, result=result).inc()
+        try:
+            async with self.session() as db:
+                if error is None:
+                    settled = await crud.job.complete(
+                        db, id=job.id, attempts=job.attempts
+                    )
+                elif result == "failed":
+                    settled = await crud.job.fail(
+                        db, id=job.id, attempts=job.attempts, error=error
+                    )
+                else:
+                    delay = backoff(
+                        job.attempts, self.backoff_seconds, self.backoff_max_seconds
+                    )
+                    settled = await crud.job.retry(
+                        db,
+                        id=job.id,
+                        attempts=job.attempts,
+                        error=error,
+                        run_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+                    )
+        except SQLAlchemyError:
+            logger.warning(
+                f"Failed to settle job {job.id} ({job.kind}), "
+                "it runs again once its lease expires."
+            )
+            return
+        if not settled:
+            logger.warning(
+                f"Job {job.id} ({job.kind}) lost its lease on attempt "
+                f"{job.attempts}, left to the attempt that claimed it since."
+            )
+
+    async def report_depth(self) -> None:
+        """
+        Export the number of jobs in each status.
+
+        :return:
+        """
+        async with self.session() as db:
+            counts = await crud.job.count_by_status(db)
+        for status, count in counts.items():
+            JOBS_QUEUE_DEPTH.labels(status=status).set(count)
+
+    async def wait(self) -> None:
+        """
+        Wait for a running job to finish, a stop, or the poll interval.
+
+        :return:
+        """
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait(
+            {stopping, *self.running},
+            timeout=self.poll_interval,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        stopping.cancel()
+
+    async def run(self) -> None:
+        """
+        Claim and run jobs until stopped, then wait for the running ones.
+
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        next_report = loop.time()
+        while not self._stopping.is_set():
+            try:
+                started = await self.claim()
+                if loop.time() >= next_report:
+                    await self.report_depth()
+                    next_report = loop.time() + self.poll_interval
+            except SQLAlchemyError:
+                logger.warning("Failed to claim jobs, retrying.")
+                started = 0
+            if not started or len(self.running) >= self.concurrency:
+                await self.wait()
+        if self.running:
+            _, pending = await asyncio.wait(self.running, timeout=self.timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def work() -> None:
+    """
+    Run a worker of the registered jobs until SIGINT or SIGTERM.
+
+    :return:
+    """
+    import app.jobs.handlers  # noqa: F401
+
+    worker = Worker(
+        registry,
+        concurrency=settings.jobs_concurrency,
+        poll_interval=settings.jobs_poll_interval,
+        timeout=settings.jobs_timeout_seconds,
+        lease_margin=settings.jobs_lease_margin_seconds,
+        backoff_seconds=settings.jobs_backoff_seconds,
+        backoff_max_seconds=settings.jobs_backoff_max_seconds,
+    )
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    logger.info(f"Running jobs of kinds {sorted(registry.handlers)}.")
+    try:
+        await worker.run()
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    """
+    Run the worker from the command line.
+
+    :return:
+    """
+    setup_logging(
+        log_level=settings.loguru_level,
+        json_logs=settings.loguru_serialize,
+        enqueue=settings.loguru_enqueue,
+    )
+    if settings.jobs_metrics_port:
+        start_http_server(settings.jobs_metrics_port)
+    asyncio.run(work())
@@ -1,68 +1,184 @@
-import uvicorn
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import cast
+
+import orjson as json
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from prometheus_fastapi_instrumentator import Instrumentator
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from app import __version__
-from app.api.v1 import routers as api_v1
-from app.config import settings, setup_logging
-
-# logging
-setup_logging(log_level=settings.loguru_level, json_logs=settings.loguru_serialize)
-
-# app
-app = FastAPI(
-    debug=settings.fastapi_debug,
-    title=settings.fastapi_title,
-    description=settings.fastapi_description,
-    version=__version__,
-)
-
-# cors
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_allow_origins,
-    allow_credentials=settings.cors_allow_credentials,
-    allow_methods=settings.cors_allow_methods,
-    allow_headers=settings.cors_allow_headers,
-    expose_headers=settings.cors_expose_headers,
-)
-
-# prometheus
-Instrumentator(
-    should_group_status_codes=settings.prometheus_instrumentator_should_group_status_codes,
-    should_ignore_untemplated=settings.prometheus_instrumentator_should_ignore_untemplated,
-    should_respect_env_var=settings.prometheus_instrumentator_should_respect_env_var,
-    should_instrument_requests_inprogress=settings.prometheus_instrumentator_should_instrument_requests_in_progress,
-    excluded_handlers=settings.prometheus_instrumentator_excluded_handlers,
-    env_var_name=settings.prometheus_instrumentator_env_var_name,
-    inprogress_name=settings.prometheus_instrumentator_inprogress_name,
-    inprogress_labels=settings.prometheus_instrumentator_inprogress_labels,
-).instrument(app).expose(
-    app,
-    include_in_schema=settings.prometheus_instrumentator_include_in_schema,
-    should_gzip=settings.prometheus_instrumentator_should_gzip,
-)
-
-# opentelemetry
-FastAPIInstrumentor.instrument_app(app)
-
-# routers
-app.include_router(api_v1.router)
+from app.config import APIPrefix, settings, setup_logging
+from app.db.pool import InstrumentedPool, PoolAdvisor
+from app.db.redis import invalidation_bus, redis
+from app.db.session import dispose_engines, get_engine, get_reader_engines
+from app.events import item_events, listen_dsn
+from app.middleware.admission import AdmissionMiddleware, AIMDLimiter
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
 
-if __name__ == "__main__":
-    uvicorn.run(
-        app=app,
-        host=settings.uvicorn_host,
-        port=settings.uvicorn_port,
-        workers=settings.uvicorn_workers,
-        log_config=settings.uvicorn_log_config,
-        loop=settings.uvicorn_loop,
-        http=settings.uvicorn_http,
-        ws=settings.uvicorn_ws,
-        interface=settings.uvicorn_interface,
-        backlog=settings.uvicorn_backlog,
-        timeout_keep_alive=settings.uvicorn_timeout_keep_alive,
-        timeout_graceful_shutdown=settings.uvicorn_timeout_graceful_shutdown,
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Build the database engines and run background tasks for the lifetime of the app.
+
+    :param _:
+    :return:
+    """
+    engines = (get_engine(), *get_reader_engines())
+    tasks: list[asyncio.Task[None]] = []
+    if settings.cache_enabled:
+        tasks.append(asyncio.create_task(invalidation_bus.listen()))
+    if settings.events_enabled:
+        tasks.append(
+            asyncio.create_task(
+                item_events.listen(
+                    listen_dsn(),
+                    retention=settings.events_retention_seconds,
+                    ping_interval=settings.events_keepalive_seconds,
+                )
+            )
+        )
+    if settings.sqlalchemy_pool_advisor_interval:
+        for pool_engine in engines:
+            advisor = PoolAdvisor(
+                cast(InstrumentedPool, pool_engine.sync_engine.pool),
+                workers=settings.uvicorn_workers,
+            )
+            tasks.append(
+                asyncio.create_task(
+                    advisor.run(settings.sqlalchemy_pool_advisor_interval)
+                )
+            )
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await redis.aclose()
+    await dispose_engines()
+
+
+def create_app() -> FastAPI:
+    """
+    Create the app.
+
+    The routers, and the instrumentation registering its metrics globally, are
+    imported here rather than with this module; call it once per process.
+    The OpenAPI schema is read from `FASTAPI_OPENAPI_SCHEMA` when set, instead
+    of being generated on the first request for it.
+
+    :return:
+    """
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from prometheus_fastapi_instrumentator import Instrumentator
+
+    from app.api.v1.routers import create_router
+    from app.scrape import expose_metrics
+    from app.tracing import build_tracer_provider
+
+    # logging
+    setup_logging(
+        log_level=settings.loguru_level,
+        json_logs=settings.loguru_serialize,
+        enqueue=settings.loguru_enqueue,
+    )
+
+    # app
+    app = FastAPI(
+        debug=settings.fastapi_debug,
+        title=settings.fastapi_title,
+        description=settings.fastapi_description,
+        version=__version__,
+        default_response_class=ORJSONResponse
+        if settings.fastapi_orjson_response
+        else JSONResponse,
+        lifespan=lifespan,
     )
+
+    # admission control, inside cors so that rejections carry its headers
+    app.add_middleware(
+        AdmissionMiddleware,
+        limiter=AIMDLimiter(
+            initial=settings.fastapi_admission_initial_limit,
+            min_limit=settings.fastapi_admission_min_limit,
+            max_limit=settings.fastapi_admission_max_limit,
+            latency_target=settings.fastapi_admission_latency_target,
+            pool_wait_target=settings.fastapi_admission_pool_wait_target,
+            backoff=settings.fastapi_admission_backoff,
+        ),
+        priorities=settings.fastapi_admission_priorities,
+        auth_prefix=f"{APIPrefix.v1.value}{APIPrefix.auth.value}",
+        retry_after=settings.fastapi_admission_retry_after,
+        excluded_handlers=settings.fastapi_admission_excluded_handlers,
+    )
+
+    # cors
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_allow_origins,
+        allow_credentials=settings.cors_allow_credentials,
+        allow_methods=settings.cors_allow_methods,
+        allow_headers=settings.cors_allow_headers,
+        expose_headers=settings.cors_expose_headers,
+    )
+
+    # database statements per request
+    app.add_middleware(
+        QueryStatsMiddleware,
+        n_plus_one_threshold=settings.sqlalchemy_n_plus_one_threshold,
+        server_timing=settings.fastapi_server_timing,
+    )
+
+    # compression
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=settings.fastapi_compression_encodings,
+        minimum_size=settings.fastapi_compression_minimum_size,
+        levels=settings.fastapi_compression_levels,
+        excluded_handlers=settings.fastapi_compression_excluded_handlers,
+    )
+
+    # prometheus
+    Instrumentator(
+        should_group_status_codes=settings.prometheus_instrumentator_should_group_status_codes,
+        should_ignore_untemplated=settings.prometheus_instrumentator_should_ignore_untemplated,
+        should_respect_env_var=settings.prometheus_instrumentator_should_respect_env_var,
+        should_instrument_requests_inprogress=settings.prometheus_instrumentator_should_instrument_requests_in_progress,
+        excluded_handlers=settings.prometheus_instrumentator_excluded_handlers,
+        env_var_name=settings.prometheus_instrumentator_env_var_name,
+        inprogress_name=settings.prometheus_instrumentator_inprogress_name,
+        inprogress_labels=settings.prometheus_instrumentator_inprogress_labels,
+    ).instrument(app)
+    if (
+        settings.prometheus_instrumentator_enable
+        or not settings.prometheus_instrumentator_should_respect_env_var
+    ):
+        expose_metrics(
+            app,
+            cache_seconds=settings.prometheus_metrics_cache_seconds,
+            should_gzip=settings.prometheus_instrumentator_should_gzip,
+            include_in_schema=settings.prometheus_instrumentator_include_in_schema,
+        )
+
+    # opentelemetry
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=build_tracer_provider())
+
+    # routers
+    app.include_router(create_router())
+
+    # openapi
+    if settings.fastapi_openapi_schema:
+        app.openapi_schema = json.loads(
+            Path(settings.fastapi_openapi_schema).read_bytes()
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    from app.server import serve
+
+    serve()
@@ -0,0 +1,144 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Entity cache lookups by cache tier and result.",
+    ["cache", "tier", "result"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full.",
+)
+
+TRACES_SAMPLED = Counter(
+    "traces_sampled_total",
+    "Traces kept or dropped by tail sampling, by decision and reason.",
+    ["decision", "reason"],
+)
+
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database statements run per request, by route.",
+    ["handler"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database statements per request, by route.",
+    ["handler"],
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections of a database pool by state: checked_out, idle or overflow.",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waited to check out a database connection.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that timed out waiting for a database connection.",
+    ["pool"],
+)
+
+DB_POOL_CONNECTION_AGE = Histogram(
+    "db_pool_connection_age_seconds",
+    "Age of database connections when checked out.",
+    ["pool"],
+    buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200),
+)
+
+DB_POOL_RECONNECTS = Counter(
+    "db_pool_reconnects_total",
+    "Database connections replaced, by reason: recycle or invalidate.",
+    ["pool", "reason"],
+)
+
+DB_POOL_SUGGESTED_SIZE = Gauge(
+    "db_pool_suggested_size",
+    "Pool size suggested by the pool advisor from the observed peak.",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+SERVER_WORKER_MEMORY = Gauge(
+    "server_worker_memory_bytes",
+    "Memory of a worker process by kind: rss, pss, shared or private.",
+    ["worker", "kind"],
+    multiprocess_mode="livemax",
+)
+
+SERVER_WORKER_RESTARTS = Counter(
+    "server_worker_restarts_total",
+    "Worker processes restarted after exiting.",
+)
+
+ITEM_EVENTS_RECEIVED = Counter(
+    "item_events_received_total",
+    "Item change events received from the database by a worker.",
+)
+
+ITEM_EVENTS_SUBSCRIBERS = Gauge(
+    "item_events_subscribers",
+    "Clients subscribed to the item change feed.",
+    multiprocess_mode="livesum",
+)
+
+ITEM_EVENTS_SUBSCRIBERS_DROPPED = Counter(
+    "item_events_subscribers_dropped_total",
+    "Subscribers disconnected for falling behind the item change feed.",
+)
+
+JOBS_QUEUE_DEPTH = Gauge(
+    "jobs_queue_depth",
+    "Background jobs by status: pending, running or failed.",
+    ["status"],
+    multiprocess_mode="livemax",
+)
+
+JOBS_PROCESSED = Counter(
+    "jobs_processed_total",
+    "Background job attempts by kind and result: done, retried or failed.",
+    ["kind", "result"],
+)
+
+JOBS_DURATION = Histogram(
+    "jobs_duration_seconds",
+    "Time taken by a background job attempt, by kind.",
+    ["kind"],
+)
+
+ADMISSION_LIMIT = Gauge(
+    "http_admission_limit",
+    "Concurrent requests admitted by the adaptive limit of a worker.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_REJECTED = Counter(
+    "http_admission_rejected_total",
+    "Requests rejected by admission control, by priority class.",
+    ["priority"],
+)
+
+CRUD_READS = Counter(
+    "crud_reads_total",
+    "Reads of a row by primary key, by model and result: "
+    "queried, batched or coalesced.",
+    ["model", "result"],
+)
+
+CRUD_BATCH_SIZE = Histogram(
+    "crud_batch_size",
+    "Primary keys loaded per batched query, by model.",
+    ["model"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
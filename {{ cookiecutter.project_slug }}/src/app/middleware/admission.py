@@ -0,0 +1,180 @@
+import re
+import time
+from collections.abc import Mapping, Sequence
+
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import RequestPriority
+from app.db.query_stats import query_stats
+from app.metrics import ADMISSION_LIMIT, ADMISSION_REJECTED
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit adapted to latency, additive increase multiplicative decrease.
+
+    Each request admitted under the limit and answered within the targets adds
+    `1 / limit`, about one per limit's worth of requests, while the limit is in
+    use. A request over the latency or pool wait target multiplies it by
+    `backoff`, at most once per latency target, so one burst of slow requests
+    counts as a single signal.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        pool_wait_target: float,
+        backoff: float,
+    ):
+        """
+        Object with the initial limit and no requests in flight.
+
+        :param initial:
+        :param min_limit:
+        :param max_limit:
+        :param latency_target: seconds to the start of a response
+        :param pool_wait_target: seconds waited for database connections
+        :param backoff: factor of a decrease, below 1
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.pool_wait_target = pool_wait_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.set(self.limit)
+
+    def acquire(self, share: float) -> bool:
+        """
+        Admit a request if those in flight are under its share of the limit.
+
+        :param share: of the limit usable by the request's priority class
+        :return: whether the request was admitted
+        """
+        if self.in_flight >= self.limit * share:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: float, pool_wait: float) -> None:
+        """
+        Finish an admitted request, adapting the limit to how it went.
+
+        :param latency: seconds
+        :param pool_wait: seconds
+        :return:
+        """
+        in_flight, self.in_flight = self.in_flight, self.in_flight - 1
+        if latency > self.latency_target or pool_wait > self.pool_wait_target:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            return
+        ADMISSION_LIMIT.set(self.limit)
+
+
+class AdmissionMiddleware:
+    """
+    Shed the requests over an adaptive concurrency limit.
+
+    Requests are classed as auth, by path, then as reads or writes, by method;
+    each class may fill its share of the limit, so reads are shed first and
+    auth last. A rejected request is answered at once with 503 and
+    `Retry-After`, instead of queueing for a database connection. Requests to
+    a path matching `excluded_handlers`, such as long-lived streams, are not
+    counted.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        limiter: AIMDLimiter,
+        priorities: Mapping[RequestPriority, float],
+        auth_prefix: str,
+        retry_after: int,
+        excluded_handlers: Sequence[str] = (),
+    ):
+        """
+        Object wrapping an ASGI app.
+
+        :param app:
+        :param limiter:
+        :param priorities: share of the limit of each priority class
+        :param auth_prefix: path prefix of the auth routes
+        :param retry_after: seconds
+        :param excluded_handlers: path patterns of requests not to limit
+        """
+        self.app = app
+        self.limiter = limiter
+        self.priorities = priorities
+        self.auth_prefix = auth_prefix
+        self.retry_after = retry_after
+        self.excluded_handlers = [re.compile(pattern) for pattern in excluded_handlers]
+
+    def classify(self, scope: Scope) -> RequestPriority:
+        """
+        Find the priority class of a request.
+
+        :param scope:
+        :return:
+        """
+        if scope["path"].startswith(self.auth_prefix):
+            return RequestPriority.auth
+        if scope["method"] in READ_METHODS:
+            return RequestPriority.read
+        return RequestPriority.write
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request.
+
+        :param scope:
+        :param receive:
+        :param send:
+        :return:
+        """
+        if scope["type"] != "http" or any(
+            pattern.search(scope["path"]) for pattern in self.excluded_handlers
+        ):
+            await self.app(scope, receive, send)
+            return
+        priority = self.classify(scope)
+        if not self.limiter.acquire(self.priorities.get(priority, 1.0)):
+            ADMISSION_REJECTED.labels(priority=priority.value).inc()
+            response = Response(
+                status_code=503, headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        latency = None
+
+        async def send_timed(message: Message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            stats = query_stats.get()
+            self.limiter.release(
+                time.perf_counter() - start if latency is None else latency,
+                stats.pool_wait if stats is not None else 0.0,
+            )
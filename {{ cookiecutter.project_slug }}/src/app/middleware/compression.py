@@ -0,0 +1,316 @@
+import re
+import zlib
+from collections.abc import Callable, Mapping, Sequence
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.conditional import encoded_tag
+from app.config import ContentEncoding
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class Compressor(Protocol):
+    """Incremental encoder of a response body."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Encode a chunk, flushing it so the client can decode it at once."""
+
+    def finish(self) -> bytes:
+        """End the stream."""
+
+
+class GzipCompressor:
+    """Gzip encoder."""
+
+    def __init__(self, level: int):
+        """
+        Object with a gzip stream.
+
+        :param level: 1-9
+        """
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Encode a chunk.
+
+        :param data:
+        :return:
+        """
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        """
+        End the stream.
+
+        :return:
+        """
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """Brotli encoder."""
+
+    def __init__(self, level: int):
+        """
+        Object with a brotli stream.
+
+        :param level: quality, 0-11
+        """
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Encode a chunk.
+
+        :param data:
+        :return:
+        """
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        """
+        End the stream.
+
+        :return:
+        """
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    """Zstandard encoder."""
+
+    def __init__(self, level: int):
+        """
+        Object with a zstd stream.
+
+        :param level: 1-22
+        """
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Encode a chunk.
+
+        :param data:
+        :return:
+        """
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        """
+        End the stream.
+
+        :return:
+        """
+        return self._compressor.flush()
+
+
+DEFAULT_LEVELS = {
+    ContentEncoding.zstd: 3,
+    ContentEncoding.br: 4,
+    ContentEncoding.gzip: 6,
+}
+
+# encoders of the installed libraries; brotli and zstandard are optional, see
+# the `compression` extra
+COMPRESSORS: dict[ContentEncoding, Callable[[int], Compressor]] = {
+    ContentEncoding.gzip: GzipCompressor,
+}
+if brotli is not None:
+    COMPRESSORS[ContentEncoding.br] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS[ContentEncoding.zstd] = ZstdCompressor
+
+
+def negotiate(
+    accept_encoding: str, encodings: Sequence[ContentEncoding]
+) -> ContentEncoding | None:
+    """
+    Choose the encoding of a response from an `Accept-Encoding` header.
+
+    The encoding with the highest quality value wins, ties going to the first
+    in `encodings`; `*` stands for any encoding not listed, and `q=0` refuses.
+
+    :param accept_encoding:
+    :param encodings: offered, in order of preference
+    :return: None to send the response unencoded
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            qualities[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = qualities.get(encoding.value, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies with the best encoding the client accepts.
+
+    Bodies sent whole are compressed once they reach `minimum_size`; streamed
+    bodies are compressed chunk by chunk, each flushed so clients receive it
+    without waiting for the rest. Responses already encoded, without a body,
+    of Server-Sent Events, or to a path matching `excluded_handlers` are left
+    alone. Strong entity
+    tags of compressed bodies name the encoding, see `encoded_tag`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        encodings: Sequence[ContentEncoding],
+        minimum_size: int,
+        levels: Mapping[ContentEncoding, int],
+        excluded_handlers: Sequence[str] = (),
+    ):
+        """
+        Object wrapping an ASGI app.
+
+        :param app:
+        :param encodings: offered, in order of preference; those whose library
+            is not installed are skipped
+        :param minimum_size: bytes of the smallest whole body to compress
+        :param levels: compression level of each encoding
+        :param excluded_handlers: path patterns of responses not to compress
+        """
+        self.app = app
+        self.encodings = [encoding for encoding in encodings if encoding in COMPRESSORS]
+        self.minimum_size = minimum_size
+        self.levels = levels
+        self.excluded_handlers = [re.compile(pattern) for pattern in excluded_handlers]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request.
+
+        :param scope:
+        :param receive:
+        :param send:
+        :return:
+        """
+        if scope["type"] != "http" or any(
+            pattern.search(scope["path"]) for pattern in self.excluded_handlers
+        ):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(
+            Headers(scope=scope).get("Accept-Encoding", ""), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressedSend(send, self, encoding))
+
+
+class CompressedSend:
+    """Sender compressing the body of one response."""
+
+    def __init__(
+        self,
+        send: Send,
+        middleware: CompressionMiddleware,
+        encoding: ContentEncoding,
+    ):
+        """
+        Object wrapping the sender of a response.
+
+        :param send:
+        :param middleware:
+        :param encoding:
+        """
+        self.send = send
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start: Message = {}
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        """
+        Send a message of the response.
+
+        :param message:
+        :return:
+        """
+        if self.passthrough:
+            await self.send(message)
+        elif message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            # hold the start until the first body chunk decides the encoding,
+            # except for event streams, whose clients wait on it to open
+            self.start = message
+            self.passthrough = "content-encoding" in headers or headers.get(
+                "content-type", ""
+            ).startswith("text/event-stream")
+            if self.passthrough:
+                await self.send(message)
+        elif message["type"] == "http.response.body":
+            await self.send_body(message)
+        else:
+            await self.send(message)
+
+    async def send_body(self, message: Message) -> None:
+        """
+        Send a body chunk, compressed.
+
+        :param message:
+        :return:
+        """
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and (not body or len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compressor = COMPRESSORS[self.encoding](
+                self.middleware.levels.get(self.encoding, DEFAULT_LEVELS[self.encoding])
+            )
+            headers = MutableHeaders(scope=self.start)
+            headers["Content-Encoding"] = self.encoding.value
+            headers.add_vary_header("Accept-Encoding")
+            del headers["Content-Length"]
+            if etag := headers.get("ETag"):
+                headers["ETag"] = encoded_tag(etag, self.encoding)
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({**message, "body": body})
+                return
+            await self.send(self.start)
+        body = self.compressor.compress(body) if body else b""
+        if not more_body:
+            body += self.compressor.finish()
+        await self.send({**message, "body": body, "more_body": more_body})
@@ -0,0 +1,95 @@
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.query_stats import QueryStats, query_stats
+from app.metrics import REQUEST_DB_DURATION, REQUEST_DB_QUERIES
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Find the path template of the route handling a request.
+
+    :param scope:
+    :return:
+    """
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return str(route.path)
+    return "none"
+
+
+class QueryStatsMiddleware:
+    """
+    Collect the database statements of each request.
+
+    The count and time of the statements run before the response starts are sent
+    in a `Server-Timing` header. Once the response ends, all statements are
+    observed in histograms by route, and a warning is logged for each table
+    queried more than `n_plus_one_threshold` times, the mark of an N+1 pattern.
+    """
+
+    def __init__(self, app: ASGIApp, *, n_plus_one_threshold: int, server_timing: bool):
+        """
+        Object wrapping an ASGI app.
+
+        :param app:
+        :param n_plus_one_threshold: statements per table before warning
+        :param server_timing: send the `Server-Timing` header
+        """
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request.
+
+        :param scope:
+        :param receive:
+        :param send:
+        :return:
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.server_timing:
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            query_stats.reset(token)
+            self.observe(scope, stats)
+
+    def observe(self, scope: Scope, stats: QueryStats) -> None:
+        """
+        Record the statements of a finished request.
+
+        :param scope:
+        :param stats:
+        :return:
+        """
+        handler = route_template(scope)
+        REQUEST_DB_QUERIES.labels(handler=handler).observe(stats.count)
+        REQUEST_DB_DURATION.labels(handler=handler).observe(stats.duration)
+        for table, count in stats.tables.items():
+            if count > self.n_plus_one_threshold:
+                logger.warning(
+                    f"{scope['method']} {handler} queried {table} {count} times, "
+                    f"possible N+1"
+                )
@@ -1,2 +1,4 @@
 from .item import Item as Item  # noqa: F401
+from .item_event import ItemEvent as ItemEvent  # noqa: F401
+from .job import Job as Job  # noqa: F401
 from .user import User as User  # noqa: F401
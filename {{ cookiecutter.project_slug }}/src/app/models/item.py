@@ -1,21 +1,57 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import UUID, Column, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    UUID,
+    Column,
+    Computed,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+    literal_column,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
-from src.app.db.base_class import Base
+from app.db.base_class import Base
 
 if TYPE_CHECKING:
     from .user import User  # noqa: F401, isort:skip
 
+SEARCH_CONFIG = literal_column("'english'", type_=REGCONFIG)
+
 
 class Item(Base):
     """Item database model."""
 
     __tablename__ = "item"
+    __table_args__ = (
+        Index("ix_item_owner_id_id", "owner_id", "id"),
+        Index("ix_item_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    description = Column(String, index=True)
+    description = Column(String)
     owner_id = Column(UUID, ForeignKey("user.id"))
     owner = relationship("User", back_populates="items")
+    version_id = Column(Integer, nullable=False, server_default="1")
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                func.setweight(
+                    func.to_tsvector(SEARCH_CONFIG, func.coalesce(title, "")), "A"
+                ).op("||")(
+                    func.setweight(
+                        func.to_tsvector(SEARCH_CONFIG, func.coalesce(description, "")),
+                        "B",
+                    )
+                ),
+                persisted=True,
+            ),
+        )
+    )
+
+    __mapper_args__ = {"version_id_col": version_id}
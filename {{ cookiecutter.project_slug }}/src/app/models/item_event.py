@@ -0,0 +1,28 @@
+from sqlalchemy import (
+    UUID,
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    func,
+)
+
+from app.db.base_class import Base
+
+
+class ItemEvent(Base):
+    """Item change event database model, written by a trigger on `item`."""
+
+    __tablename__ = "item_event"
+    __table_args__ = (Index("ix_item_event_owner_id_id", "owner_id", "id"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    item_id = Column(Integer, nullable=False)
+    owner_id = Column(UUID)
+    op = Column(String, nullable=False)
+    version_id = Column(Integer)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
@@ -1,10 +1,15 @@
+from typing import TYPE_CHECKING
+
 from fastapi_users_db_sqlalchemy import (
     SQLAlchemyBaseOAuthAccountTableUUID,
     SQLAlchemyBaseUserTableUUID,
 )
 from sqlalchemy.orm import Mapped, relationship
 
-from src.app.db.base_class import Base
+from app.db.base_class import Base
+
+if TYPE_CHECKING:
+    from .item import Item  # noqa: F401, isort:skip
 
 
 class OAuthAccount(SQLAlchemyBaseOAuthAccountTableUUID, Base):
@@ -19,3 +24,4 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
     oauth_accounts: Mapped[list[OAuthAccount]] = relationship(
         "OAuthAccount", lazy="joined"
     )
+    items: Mapped[list["Item"]] = relationship("Item", back_populates="owner")
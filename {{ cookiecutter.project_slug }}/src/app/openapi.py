@@ -0,0 +1,35 @@
+"""
+Write the OpenAPI schema of the app.
+
+Served instead of a generated one when `FASTAPI_OPENAPI_SCHEMA` is set::
+
+    python -m app.openapi openapi.json
+"""
+import argparse
+from pathlib import Path
+
+import orjson as json
+
+from app.main import create_app
+
+
+def main() -> None:
+    """
+    Write the schema from the command line.
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    app = create_app()
+    # generate the schema rather than serve the one read at startup
+    app.openapi_schema = None
+    args.path.write_bytes(json.dumps(app.openapi()))
+
+
+if __name__ == "__main__":
+    main()
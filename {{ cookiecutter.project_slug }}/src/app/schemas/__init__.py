@@ -1,15 +1,27 @@
 from .item import (
     Item as Item,
 )
+from .item import (
+    ItemBulkResult as ItemBulkResult,
+)
+from .item import (
+    ItemBulkUpdate as ItemBulkUpdate,
+)
 from .item import (
     ItemCreate as ItemCreate,
 )
 from .item import (
     ItemInDB as ItemInDB,
 )
+from .item import (
+    ItemPage as ItemPage,
+)
 from .item import (
     ItemUpdate as ItemUpdate,
 )
+from .item_event import (
+    ItemEvent as ItemEvent,
+)
 
 # noqa: F401
 from .user import (
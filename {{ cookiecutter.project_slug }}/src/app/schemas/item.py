@@ -22,6 +22,12 @@ class ItemUpdate(ItemBase):
     pass
 
 
+class ItemBulkUpdate(ItemUpdate):
+    """Bulk update model properties."""
+
+    id: int
+
+
 class ItemInDBBase(ItemBase):
     """Database base model properties."""
 
@@ -30,6 +36,7 @@ class ItemInDBBase(ItemBase):
     id: int
     title: str
     owner_id: UUID
+    version_id: int
 
 
 class Item(ItemInDBBase):
@@ -42,3 +49,18 @@ class ItemInDB(ItemInDBBase):
     """In database model properties."""
 
     pass
+
+
+class ItemPage(BaseModel):
+    """Page of items with the cursor of the next page."""
+
+    items: list[Item]
+    next_cursor: str | None = None
+
+
+class ItemBulkResult(BaseModel):
+    """Outcome of one row of a bulk action."""
+
+    index: int
+    item: Item | None = None
+    error: str | None = None
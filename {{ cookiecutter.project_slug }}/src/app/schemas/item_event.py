@@ -0,0 +1,16 @@
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ItemEvent(BaseModel):
+    """Change of an item, as streamed by the change feed."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    item_id: int
+    owner_id: UUID | None = None
+    op: Literal["create", "update", "delete"]
+    version_id: int | None = None
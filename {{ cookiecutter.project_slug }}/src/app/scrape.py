@@ -0,0 +1,222 @@
+import fcntl
+import gzip
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+)
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+logger = logging.getLogger(__name__)
+
+# metric files keeping the values of a worker once it exits
+ACCUMULATED_TYPES = ("counter", "histogram", "summary")
+
+
+def multiprocess_dir() -> Path | None:
+    """
+    Retrieve the directory shared by the workers' metric files.
+
+    It is read from the environment, as `prometheus_client` does when it is
+    imported, rather than from the settings.
+
+    :return: None outside multiprocess mode
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    return Path(path) if path else None
+
+
+def is_alive(pid: int) -> bool:
+    """
+    Check whether a process is running.
+
+    :param pid:
+    :return:
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_pids(path: Path) -> Iterator[int]:
+    """
+    Yield the pids of the workers with metric files.
+
+    :param path:
+    :return:
+    """
+    pids = set()
+    for file in path.glob("*.db"):
+        pid = file.stem.rpartition("_")[2]
+        if pid.isdigit():
+            pids.add(int(pid))
+    yield from sorted(pids)
+
+
+@contextmanager
+def lock_directory(path: Path, *, exclusive: bool) -> Iterator[None]:
+    """
+    Lock the metric files of a directory across processes.
+
+    Compaction takes the lock exclusively, as it moves samples between files;
+    reads take it shared, or they could miss a file being unlinked or count its
+    samples twice.
+
+    :param path:
+    :param exclusive: to compact, rather than to read
+    :return:
+    """
+    with open(path / "compact.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def compact_worker(path: Path, pid: int) -> None:
+    """
+    Fold the metric files of an exited worker into the archive files.
+
+    Counters, histograms and summaries are added to `<type>_archive.db`, so
+    their totals stay monotonic while the number of files stays bounded by the
+    live workers. The worker's live gauges are removed.
+
+    :param path:
+    :param pid:
+    :return:
+    """
+    for kind in ACCUMULATED_TYPES:
+        file = path / f"{kind}_{pid}.db"
+        if not file.exists():
+            continue
+        archive = MmapedDict(str(path / f"{kind}_archive.db"))
+        try:
+            for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(
+                str(file)
+            ):
+                archive.write_value(key, archive.read_value(key)[0] + value, timestamp)
+        finally:
+            archive.close()
+        file.unlink()
+    mark_process_dead(pid, str(path))
+
+
+def compact_dead_workers(path: Path) -> list[int]:
+    """
+    Compact the metric files of every exited worker.
+
+    Workers scraping at once, and the supervisor, are serialized by an
+    exclusive lock on the directory.
+
+    :param path:
+    :return: the pids compacted
+    """
+    with lock_directory(path, exclusive=True):
+        dead = [pid for pid in worker_pids(path) if not is_alive(pid)]
+        for pid in dead:
+            compact_worker(path, pid)
+    if dead:
+        logger.info(f"Compacted the metric files of exited workers {dead}")
+    return dead
+
+
+class ScrapeCache:
+    """
+    Exposition of the metrics, regenerated at most once per `ttl` seconds.
+
+    In multiprocess mode every worker's files are read and merged on each
+    regeneration, after compacting those of exited workers; caching keeps the
+    cost of frequent or concurrent scrapes independent of the worker count.
+    """
+
+    def __init__(self, ttl: float, path: Path | None = None):
+        """
+        Object caching the exposition.
+
+        :param ttl: seconds, or 0 to regenerate on every scrape
+        :param path: the multiprocess directory, or None for this process only
+        """
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._expires = 0.0
+        self._content = b""
+        self._gzipped: bytes | None = None
+
+    def generate(self) -> bytes:
+        """
+        Generate the exposition.
+
+        :return:
+        """
+        if self.path is None:
+            return generate_latest(REGISTRY)
+        compact_dead_workers(self.path)
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry, str(self.path))
+        # the files are read on collection, so a compaction waits for it
+        with lock_directory(self.path, exclusive=False):
+            return generate_latest(registry)
+
+    def get(self, *, gzipped: bool = False) -> bytes:
+        """
+        Retrieve the exposition, regenerating it once expired.
+
+        :param gzipped:
+        :return:
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires:
+                self._content, self._gzipped = self.generate(), None
+                self._expires = now + self.ttl
+            if not gzipped:
+                return self._content
+            if self._gzipped is None:
+                self._gzipped = gzip.compress(self._content)
+            return self._gzipped
+
+
+def expose_metrics(
+    app: FastAPI,
+    *,
+    cache_seconds: float,
+    should_gzip: bool,
+    include_in_schema: bool,
+    endpoint: str = "/metrics",
+) -> None:
+    """
+    Serve the metrics of every worker, in multiprocess mode, or of this process.
+
+    :param app:
+    :param cache_seconds: see `ScrapeCache`
+    :param should_gzip: compress when the scraper accepts gzip
+    :param include_in_schema:
+    :param endpoint:
+    :return:
+    """
+    cache = ScrapeCache(cache_seconds, multiprocess_dir())
+
+    @app.get(endpoint, include_in_schema=include_in_schema)
+    def metrics(request: Request) -> Response:
+        """Serve the Prometheus metrics."""
+        if should_gzip and "gzip" in request.headers.get("Accept-Encoding", ""):
+            return Response(
+                content=cache.get(gzipped=True),
+                media_type=CONTENT_TYPE_LATEST,
+                headers={"Content-Encoding": "gzip"},
+            )
+        return Response(content=cache.get(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,261 @@
+"""
+Serve the app from preforked uvicorn workers.
+
+The app is created and warmed once in the parent, which then freezes the
+collected heap out of the garbage collector and forks the workers; the modules,
+routes and OpenAPI schema stay on pages shared copy-on-write with every worker.
+Workers that die are restarted, and the memory of each is logged::
+
+    python -m app
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from collections.abc import Callable
+from pathlib import Path
+from types import FrameType
+
+import uvicorn
+
+from app.config import flush_logging, settings
+from app.metrics import SERVER_WORKER_MEMORY, SERVER_WORKER_RESTARTS
+from app.scrape import compact_dead_workers, multiprocess_dir
+
+logger = logging.getLogger(__name__)
+
+# fields of /proc/<pid>/smaps_rollup, in kB
+MEMORY_FIELDS = {
+    "rss": ("Rss",),
+    "pss": ("Pss",),
+    "shared": ("Shared_Clean", "Shared_Dirty"),
+    "private": ("Private_Clean", "Private_Dirty"),
+}
+
+
+def read_memory(pid: int) -> dict[str, int] | None:
+    """
+    Read the memory of a process from procfs.
+
+    `pss` splits the shared pages between the processes sharing them, so the
+    sum over the workers is their real footprint.
+
+    :param pid:
+    :return: bytes by kind, or None where procfs is unavailable
+    """
+    try:
+        lines = Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        fields[name] = int(value.split()[0]) * 1024
+    return {
+        kind: sum(fields.get(name, 0) for name in names)
+        for kind, names in MEMORY_FIELDS.items()
+    }
+
+
+class Supervisor:
+    """
+    Fork workers running a target, and restart those that exit.
+
+    Workers are numbered by their slot, which a restarted worker takes over.
+    On SIGINT or SIGTERM the workers are sent SIGTERM, and killed if they have
+    not exited within the graceful shutdown timeout.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[], None],
+        *,
+        workers: int,
+        memory_report_interval: float,
+        shutdown_timeout: float,
+        restart_delay: float = 1.0,
+    ):
+        """
+        Object supervising the workers.
+
+        :param target: run in each worker
+        :param workers:
+        :param memory_report_interval: seconds, or 0 to not report
+        :param shutdown_timeout: seconds
+        :param restart_delay: seconds to wait before restarting a worker that
+            exited sooner than this after starting
+        """
+        self.target = target
+        self.workers = workers
+        self.memory_report_interval = memory_report_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_delay = restart_delay
+        self.slots: dict[int, tuple[int, float]] = {}
+        self.restarts = 0
+        self._stopping = False
+
+    def spawn(self, slot: int) -> None:
+        """
+        Fork a worker into a slot.
+
+        :param slot:
+        :return:
+        """
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                for signum in (signal.SIGINT, signal.SIGTERM):
+                    signal.signal(signum, signal.SIG_DFL)
+                self.target()
+            except BaseException:
+                logger.exception(f"Worker {slot} failed")
+                code = 1
+            finally:
+                flush_logging()
+                os._exit(code)
+        self.slots[pid] = (slot, time.monotonic())
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def stop(self, *_: int | FrameType | None) -> None:
+        """
+        Stop restarting workers and shut down.
+
+        :param _: signal handler arguments
+        :return:
+        """
+        self._stopping = True
+
+    def reap(self) -> None:
+        """
+        Restart the workers that exited.
+
+        :return:
+        """
+        while self.slots:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            slot, started = self.slots.pop(pid)
+            if path := multiprocess_dir():
+                compact_dead_workers(path)
+            if self._stopping:
+                continue
+            logger.warning(
+                f"Worker {slot} (pid {pid}) exited with status "
+                f"{os.waitstatus_to_exitcode(status)}, restarting"
+            )
+            if time.monotonic() - started < self.restart_delay:
+                time.sleep(self.restart_delay)
+            self.restarts += 1
+            SERVER_WORKER_RESTARTS.inc()
+            self.spawn(slot)
+
+    def report_memory(self) -> None:
+        """
+        Log and export the memory of each worker.
+
+        :return:
+        """
+        for pid, (slot, _) in sorted(self.slots.items(), key=lambda item: item[1]):
+            memory = read_memory(pid)
+            if memory is None:
+                return
+            for kind, value in memory.items():
+                SERVER_WORKER_MEMORY.labels(worker=str(slot), kind=kind).set(value)
+            logger.info(
+                f"Worker {slot} (pid {pid}) memory: "
+                + ", ".join(
+                    f"{kind} {value / 2**20:.1f} MiB" for kind, value in memory.items()
+                )
+            )
+
+    def shutdown(self) -> None:
+        """
+        Terminate the workers and wait for them to exit.
+
+        :return:
+        """
+        for pid in self.slots:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self.slots and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.slots:
+            logger.warning(f"Killing worker pid {pid}")
+            os.kill(pid, signal.SIGKILL)
+        while self.slots:
+            pid, _ = os.waitpid(-1, 0)
+            self.slots.pop(pid, None)
+
+    def run(self) -> None:
+        """
+        Fork the workers and supervise them until stopped.
+
+        :return:
+        """
+        for slot in range(self.workers):
+            self.spawn(slot)
+        next_report = time.monotonic() + self.memory_report_interval
+        while not self._stopping:
+            self.reap()
+            if self.memory_report_interval and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report += self.memory_report_interval
+            time.sleep(0.1)
+        self.shutdown()
+
+
+def serve() -> None:
+    """
+    Create the app once, then serve it from supervised workers.
+
+    :return:
+    """
+    # metric files of a previous run belong to no live worker
+    if path := multiprocess_dir():
+        for file in path.glob("*.db"):
+            if not file.stem.endswith(f"_{os.getpid()}"):
+                file.unlink()
+
+    from app.main import create_app
+
+    app = create_app()
+    app.openapi()
+    config = uvicorn.Config(
+        app=app,
+        host=settings.uvicorn_host,
+        port=settings.uvicorn_port,
+        log_config=settings.uvicorn_log_config,
+        loop=settings.uvicorn_loop,
+        http=settings.uvicorn_http,
+        ws=settings.uvicorn_ws,
+        interface=settings.uvicorn_interface,
+        backlog=settings.uvicorn_backlog,
+        timeout_keep_alive=settings.uvicorn_timeout_keep_alive,
+        timeout_graceful_shutdown=settings.uvicorn_timeout_graceful_shutdown,
+    )
+    config.load()
+    sock: socket.socket = config.bind_socket()
+
+    def target() -> None:
+        uvicorn.Server(config).run(sockets=[sock])
+
+    supervisor = Supervisor(
+        target,
+        workers=settings.uvicorn_workers,
+        memory_report_interval=settings.server_memory_report_interval,
+        shutdown_timeout=settings.uvicorn_timeout_graceful_shutdown + 5,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, supervisor.stop)
+    if settings.server_gc_freeze:
+        gc.collect()
+        gc.freeze()
+    try:
+        supervisor.run()
+    finally:
+        sock.close()
@@ -0,0 +1,176 @@
+import threading
+from typing import Literal
+
+from opentelemetry.context import Context
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import (
+    ReadableSpan,
+    Span,
+    SpanProcessor,
+    SynchronousMultiSpanProcessor,
+    TracerProvider,
+)
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.trace import StatusCode
+
+from app.cache import LRUCache
+from app.config import settings
+from app.metrics import TRACES_SAMPLED
+
+_TRACE_ID_LIMIT = 1 << 64
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Span processor that decides whether to export a trace once its root ends.
+
+    Spans are buffered per trace until the local root span ends. Traces with an
+    error or a root slower than the latency threshold are always kept; the rest
+    are kept when their trace id falls within the sample ratio, so services
+    sampling by trace id agree. Kept traces are passed on to `processor`.
+    """
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        *,
+        latency_threshold_ms: int,
+        ratio: float,
+        max_traces: int,
+    ):
+        """
+        Object buffering the spans of up to `max_traces` open traces.
+
+        :param processor: processor exporting the kept spans
+        :param latency_threshold_ms:
+        :param ratio: fraction of fast, successful traces to keep
+        :param max_traces: open traces to buffer before dropping the oldest
+        """
+        self.processor = processor
+        self.latency_threshold_ns = latency_threshold_ms * 1_000_000
+        self.ratio_bound = round(ratio * _TRACE_ID_LIMIT)
+        self.max_traces = max_traces
+        self._traces: dict[int, list[ReadableSpan]] = {}
+        # decisions of recent traces, for spans that end after their root
+        self._decisions: LRUCache[int, bool] = LRUCache(max_traces)
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        """
+        Start a span; nothing is decided until its trace's root span ends.
+
+        :param span:
+        :param parent_context:
+        :return:
+        """
+
+    def on_end(self, span: ReadableSpan) -> None:
+        """
+        Buffer an ended span and decide its trace when it is the local root.
+
+        :param span:
+        :return:
+        """
+        trace_id = span.context.trace_id
+        with self._lock:
+            if (keep := self._decisions.get(trace_id)) is not None:
+                spans = [span] if keep else []
+            elif span.parent is not None and not span.parent.is_remote:
+                self._buffer(trace_id, span)
+                return
+            else:
+                spans = [*self._traces.pop(trace_id, []), span]
+                keep = self._decide(trace_id, spans, span)
+                self._decisions.set(trace_id, keep)
+        for kept in spans if keep else ():
+            self.processor.on_end(kept)
+
+    def _buffer(self, trace_id: int, span: ReadableSpan) -> None:
+        """
+        Buffer a span until its trace is decided, dropping the oldest open trace.
+
+        :param trace_id:
+        :param span:
+        :return:
+        """
+        if trace_id not in self._traces and len(self._traces) >= self.max_traces:
+            del self._traces[next(iter(self._traces))]
+            TRACES_SAMPLED.labels(decision="dropped", reason="overflow").inc()
+        self._traces.setdefault(trace_id, []).append(span)
+
+    def _decide(
+        self, trace_id: int, spans: list[ReadableSpan], root: ReadableSpan
+    ) -> bool:
+        """
+        Decide whether to keep a trace and count the decision.
+
+        :param trace_id:
+        :param spans:
+        :param root:
+        :return:
+        """
+        reason: Literal["error", "latency", "ratio"]
+        if any(span.status.status_code is StatusCode.ERROR for span in spans):
+            keep, reason = True, "error"
+        elif (root.end_time or 0) - (root.start_time or 0) >= self.latency_threshold_ns:
+            keep, reason = True, "latency"
+        else:
+            keep, reason = trace_id % _TRACE_ID_LIMIT < self.ratio_bound, "ratio"
+        TRACES_SAMPLED.labels(
+            decision="kept" if keep else "dropped", reason=reason
+        ).inc()
+        return keep
+
+    def shutdown(self) -> None:
+        """
+        Drop the open traces and shut down the wrapped processor.
+
+        :return:
+        """
+        with self._lock:
+            self._traces.clear()
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Export the kept spans of the wrapped processor.
+
+        :param timeout_millis:
+        :return:
+        """
+        return self.processor.force_flush(timeout_millis)
+
+
+def build_tracer_provider() -> TracerProvider:
+    """
+    Build a tracer provider exporting tail-sampled traces to the configured exporters.
+
+    :return:
+    """
+    tracer_provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: settings.otel_service_name})
+    )
+    processors: list[SpanProcessor] = []
+    for name in settings.otel_traces_exporter.split(","):
+        if name == "otlp":
+            exporter = OTLPSpanExporter(
+                endpoint=settings.otel_exporter_otlp_traces_endpoint
+            )
+            processors.append(BatchSpanProcessor(exporter))
+        elif name == "console":
+            processors.append(BatchSpanProcessor(ConsoleSpanExporter()))
+    if not processors:
+        return tracer_provider
+    exporters = SynchronousMultiSpanProcessor()
+    for processor in processors:
+        exporters.add_span_processor(processor)
+    tracer_provider.add_span_processor(
+        TailSamplingSpanProcessor(
+            exporters,
+            latency_threshold_ms=settings.otel_tail_sampling_latency_ms,
+            ratio=settings.otel_tail_sampling_ratio,
+            max_traces=settings.otel_tail_sampling_max_traces,
+        )
+    )
+    return tracer_provider
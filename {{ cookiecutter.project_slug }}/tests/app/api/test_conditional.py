@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.conditional import (
+    encoded_tag,
+    entity_tag,
+    match_versions,
+    matching_tag,
+    none_match,
+    page_tag,
+)
+from app.config import ContentEncoding
+
+
+class TestConditional:
+    """Tests for entity tags and conditional request headers."""
+
+    @pytest.mark.parametrize(
+        ("header", "expected"),
+        [
+            (None, True),
+            ('"2"', False),
+            ('W/"2"', False),
+            ('"1", "2"', False),
+            ('"2-gzip"', False),
+            ('"1-gzip"', True),
+            ("*", False),
+            ('"1"', True),
+        ],
+    )
+    def test_none_match(self, header: str | None, expected: bool) -> None:
+        """
+        Tests comparing `If-None-Match` weakly with the current tag.
+
+        :return:
+        """
+        assert none_match(header, entity_tag(2)) is expected
+
+    def test_match_versions(self) -> None:
+        """
+        Tests reading the versions of strong tags in `If-Match`.
+
+        :return:
+        """
+        assert match_versions('"1", W/"2", "x", "3-br"') == [1, 3]
+        assert match_versions("*") is None
+
+    def test_encoded_tag(self) -> None:
+        """
+        Tests tagging encoded representations apart, and 304 with the client's tag.
+
+        :return:
+        """
+        tag = encoded_tag(entity_tag(2), ContentEncoding.zstd)
+        assert tag == '"2-zstd"'
+        assert matching_tag(f'"1", {tag}', entity_tag(2)) == tag
+        assert encoded_tag('W/"2"', ContentEncoding.gzip) == 'W/"2"'
+
+    def test_page_tag(self) -> None:
+        """
+        Tests tagging a page by the versions of its rows.
+
+        :return:
+        """
+        items = [SimpleNamespace(id=1, version_id=1)]
+        tag = page_tag(items, None)
+        assert tag.startswith('W/"') and tag == page_tag(items, None)
+        assert tag != page_tag([SimpleNamespace(id=1, version_id=2)], None)
+        assert tag != page_tag(items, "cursor")
@@ -0,0 +1,31 @@
+import uuid
+
+from app import schemas
+from app.api.v1.endpoints.events.items import CONNECTED, encode_event, event_stream
+
+
+def test_encode_event() -> None:
+    """
+    Tests encoding an event as a Server-Sent Events message.
+
+    :return:
+    """
+    owner_id = uuid.uuid4()
+    event = schemas.ItemEvent(id=7, item_id=3, owner_id=owner_id, op="delete")
+
+    assert encode_event(event) == (
+        b"id: 7\nevent: delete\ndata: "
+        b'{"id":7,"item_id":3,"owner_id":"' + str(owner_id).encode() + b'",'
+        b'"op":"delete","version_id":null}\n\n'
+    )
+
+
+async def test_event_stream_connected() -> None:
+    """
+    Tests opening a stream with a comment, before any event.
+
+    :return:
+    """
+    events = event_stream(None, None)
+    assert await anext(events) == CONNECTED
+    await events.aclose()
@@ -1,18 +1,230 @@
+import csv
+import io
+from collections.abc import Iterator
+from unittest import mock
+
+import orjson as json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import models, schemas
+from app.api import deps
+from app.config import settings
+from app.db.users import current_active_user
+
+URL = "/api/v1/items"
+
+
+@pytest.fixture
+async def user(db: AsyncSession) -> models.User:
+    """
+    User owning the items of a test.
+
+    :param db:
+    :return:
+    """
+    user = models.User(email="owner@example.com", hashed_password="x")  # noqa: S106
+    db.add(user)
+    await db.commit()
+    return user
+
+
+@pytest.fixture
+def client(
+    server_api: TestClient, db: AsyncSession, user: models.User
+) -> Iterator[TestClient]:
+    """
+    Client authenticated as `user`, reading and writing through `db`.
+
+    :param server_api:
+    :param db:
+    :param user:
+    :return:
+    """
+
+    async def get_db() -> AsyncSession:
+        return db
+
+    # a copy, as a rollback of `db` expires `user`
+    current_user = schemas.UserRead.model_validate(user, from_attributes=True)
+    app = server_api.app
+    app.dependency_overrides[deps.get_db] = get_db  # type: ignore[attr-defined]
+    app.dependency_overrides[current_active_user] = lambda: current_user  # type: ignore[attr-defined]
+    # the export stream opens sessions of its own
+    with mock.patch(
+        "app.api.v1.endpoints.items.async_session",
+        async_sessionmaker(db.bind, expire_on_commit=False),
+    ):
+        yield server_api
+    app.dependency_overrides.clear()  # type: ignore[attr-defined]
+
+
 class TestItems:
-    """Tests for Item database model."""
+    """Tests for the item endpoints."""
 
-    async def test_create_item(self) -> None:
+    def test_create_item(self, client: TestClient, user: models.User) -> None:
         """
         Tests creating an item owned by a User.
 
         :return:
         """
-        ...
+        response = client.post(f"{URL}/", json={"title": "a"})
+        assert response.status_code == 200
+        assert response.json()["owner_id"] == str(user.id)
 
-    async def test_read_item(self) -> None:
+    def test_read_item(self, client: TestClient) -> None:
         """
-        Tests reading an item owned by a User.
+        Tests reading an item owned by a User, and 304 for its current tag.
 
         :return:
         """
-        ...
+        id = client.post(f"{URL}/", json={"title": "a"}).json()["id"]
+
+        response = client.get(f"{URL}/{id}")
+        assert response.status_code == 200
+        assert response.json()["title"] == "a"
+        tag = response.headers["etag"]
+        assert tag == '"1"'
+
+        response = client.get(f"{URL}/{id}", headers={"If-None-Match": tag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == tag
+        response = client.get(f"{URL}/{id}", headers={"If-None-Match": '"0"'})
+        assert response.status_code == 200
+
+    def test_update_item(self, client: TestClient) -> None:
+        """
+        Tests updating an item only at a version listed by `If-Match`.
+
+        :return:
+        """
+        id = client.post(f"{URL}/", json={"title": "a"}).json()["id"]
+
+        response = client.put(
+            f"{URL}/{id}", json={"title": "b"}, headers={"If-Match": '"2"'}
+        )
+        assert response.status_code == 412
+        response = client.put(
+            f"{URL}/{id}", json={"title": "b"}, headers={"If-Match": '"1"'}
+        )
+        assert response.status_code == 200
+        assert response.json()["title"] == "b"
+        assert response.headers["etag"] == '"2"'
+
+        with mock.patch.object(settings, "fastapi_require_if_match", True):
+            response = client.put(f"{URL}/{id}", json={"title": "c"})
+        assert response.status_code == 428
+
+    def test_read_items(self, client: TestClient) -> None:
+        """
+        Tests paging items, and 304 for the tag of an unchanged page.
+
+        :return:
+        """
+        for title in "abc":
+            client.post(f"{URL}/", json={"title": title})
+
+        first = client.get(f"{URL}/", params={"limit": 2})
+        assert [item["title"] for item in first.json()["items"]] == ["a", "b"]
+        cursor = first.json()["next_cursor"]
+        second = client.get(f"{URL}/", params={"limit": 2, "after": cursor})
+        assert [item["title"] for item in second.json()["items"]] == ["c"]
+        assert second.json()["next_cursor"] is None
+
+        tag = first.headers["etag"]
+        assert tag.startswith("W/")
+        response = client.get(
+            f"{URL}/", params={"limit": 2}, headers={"If-None-Match": tag}
+        )
+        assert response.status_code == 304
+        id = first.json()["items"][0]["id"]
+        client.put(f"{URL}/{id}", json={"title": "d"})
+        response = client.get(
+            f"{URL}/", params={"limit": 2}, headers={"If-None-Match": tag}
+        )
+        assert response.status_code == 200
+
+        response = client.get(f"{URL}/", params={"after": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_search_items(self, client: TestClient) -> None:
+        """
+        Tests paging the items matching a search, most relevant first.
+
+        :return:
+        """
+        for title, description in (
+            ("pie", "apple"),
+            ("apple pie", "apple"),
+            ("cake", "lemon"),
+        ):
+            client.post(f"{URL}/", json={"title": title, "description": description})
+
+        first = client.get(f"{URL}/search", params={"q": "apple", "limit": 1})
+        assert [item["title"] for item in first.json()["items"]] == ["apple pie"]
+        cursor = first.json()["next_cursor"]
+        second = client.get(
+            f"{URL}/search", params={"q": "apple", "limit": 1, "after": cursor}
+        )
+        assert [item["title"] for item in second.json()["items"]] == ["pie"]
+        assert second.json()["next_cursor"] is None
+
+    async def test_bulk(self, client: TestClient, db: AsyncSession) -> None:
+        """
+        Tests bulk actions answering per row, with failed batches and missing rows.
+
+        :return:
+        """
+        await db.execute(
+            text(
+                "CREATE TRIGGER reject_item BEFORE INSERT ON item "
+                "WHEN NEW.title = 'reject' BEGIN SELECT RAISE(ABORT, 'reject'); END"
+            )
+        )
+        await db.commit()
+
+        response = client.post(
+            f"{URL}/bulk",
+            json=[{"title": "a"}, {"title": "reject"}, {"title": "b"}],
+            params={"batch_size": 1},
+        )
+        assert response.status_code == 200
+        created = response.json()
+        assert [row["index"] for row in created] == [0, 1, 2]
+        assert created[1] == {"index": 1, "item": None, "error": "IntegrityError"}
+        ids = [created[0]["item"]["id"], created[2]["item"]["id"]]
+
+        response = client.put(
+            f"{URL}/bulk", json=[{"id": ids[0], "title": "c"}, {"id": -1, "title": "d"}]
+        )
+        assert response.status_code == 200
+        updated = response.json()
+        assert updated[0]["item"]["title"] == "c"
+        assert updated[1] == {"index": 1, "item": None, "error": "NotFound"}
+
+        response = client.request("DELETE", f"{URL}/bulk", json=[ids[1], -1])
+        assert response.status_code == 200
+        removed = response.json()
+        assert removed[0]["item"]["id"] == ids[1]
+        assert removed[1]["error"] == "NotFound"
+
+    def test_export_items(self, client: TestClient) -> None:
+        """
+        Tests exporting items as NDJSON lines and CSV rows.
+
+        :return:
+        """
+        for title in "ab":
+            client.post(f"{URL}/", json={"title": title})
+
+        response = client.get(f"{URL}/export")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.content.splitlines()]
+        assert [line["title"] for line in lines] == ["a", "b"]
+
+        response = client.get(f"{URL}/export", params={"format": "csv"})
+        assert response.headers["content-type"].startswith("text/csv")
+        header, *rows = csv.reader(io.StringIO(response.text))
+        assert [row[header.index("title")] for row in rows] == ["a", "b"]
@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from collections.abc import Callable
+
+import pytest
+from fakeredis import FakeServer, aioredis
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.cache import EntityCache, InvalidationBus
+
+
+def worker_cache(server: FakeServer) -> EntityCache:
+    """
+    Build the item cache of one worker against a shared Redis stand-in.
+
+    :param server:
+    :return:
+    """
+    redis = aioredis.FakeRedis(server=server)
+    return EntityCache(
+        "item",
+        schemas.ItemInDB,
+        redis=redis,
+        bus=InvalidationBus(redis, channel="cache:invalidate"),
+        ttl=60,
+        l1_maxsize=10,
+        l1_ttl=60,
+    )
+
+
+async def wait_for(condition: Callable[[], bool]) -> None:
+    """
+    Wait until a condition holds.
+
+    :param condition:
+    :return:
+    """
+
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout=1)
+
+
+class TestEntityCache:
+    """Tests for the two-tier entity cache."""
+
+    async def test_invalidates_other_workers(self) -> None:
+        """
+        Tests that an invalidation evicts the L1 entry of another worker.
+
+        :return:
+        """
+        server = FakeServer()
+        writer, reader = worker_cache(server), worker_cache(server)
+        listener = asyncio.create_task(reader.bus.listen())
+        row = {
+            "id": 1,
+            "title": "a",
+            "description": None,
+            "owner_id": uuid.uuid4(),
+            "version_id": 1,
+        }
+
+        await writer.set(1, row)
+        assert await reader.get(1) == row
+        assert "1" in reader.l1
+
+        await asyncio.sleep(0.1)
+        await writer.invalidate(1)
+        await wait_for(lambda: "1" not in reader.l1)
+        assert await reader.get(1) is None
+        listener.cancel()
+
+    async def test_crud_get(
+        self, db: AsyncSession, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        Tests serving `get` from the cache until the row is updated.
+
+        :return:
+        """
+        monkeypatch.setattr(crud.item, "cache", worker_cache(FakeServer()))
+        db_obj = models.Item(title="a", owner_id=uuid.uuid4())
+        db.add(db_obj)
+        await db.commit()
+        id = db_obj.id
+
+        assert await crud.item.get(db, id=id) is db_obj
+        await db.execute(update(models.Item).values(description="stale"))
+        await db.commit()
+        db.expunge_all()
+        cached = await crud.item.get(db, id=id)
+        assert cached is not None and cached.description is None
+
+        await crud.item.update(db, db_obj=cached, obj_in={"title": "b"})
+        db.expunge_all()
+        fresh = await crud.item.get(db, id=id)
+        assert fresh is not None and fresh.description == "stale"
@@ -0,0 +1,37 @@
+import pytest
+
+from app.cache import LRUCache
+
+
+class TestLRUCache:
+    """Tests for the bounded in-process cache."""
+
+    def test_evicts_least_recently_used(self) -> None:
+        """
+        Tests evicting the entry that was used least recently.
+
+        :return:
+        """
+        cache: LRUCache[str, int] = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert len(cache) == 2
+
+    def test_expires(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """
+        Tests expiring entries after the default and per-entry ttl.
+
+        :return:
+        """
+        now = 100.0
+        monkeypatch.setattr("app.cache.lru.time.monotonic", lambda: now)
+        cache: LRUCache[str, int] = LRUCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=20)
+        now += 15
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
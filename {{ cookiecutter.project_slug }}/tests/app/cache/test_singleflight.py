@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.cache import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for sharing in-flight calls."""
+
+    async def test_share(self) -> None:
+        """
+        Tests concurrent callers of a key sharing one call and its exception.
+
+        :return:
+        """
+        flights: SingleFlight[str, int] = SingleFlight()
+        calls = []
+
+        async def call() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError
+
+        results = await asyncio.gather(*(flights.do("a", call) for _ in range(3)))
+        assert results == [(1, False), (1, True), (1, True)]
+        assert await flights.do("a", call) == (2, False)
+
+        errors = await asyncio.gather(
+            flights.do("b", fail), flights.do("b", call), return_exceptions=True
+        )
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    async def test_cancelled_leader(self) -> None:
+        """
+        Tests a caller running the call itself after the first caller is cancelled.
+
+        :return:
+        """
+        flights: SingleFlight[str, str] = SingleFlight()
+
+        async def call() -> str:
+            await asyncio.sleep(0.01)
+            return "done"
+
+        leader = asyncio.create_task(flights.do("a", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("a", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == ("done", False)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
@@ -0,0 +1,357 @@
+import asyncio
+import uuid
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import crud, models, schemas
+from app.crud.base import (
+    CRUDBase,
+    InvalidCursorError,
+    VersionMismatchError,
+    decode_cursor,
+    encode_cursor,
+)
+from app.db.session import RoutingSession
+from tests.conftest import create_text_search_functions
+
+
+class TestCursor:
+    """Tests for opaque pagination cursors."""
+
+    def test_round_trip(self) -> None:
+        """
+        Tests decoding an encoded cursor.
+
+        :return:
+        """
+        assert decode_cursor(encode_cursor(42, "a"), size=2) == [42, "a"]
+
+    @pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor(1, 2)])
+    def test_invalid(self, cursor: str) -> None:
+        """
+        Tests rejecting malformed cursors.
+
+        :return:
+        """
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor, size=1)
+
+
+class TestGetPage:
+    """Tests for keyset pagination."""
+
+    async def test_pages(self, db: AsyncSession) -> None:
+        """
+        Tests walking an owner's items page by page.
+
+        :return:
+        """
+        owner_id, other_id = uuid.uuid4(), uuid.uuid4()
+        db.add_all(
+            models.Item(title=str(i), owner_id=owner_id if i % 2 else other_id)
+            for i in range(10)
+        )
+        await db.commit()
+
+        titles, after = [], None
+        while True:
+            items, after = await crud.item.get_page_by_owner(
+                db, owner_id=owner_id, after=after, limit=2
+            )
+            titles += [item.title for item in items]
+            if after is None:
+                break
+        assert titles == ["1", "3", "5", "7", "9"]
+
+    async def test_invalid_cursor(self, db: AsyncSession) -> None:
+        """
+        Tests rejecting a cursor that does not hold a primary key.
+
+        :return:
+        """
+        with pytest.raises(InvalidCursorError):
+            await crud.item.get_page(db, after=encode_cursor("x"))
+
+
+class TestSearch:
+    """Tests for ranked full-text search."""
+
+    @pytest.mark.parametrize("cursor", [encode_cursor("x", 1), encode_cursor(0.5)])
+    async def test_invalid_cursor(self, db: AsyncSession, cursor: str) -> None:
+        """
+        Tests rejecting a cursor that does not hold a rank and a primary key.
+
+        :return:
+        """
+        with pytest.raises(InvalidCursorError):
+            await crud.item.search(db, q="title", after=cursor)
+
+
+class TestBulk:
+    """Tests for batched create, update and delete."""
+
+    async def test_create_many(self, db: AsyncSession) -> None:
+        """
+        Tests creating items over several batches.
+
+        :return:
+        """
+        owner_id = uuid.uuid4()
+        results = await crud.item.create_many_with_owner(
+            db,
+            objs_in=[schemas.ItemCreate(title=str(i)) for i in range(5)],
+            owner_id=owner_id,
+            batch_size=2,
+        )
+        assert [result.index for result in results] == [0, 1, 2, 3, 4]
+        assert [result.obj.title for result in results if result.obj] == list("01234")
+        assert all(result.obj and result.obj.owner_id == owner_id for result in results)
+
+    async def test_update_and_remove_many(self, db: AsyncSession) -> None:
+        """
+        Tests that rows outside the filter criteria are reported as not found.
+
+        :return:
+        """
+        owner_id, other_id = uuid.uuid4(), uuid.uuid4()
+        mine, theirs = models.Item(title="a", owner_id=owner_id), models.Item(
+            title="b", owner_id=other_id
+        )
+        db.add_all([mine, theirs])
+        await db.commit()
+        where = (models.Item.owner_id == owner_id,)
+
+        updated = await crud.item.update_many(
+            db,
+            objs_in=[{"id": mine.id, "title": "c"}, {"id": theirs.id, "title": "d"}],
+            batch_size=10,
+            where=where,
+        )
+        assert updated[0].obj and updated[0].obj.title == "c"
+        assert updated[1].error == "NotFound"
+
+        removed = await crud.item.remove_many(
+            db, ids=[mine.id, theirs.id], batch_size=1, where=where
+        )
+        assert removed[0].obj and removed[0].obj.id == mine.id
+        assert removed[1].error == "NotFound"
+        assert await crud.item.get(db, id=mine.id) is None
+        assert await crud.item.get(db, id=theirs.id) is not None
+
+    async def test_update_many_on_primary(self, db: AsyncSession) -> None:
+        """
+        Tests loading the rows to update from the primary, not a replica.
+
+        :return:
+        """
+        item = models.Item(title="a", owner_id=uuid.uuid4())
+        db.add(item)
+        await db.commit()
+        # a replica without the item table fails any read sent to it
+        replica = create_async_engine("sqlite+aiosqlite://")
+        sessions = async_sessionmaker(
+            db.bind,
+            expire_on_commit=False,
+            sync_session_class=RoutingSession,
+            replicas=[replica],
+        )
+
+        async with sessions() as session:
+            updated = await crud.item.update_many(
+                session, objs_in=[{"id": item.id, "title": "b"}], batch_size=10
+            )
+        await replica.dispose()
+        assert updated[0].obj and updated[0].obj.title == "b"
+
+
+class TestWrite:
+    """Tests for single-row writes."""
+
+    async def test_one_statement(self, db: AsyncSession) -> None:
+        """
+        Tests each write running one statement, filtered by the criteria.
+
+        :return:
+        """
+        statements: list[Any] = []
+        event.listen(
+            db.bind.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        owner_id = uuid.uuid4()
+        where = (models.Item.owner_id == owner_id,)
+        item = await crud.item.create_with_owner(
+            db, obj_in=schemas.ItemCreate(title="a"), owner_id=owner_id
+        )
+        assert item.owner_id == owner_id
+
+        updated = await crud.item.update_by_id(
+            db, id=item.id, obj_in=schemas.ItemUpdate(title="b"), where=where
+        )
+        assert updated is item and item.title == "b"
+        assert not await crud.item.update_by_id(
+            db,
+            id=item.id,
+            obj_in=schemas.ItemUpdate(title="c"),
+            where=(models.Item.owner_id == uuid.uuid4(),),
+        )
+        assert (await crud.item.remove(db, id=item.id, where=where)) is item
+        assert await crud.item.remove(db, id=item.id) is None
+        assert [statement.split()[0] for statement in statements] == [
+            "INSERT",
+            "UPDATE",
+            "UPDATE",
+            "DELETE",
+            "DELETE",
+        ]
+
+    async def test_versions(self, db: AsyncSession) -> None:
+        """
+        Tests updating a row only at an expected version.
+
+        :return:
+        """
+        item = await crud.item.create_with_owner(
+            db, obj_in=schemas.ItemCreate(title="a"), owner_id=uuid.uuid4()
+        )
+        assert item.version_id == 1
+
+        updated = await crud.item.update_by_id(
+            db, id=item.id, obj_in=schemas.ItemUpdate(title="b"), versions=[1]
+        )
+        assert updated is not None and updated.version_id == 2
+        assert await crud.item.get_version(db, id=item.id) == 2
+        with pytest.raises(VersionMismatchError):
+            await crud.item.update_by_id(
+                db, id=item.id, obj_in=schemas.ItemUpdate(title="c"), versions=[1]
+            )
+        assert not await crud.item.update_by_id(
+            db, id=item.id + 1, obj_in=schemas.ItemUpdate(title="c"), versions=[1]
+        )
+
+
+class TestGet:
+    """Tests for reads by primary key."""
+
+    async def test_coalesce(self, db: AsyncSession) -> None:
+        """
+        Tests concurrent reads of a row sharing one query, each in its session.
+
+        :return:
+        """
+        item = models.Item(title="a", owner_id=uuid.uuid4())
+        db.add(item)
+        await db.commit()
+        statements: list[Any] = []
+        event.listen(
+            db.bind.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        crud_item = CRUDBase(models.Item, coalesce=True)
+        sessions = async_sessionmaker(db.bind, expire_on_commit=False)
+
+        async with sessions() as first, sessions() as second:
+            items = await asyncio.gather(
+                crud_item.get(first, item.id),
+                crud_item.get(second, item.id),
+                crud_item.get(second, -1),
+            )
+            assert items[0] in first and items[1] in second
+            assert items[0].title == items[1].title == "a"
+            assert items[2] is None
+        assert len(statements) == 2
+
+    async def test_batch(self, db: AsyncSession) -> None:
+        """
+        Tests concurrent reads of rows loaded in IN queries of at most the batch size.
+
+        :return:
+        """
+        items = [models.Item(title=str(i), owner_id=uuid.uuid4()) for i in range(3)]
+        db.add_all(items)
+        await db.commit()
+        statements: list[Any] = []
+        event.listen(
+            db.bind.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        sessions = async_sessionmaker(db.bind, expire_on_commit=False)
+        crud_item = CRUDBase(models.Item, batch_size=2, session=sessions)
+
+        async with sessions() as first, sessions() as second:
+            found = await asyncio.gather(
+                crud_item.get(first, items[0].id),
+                crud_item.get(second, items[0].id),
+                crud_item.get(second, items[1].id),
+                crud_item.get(first, items[2].id),
+                crud_item.get(first, -1),
+            )
+            assert found[0] in first and found[1] in second
+            assert [item.title for item in found[1:4]] == ["0", "1", "2"]
+            assert found[4] is None
+        assert len(statements) == 2
+        assert all(" IN (" in statement for statement in statements)
+
+    async def test_batch_holding_connection(self, tmp_path: Path) -> None:
+        """
+        Tests reading on the caller's connection, with a pool of one, once it holds it.
+
+        :return:
+        """
+        from app.db.base_class import Base  # isort: skip
+
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}",
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=1,
+        )
+        event.listen(engine.sync_engine, "connect", create_text_search_functions)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        crud_item = CRUDBase(models.Item, batch_size=2, session=sessions)
+
+        async with sessions() as db:
+            item = models.Item(title="a", owner_id=uuid.uuid4())
+            db.add(item)
+            await db.flush()
+            found = await crud_item.get(db, item.id)
+        await engine.dispose()
+
+        assert found is item
+
+
+class TestStream:
+    """Tests for streaming rows through a server-side cursor."""
+
+    async def test_partitions(self, db: AsyncSession) -> None:
+        """
+        Tests streaming the selected columns in partitions of `yield_per` rows.
+
+        :return:
+        """
+        owner_id = uuid.uuid4()
+        db.add_all(models.Item(title=str(i), owner_id=owner_id) for i in range(5))
+        await db.commit()
+
+        partitions = [
+            [tuple(row) for row in rows]
+            async for rows in crud.item.stream(
+                db, columns=["title"], yield_per=2, where=()
+            )
+        ]
+        assert partitions == [[("0",), ("1",)], [("2",), ("3",)], [("4",)]]
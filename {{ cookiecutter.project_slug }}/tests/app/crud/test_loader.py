@@ -0,0 +1,54 @@
+import asyncio
+from collections.abc import Sequence
+
+import pytest
+
+from app.crud.loader import BatchLoader
+
+
+class TestBatchLoader:
+    """Tests for batching loads of keys."""
+
+    async def test_wait(self) -> None:
+        """
+        Tests collecting the keys requested within the wait window in one batch.
+
+        :return:
+        """
+        batches: list[Sequence[int]] = []
+
+        async def load_many(keys: Sequence[int]) -> dict[int, int]:
+            batches.append(keys)
+            return {key: key * 2 for key in keys if key}
+
+        loader: BatchLoader[int, int] = BatchLoader(
+            load_many, name="test", max_batch_size=10, wait=0.01
+        )
+
+        async def later(key: int) -> int | None:
+            await asyncio.sleep(0)
+            return await loader.load(key)
+
+        results = await asyncio.gather(loader.load(1), later(2), later(0))
+        assert results == [2, 4, None]
+        assert batches == [[1, 2, 0]]
+
+    async def test_error(self) -> None:
+        """
+        Tests every caller of a batch receiving the exception of its load.
+
+        :return:
+        """
+
+        async def load_many(keys: Sequence[int]) -> dict[int, int]:
+            raise ValueError
+
+        loader: BatchLoader[int, int] = BatchLoader(
+            load_many, name="test", max_batch_size=10
+        )
+        errors = await asyncio.gather(
+            loader.load(1), loader.load(2), return_exceptions=True
+        )
+        assert all(isinstance(error, ValueError) for error in errors)
+        with pytest.raises(ValueError):
+            await loader.load(3)
@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import cast
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.pool import InstrumentedPool, PoolAdvisor
+
+
+def sample(name: str, **labels: str) -> float:
+    """
+    Read a sample of the test pool.
+
+    :param name:
+    :param labels:
+    :return:
+    """
+    return REGISTRY.get_sample_value(name, {"pool": "test", **labels}) or 0
+
+
+class TestInstrumentedPool:
+    """Tests for the instrumented connection pool."""
+
+    async def test_saturation(self, tmp_path: Path) -> None:
+        """
+        Tests exporting a saturated pool and advising a larger one.
+
+        :return:
+        """
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+            poolclass=InstrumentedPool,
+            pool_logging_name="test",
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.01,
+        )
+        pool = cast(InstrumentedPool, engine.sync_engine.pool)
+        timeouts = sample("db_pool_checkout_timeouts_total")
+        waits = sample("db_pool_checkout_wait_seconds_count")
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+                assert sample("db_pool_connections", state="checked_out") == 1
+                with pytest.raises(exc.TimeoutError):
+                    await engine.connect().start()
+            assert sample("db_pool_connections", state="idle") == 1
+        finally:
+            await engine.dispose()
+
+        assert sample("db_pool_checkout_timeouts_total") == timeouts + 1
+        assert sample("db_pool_checkout_wait_seconds_count") == waits + 2
+        advice = PoolAdvisor(pool, workers=4).advise()
+        assert advice is not None and "suggest pool_size=2, 8 connections" in advice
+        assert PoolAdvisor(pool, workers=4).advise() == (
+            "test pool: peak 0 below pool_size 1; suggest pool_size=1, "
+            "4 connections over 4 workers"
+        )
+
+    async def test_recycle(self, tmp_path: Path) -> None:
+        """
+        Tests counting connections replaced when they reach `pool_recycle`.
+
+        :return:
+        """
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+            poolclass=InstrumentedPool,
+            pool_logging_name="test",
+            pool_recycle=0,
+        )
+        recycles = sample("db_pool_reconnects_total", reason="recycle")
+        try:
+            for _ in range(2):
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+        assert sample("db_pool_reconnects_total", reason="recycle") > recycles
@@ -0,0 +1,123 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fakeredis import FakeServer, aioredis
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.cache import LRUCache
+from app.db.pins import SharedPins
+from app.db.session import RoutingSession, reads_replica
+
+metadata = MetaData()
+note = Table(
+    "note",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("text", String),
+)
+
+
+@pytest.fixture()
+async def engines(tmp_path: Path) -> AsyncIterator[tuple[AsyncEngine, AsyncEngine]]:
+    """
+    Primary and replica databases, the replica holding no rows.
+
+    :param tmp_path:
+    :return:
+    """
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.create_all)
+    yield primary, replica
+    await primary.dispose()
+    await replica.dispose()
+
+
+class TestRoutingSession:
+    """Tests for the read-replica routing session."""
+
+    async def test_routing(self, engines: tuple[AsyncEngine, AsyncEngine]) -> None:
+        """
+        Tests reads going to the replica until the session or its key writes.
+
+        :return:
+        """
+        primary, replica = engines
+        pins: LRUCache[Any, bool] = LRUCache(10, ttl=60)
+        sessionmaker = async_sessionmaker(
+            primary, sync_session_class=RoutingSession, replicas=[replica], pins=pins
+        )
+        count = select(note.c.id)
+
+        async with sessionmaker() as session:
+            session.info["pin_key"] = "user"
+            assert reads_replica(session)
+            await session.execute(insert(note).values(text="a"))
+            assert not reads_replica(session)
+            assert (await session.execute(count)).all() == [(1,)]
+            await session.commit()
+        assert "user" in pins
+
+        async with sessionmaker() as session:
+            assert reads_replica(session)
+            assert (await session.execute(count)).all() == []
+            assert (await session.execute(count.with_for_update())).all() == [(1,)]
+
+        async with sessionmaker() as session:
+            session.info["pin_key"] = "user"
+            assert (await session.execute(count)).all() == [(1,)]
+            pins.clear()
+            await session.commit()
+            assert (await session.execute(count)).all() == []
+
+    async def test_shared_pins(self, engines: tuple[AsyncEngine, AsyncEngine]) -> None:
+        """
+        Tests a key that wrote through one worker reading from the primary on another.
+
+        :return:
+        """
+        primary, replica = engines
+        server = FakeServer()
+        first, second = (
+            SharedPins(
+                aioredis.FakeRedis(server=server), prefix="pin:", maxsize=10, ttl=60
+            )
+            for _ in range(2)
+        )
+        count = select(note.c.id)
+
+        async with async_sessionmaker(
+            primary, sync_session_class=RoutingSession, replicas=[replica], pins=first
+        )() as session:
+            session.info["pin_key"] = b"user"
+            await session.execute(insert(note).values(text="a"))
+            await session.commit()
+        await asyncio.gather(*first._tasks)
+
+        assert not await second.load(b"other")
+        assert await second.load(b"user")
+        async with async_sessionmaker(
+            primary, sync_session_class=RoutingSession, replicas=[replica], pins=second
+        )() as session:
+            session.info["pin_key"] = b"user"
+            assert (await session.execute(count)).all() == [(1,)]
+
+    async def test_no_replicas(self, engines: tuple[AsyncEngine, AsyncEngine]) -> None:
+        """
+        Tests every statement going to the primary without replicas.
+
+        :return:
+        """
+        primary, _ = engines
+        sessionmaker = async_sessionmaker(primary, sync_session_class=RoutingSession)
+        async with sessionmaker() as session:
+            await session.execute(insert(note).values(text="a"))
+            await session.commit()
+        async with sessionmaker() as session:
+            assert (await session.execute(select(note.c.id))).all() == [(1,)]
@@ -0,0 +1,67 @@
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.user_cache import CachedSQLAlchemyUserDatabase, user_cache
+from app.db.users import UserManager
+from app.models import User
+from app.models.user import OAuthAccount
+from app.schemas import UserUpdate
+
+
+class TestCachedUserDatabase:
+    """Tests for the cached user database."""
+
+    async def test_get(self, db: AsyncSession) -> None:
+        """
+        Tests serving a User from the cache until a hook invalidates it.
+
+        :return:
+        """
+        statements: list[Any] = []
+        event.listen(
+            db.bind.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        user = User(email="user@example.com", hashed_password="x")  # noqa: S106
+        db.add(user)
+        await db.commit()
+        user_db = CachedSQLAlchemyUserDatabase(db, User, OAuthAccount)
+
+        await user_db.get(user.id)
+        db.expunge_all()
+        count = len(statements)
+        cached = await user_db.get(user.id)
+        assert cached is not None and cached.email == user.email
+        assert len(statements) == count
+
+        await UserManager(user_db).update(UserUpdate(is_active=False), cached)
+        assert str(user.id) not in user_cache
+
+    async def test_rollback(self, db: AsyncSession) -> None:
+        """
+        Tests serving a cached User after the session that loaded it rolls back.
+
+        :return:
+        """
+        user = User(email="rollback@example.com", hashed_password="x")  # noqa: S106
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+        user_db = CachedSQLAlchemyUserDatabase(db, User, OAuthAccount)
+
+        assert await user_db.get(user_id) is not None
+        # expires the instances of the session
+        await db.rollback()
+        db.expunge_all()
+
+        sessions = async_sessionmaker(db.bind, expire_on_commit=False)
+        async with sessions() as other:
+            cached = await CachedSQLAlchemyUserDatabase(other, User, OAuthAccount).get(
+                user_id
+            )
+            assert cached is not None and cached in other
+            assert cached.email == "rollback@example.com"
+            assert cached.oauth_accounts == []
@@ -0,0 +1,69 @@
+import uuid
+from typing import Any
+
+import pytest
+
+from app.db import users
+from app.db.users import CachedJWTStrategy
+from app.models import User
+
+
+class StubUserManager:
+    """User manager that returns the user it was given."""
+
+    def __init__(self, user: User):
+        """
+        Object with one user.
+
+        :param user:
+        """
+        self.user = user
+
+    def parse_id(self, value: Any) -> uuid.UUID:
+        """
+        Parse a user id.
+
+        :param value:
+        :return:
+        """
+        return uuid.UUID(value)
+
+    async def get(self, id: uuid.UUID) -> User:
+        """
+        Retrieve the user.
+
+        :param id:
+        :return:
+        """
+        assert id == self.user.id
+        return self.user
+
+
+class TestCachedJWTStrategy:
+    """Tests for the verified-token cache."""
+
+    async def test_verifies_once(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """
+        Tests verifying a token on its first use only.
+
+        :return:
+        """
+        calls = []
+        decode = users.decode_jwt
+
+        def decode_jwt(*args: Any, **kwargs: Any) -> dict[str, Any]:
+            calls.append(args)
+            return decode(*args, **kwargs)
+
+        monkeypatch.setattr(users, "decode_jwt", decode_jwt)
+        strategy = CachedJWTStrategy(
+            secret="secret", lifetime_seconds=60, maxsize=10  # noqa: S106
+        )
+        user = User(id=uuid.uuid4(), email="user@example.com")
+        manager: Any = StubUserManager(user)
+
+        token = await strategy.write_token(user)
+        assert await strategy.read_token(token, manager) is user
+        assert await strategy.read_token(token, manager) is user
+        assert len(calls) == 1
+        assert await strategy.read_token(token + "x", manager) is None
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app import crud, models
+from app.jobs import JobRegistry
+from app.jobs.worker import Worker, backoff
+
+
+class TestClaim:
+    """Tests for claiming due jobs."""
+
+    async def test_claim(self, db: AsyncSession) -> None:
+        """
+        Tests claiming due jobs of the given kinds once per lease.
+
+        :return:
+        """
+        later = datetime.now(timezone.utc) + timedelta(hours=1)
+        for kind, run_at in (("a", None), ("b", None), ("c", None), ("a", later)):
+            crud.job.enqueue(db, kind=kind, payload={}, max_attempts=3, run_at=run_at)
+        await db.commit()
+
+        jobs = await crud.job.claim(db, kinds=["a", "b"], limit=10, lease=60)
+        assert sorted(job.kind for job in jobs) == ["a", "b"]
+        assert {(job.status, job.attempts) for job in jobs} == {("running", 1)}
+        assert await crud.job.claim(db, kinds=["a", "b"], limit=10, lease=60) == []
+        assert await crud.job.count_by_status(db) == {
+            "pending": 2,
+            "running": 2,
+            "failed": 0,
+        }
+
+    async def test_expired_lease(self, db: AsyncSession) -> None:
+        """
+        Tests failing a job whose lease expired on its last attempt.
+
+        :return:
+        """
+        crud.job.enqueue(db, kind="a", payload={}, max_attempts=2)
+        await db.commit()
+
+        # the worker dies on each attempt, leaving the lease to expire
+        for _ in range(2):
+            [job] = await crud.job.claim(db, kinds=["a"], limit=10, lease=-1)
+        assert await crud.job.claim(db, kinds=["a"], limit=10, lease=-1) == []
+        failed = await db.get(models.Job, job.id, populate_existing=True)
+        assert failed is not None
+        assert (failed.status, failed.attempts) == ("failed", 2)
+
+    async def test_expired_lease_taken_over(self, db: AsyncSession) -> None:
+        """
+        Tests a claim taking over an expired lease, fencing off the first attempt.
+
+        :return:
+        """
+        crud.job.enqueue(db, kind="a", payload={}, max_attempts=3)
+        await db.commit()
+
+        [first] = await crud.job.claim(db, kinds=["a"], limit=10, lease=-1)
+        first_attempts = first.attempts
+        [second] = await crud.job.claim(db, kinds=["a"], limit=10, lease=60)
+        assert second.attempts == first_attempts + 1
+
+        # the first attempt finishes late, while the second is running
+        assert not await crud.job.complete(db, id=first.id, attempts=first_attempts)
+        assert not await crud.job.retry(
+            db,
+            id=first.id,
+            attempts=first_attempts,
+            error="late",
+            run_at=datetime.now(timezone.utc),
+        )
+        assert await crud.job.count_by_status(db) == {
+            "pending": 0,
+            "running": 1,
+            "failed": 0,
+        }
+        assert await crud.job.complete(db, id=second.id, attempts=second.attempts)
+        assert await crud.job.count_by_status(db) == {
+            "pending": 0,
+            "running": 0,
+            "failed": 0,
+        }
+
+
+class TestWorker:
+    """Tests for running jobs."""
+
+    def test_backoff(self) -> None:
+        """
+        Tests doubling the delay with each attempt, up to the cap.
+
+        :return:
+        """
+        assert 2 <= backoff(2, 2, 60) <= 4
+        assert 30 <= backoff(10, 2, 60) <= 60
+
+    async def test_run(self, tmp_path: Path) -> None:
+        """
+        Tests completing, retrying and failing jobs.
+
+        The jobs run on connections of their own to a database file, as their
+        transactions would interleave on the one connection of `db`.
+
+        :return:
+        """
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(models.Job.__table__.create)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        registry = JobRegistry()
+        calls: list[tuple[str, Any]] = []
+
+        @registry.register("ok")
+        async def ok(payload: dict[str, Any]) -> None:
+            calls.append(("ok", payload["n"]))
+
+        @registry.register("flaky", concurrency=1)
+        async def flaky(payload: dict[str, Any]) -> None:
+            calls.append(("flaky", payload["n"]))
+            if calls.count(("flaky", payload["n"])) == 1:
+                raise ConnectionError
+
+        @registry.register("broken")
+        async def broken(_: dict[str, Any]) -> None:
+            raise ValueError("broken")
+
+        async with sessions() as db:
+            for kind, n in (("ok", 1), ("ok", 2), ("flaky", 3), ("broken", 4)):
+                crud.job.enqueue(db, kind=kind, payload={"n": n}, max_attempts=2)
+            await db.commit()
+
+        worker = Worker(
+            registry,
+            concurrency=2,
+            poll_interval=0.01,
+            timeout=5,
+            lease_margin=1,
+            backoff_seconds=0,
+            backoff_max_seconds=0,
+            session=sessions,
+        )
+        task = asyncio.create_task(worker.run())
+        for _ in range(500):
+            async with sessions() as session:
+                jobs = (await session.scalars(select(models.Job))).all()
+            if [job.status for job in jobs] == ["failed"]:
+                break
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await task
+        await engine.dispose()
+
+        assert sorted(calls) == [("flaky", 3), ("flaky", 3), ("ok", 1), ("ok", 2)]
+        assert [(job.kind, job.attempts, job.last_error) for job in jobs] == [
+            ("broken", 2, "ValueError('broken')")
+        ]
@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.config import RequestPriority
+from app.middleware.admission import AdmissionMiddleware, AIMDLimiter
+
+
+def build_limiter(initial: int) -> AIMDLimiter:
+    """
+    Build a limiter between 1 and 10 requests.
+
+    :param initial:
+    :return:
+    """
+    return AIMDLimiter(
+        initial=initial,
+        min_limit=1,
+        max_limit=10,
+        latency_target=0.1,
+        pool_wait_target=0.01,
+        backoff=0.5,
+    )
+
+
+class TestAIMDLimiter:
+    """Tests for the adaptive concurrency limit."""
+
+    def test_adapt(self) -> None:
+        """
+        Tests increasing the limit while in use, and decreasing once per burst.
+
+        :return:
+        """
+        limiter = build_limiter(4)
+        assert all(limiter.acquire(1.0) for _ in range(4))
+        assert not limiter.acquire(1.0)
+        limiter.release(latency=0.01, pool_wait=0)
+        assert limiter.limit == 4.25
+
+        limiter.release(latency=1, pool_wait=0)
+        assert limiter.limit == 2.125
+        limiter.release(latency=0.01, pool_wait=1)
+        assert limiter.limit == 2.125
+        assert limiter.in_flight == 1
+        assert not limiter.acquire(0.4)
+        assert limiter.acquire(1.0)
+
+
+class TestAdmissionMiddleware:
+    """Tests for shedding requests over the limit."""
+
+    @pytest.mark.parametrize(
+        ("method", "path", "expected"),
+        [
+            ("GET", "/api/v1/items/", RequestPriority.read),
+            ("PUT", "/api/v1/items/1", RequestPriority.write),
+            ("POST", "/api/v1/auth/jwt/login", RequestPriority.auth),
+        ],
+    )
+    def test_classify(self, method: str, path: str, expected: RequestPriority) -> None:
+        """
+        Tests classing requests by path, then method.
+
+        :return:
+        """
+        middleware = AdmissionMiddleware(
+            FastAPI(),
+            limiter=build_limiter(1),
+            priorities={},
+            auth_prefix="/api/v1/auth",
+            retry_after=1,
+        )
+        assert middleware.classify({"method": method, "path": path}) is expected
+
+    async def test_shed(self) -> None:
+        """
+        Tests rejecting reads over their share while a write is in flight.
+
+        :return:
+        """
+        app = FastAPI()
+        release = asyncio.Event()
+
+        @app.get("/read")
+        async def read() -> None:
+            ...
+
+        @app.post("/write")
+        async def write() -> None:
+            await release.wait()
+
+        app.add_middleware(
+            AdmissionMiddleware,
+            limiter=build_limiter(2),
+            priorities={RequestPriority.read: 0.25, RequestPriority.write: 1.0},
+            auth_prefix="/auth",
+            retry_after=3,
+            excluded_handlers=["^/metrics$"],
+        )
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            assert (await client.get("/read")).status_code == 200
+            pending = asyncio.create_task(client.post("/write"))
+            await asyncio.sleep(0.01)
+            rejected = await client.get("/read")
+            release.set()
+            assert (await pending).status_code == 200
+
+        assert rejected.status_code == 503
+        assert rejected.headers["retry-after"] == "3"
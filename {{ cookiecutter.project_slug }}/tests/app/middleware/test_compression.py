@@ -0,0 +1,216 @@
+import zlib
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from app.config import ContentEncoding
+from app.middleware.compression import CompressionMiddleware, negotiate
+
+BODY = b"lorem ipsum dolor sit amet " * 100
+
+
+@pytest.fixture()
+def app() -> FastAPI:
+    """
+    App compressing whole and streamed bodies.
+
+    :return:
+    """
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=[ContentEncoding.gzip],
+        minimum_size=100,
+        levels={ContentEncoding.gzip: 6},
+        excluded_handlers=["^/excluded$"],
+    )
+
+    @app.get("/small")
+    async def small() -> PlainTextResponse:
+        return PlainTextResponse("small")
+
+    @app.get("/large")
+    @app.get("/excluded")
+    async def large() -> PlainTextResponse:
+        return PlainTextResponse(BODY, headers={"ETag": '"1"'})
+
+    return app
+
+
+async def compress_stream(encoding: ContentEncoding) -> list[Message]:
+    """
+    Send a body streamed in chunks through the middleware.
+
+    :param encoding: accepted by the client
+    :return: the messages sent
+    """
+
+    async def stream(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(3):
+            await send({"type": "http.response.body", "body": BODY, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages: list[Message] = []
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    middleware = CompressionMiddleware(
+        stream,
+        encodings=[encoding],
+        minimum_size=100,
+        levels={},
+    )
+    scope = {
+        "type": "http",
+        "path": "/",
+        "headers": [(b"accept-encoding", encoding.value.encode())],
+    }
+    await middleware(scope, AsyncMock(), send)
+    return messages
+
+
+class TestCompressionMiddleware:
+    """Tests for negotiated response compression."""
+
+    @pytest.mark.parametrize(
+        ("accept_encoding", "expected"),
+        [
+            ("gzip, br, zstd", ContentEncoding.zstd),
+            ("gzip;q=1, br;q=0.5", ContentEncoding.gzip),
+            ("*;q=0.1, gzip;q=0", ContentEncoding.zstd),
+            ("zstd;q=0, br;q=0, gzip;q=0", None),
+            ("identity", None),
+        ],
+    )
+    def test_negotiate(
+        self, accept_encoding: str, expected: ContentEncoding | None
+    ) -> None:
+        """
+        Tests choosing the encoding by quality value, then preference.
+
+        :return:
+        """
+        assert negotiate(accept_encoding, list(ContentEncoding)) is expected
+
+    async def test_compress(self, app: FastAPI) -> None:
+        """
+        Tests compressing whole bodies from the minimum size, and streams by chunk.
+
+        :return:
+        """
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://test",
+            headers={"Accept-Encoding": "gzip"},
+        ) as client:
+            small = await client.get("/small")
+            large = await client.get("/large")
+            excluded = await client.get("/excluded")
+
+        assert "content-encoding" not in small.headers
+        assert large.headers["content-encoding"] == "gzip"
+        assert large.headers["vary"] == "Accept-Encoding"
+        assert large.headers["etag"] == '"1-gzip"'
+        assert excluded.headers["etag"] == '"1"'
+        assert large.content == BODY
+        assert int(large.headers["content-length"]) < len(BODY)
+        assert "content-encoding" not in excluded.headers
+
+    async def test_stream(self) -> None:
+        """
+        Tests compressing a streamed body chunk by chunk.
+
+        :return:
+        """
+        messages = await compress_stream(ContentEncoding.gzip)
+
+        assert (b"content-encoding", b"gzip") in messages[0]["headers"]
+        decompressor = zlib.decompressobj(31)
+        # each chunk decodes as it arrives
+        assert [decompressor.decompress(m["body"]) for m in messages[1:]] == [
+            BODY,
+            BODY,
+            BODY,
+            b"",
+        ]
+        assert decompressor.eof
+
+    async def test_stream_zstd(self) -> None:
+        """
+        Tests compressing a streamed body with zstd, chunk by chunk.
+
+        :return:
+        """
+        zstandard = pytest.importorskip("zstandard")
+        messages = await compress_stream(ContentEncoding.zstd)
+
+        assert (b"content-encoding", b"zstd") in messages[0]["headers"]
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        assert [decompressor.decompress(m["body"]) for m in messages[1:]] == [
+            BODY,
+            BODY,
+            BODY,
+            b"",
+        ]
+        assert decompressor.eof
+
+    async def test_stream_br(self) -> None:
+        """
+        Tests compressing a streamed body with brotli, chunk by chunk.
+
+        :return:
+        """
+        brotli = pytest.importorskip("brotli")
+        messages = await compress_stream(ContentEncoding.br)
+
+        assert (b"content-encoding", b"br") in messages[0]["headers"]
+        decompressor = brotli.Decompressor()
+        assert [decompressor.process(m["body"]) for m in messages[1:]] == [
+            BODY,
+            BODY,
+            BODY,
+            b"",
+        ]
+        assert decompressor.is_finished()
+
+    async def test_event_stream(self) -> None:
+        """
+        Tests sending the start of an event stream at once, uncompressed.
+
+        :return:
+        """
+        messages: list[Message] = []
+
+        async def stream(scope: Scope, receive: Receive, send: Send) -> None:
+            headers = [(b"content-type", b"text/event-stream; charset=utf-8")]
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": headers}
+            )
+            assert len(messages) == 1
+            await send({"type": "http.response.body", "body": BODY})
+
+        async def send(message: Message) -> None:
+            messages.append(message)
+
+        middleware = CompressionMiddleware(
+            stream,
+            encodings=[ContentEncoding.gzip],
+            minimum_size=100,
+            levels={},
+        )
+        scope = {
+            "type": "http",
+            "path": "/",
+            "headers": [(b"accept-encoding", b"gzip")],
+        }
+        await middleware(scope, AsyncMock(), send)
+
+        assert b"content-encoding" not in dict(messages[0]["headers"])
+        assert messages[1]["body"] == BODY
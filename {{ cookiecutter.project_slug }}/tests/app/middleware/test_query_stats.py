@@ -0,0 +1,85 @@
+from collections.abc import AsyncIterator
+from unittest import mock
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.db.query_stats import QueryStats, instrument_engine
+from app.db.query_stats import query_stats as query_stats_var
+from app.middleware import query_stats
+from app.middleware.query_stats import QueryStatsMiddleware
+
+
+@pytest.fixture()
+async def engine() -> AsyncIterator[AsyncEngine]:
+    """
+    Instrumented in-memory SQLite engine with one table.
+
+    :return:
+    """
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine.sync_engine)
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE TABLE note (id INTEGER PRIMARY KEY)"))
+    yield engine
+    await engine.dispose()
+
+
+class TestQueryStatsMiddleware:
+    """Tests for per-request database statement stats."""
+
+    async def test_stats(self, engine: AsyncEngine) -> None:
+        """
+        Tests the header, histograms and N+1 warning of a request.
+
+        :return:
+        """
+        app = FastAPI()
+        app.add_middleware(
+            QueryStatsMiddleware, n_plus_one_threshold=2, server_timing=True
+        )
+
+        @app.get("/notes/{id}")
+        async def read_note(id: int) -> None:
+            async with engine.connect() as connection:
+                for _ in range(3):
+                    await connection.execute(text("SELECT id FROM note"))
+
+        labels = {"handler": "/notes/{id}"}
+        before = REGISTRY.get_sample_value("http_request_db_queries_sum", labels) or 0
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        with mock.patch.object(query_stats.logger, "warning") as warning:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                response = await client.get("/notes/1")
+
+        assert response.headers["Server-Timing"].endswith('desc="3 queries"')
+        after = REGISTRY.get_sample_value("http_request_db_queries_sum", labels)
+        assert after == before + 3
+        warning.assert_called_once()
+        assert "note 3 times" in warning.call_args.args[0]
+
+    async def test_failed_statement(self, engine: AsyncEngine) -> None:
+        """
+        Tests counting a failed statement without leaving its start on the connection.
+
+        :return:
+        """
+        stats = QueryStats()
+        token = query_stats_var.set(stats)
+        try:
+            async with engine.connect() as connection:
+                with pytest.raises(OperationalError):
+                    await connection.execute(text("SELECT id FROM missing"))
+                await connection.execute(text("SELECT id FROM note"))
+                raw = await connection.get_raw_connection()
+                assert not raw.info.get("query_start")
+        finally:
+            query_stats_var.reset(token)
+        assert stats.count == 2
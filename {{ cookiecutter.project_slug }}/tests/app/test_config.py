@@ -0,0 +1,153 @@
+import io
+import logging
+import threading
+from collections.abc import Iterator
+
+import orjson as json
+import pytest
+from loguru import logger
+
+from app.config import InterceptHandler, QueueSink, restart_queue_sink
+
+
+class SlowStream(io.BytesIO):
+    """Stream whose writes wait until released."""
+
+    def __init__(self) -> None:
+        """Object holding writes until `release` is set."""
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.writes = 0
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        """
+        Write once released.
+
+        :param data:
+        :return:
+        """
+        self.entered.set()
+        self.release.wait()
+        self.writes += 1
+        return super().write(data)
+
+
+@pytest.fixture()
+def stream() -> Iterator[SlowStream]:
+    """
+    Stream of a test sink.
+
+    :return:
+    """
+    stream = SlowStream()
+    yield stream
+    stream.release.set()
+
+
+class TestQueueSink:
+    """Tests for the batching queue sink."""
+
+    def test_batches_and_drops(self, stream: SlowStream) -> None:
+        """
+        Tests dropping messages while the writer is stuck and batching the rest.
+
+        :return:
+        """
+        sink = QueueSink(stream, maxsize=2, batch_size=10, block=False, serialize=True)
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(5):
+                logger.bind(i=i).info("message {}", i)
+                stream.entered.wait()
+            stream.release.set()
+        finally:
+            logger.remove(handler_id)
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        # the writer holds the first message, the queue the next two
+        assert [line["extra"]["i"] for line in lines] == [0, 1, 2]
+        assert lines[0]["message"] == "message 0" and lines[0]["level"] == "INFO"
+        assert sink.dropped == 2
+        assert stream.writes == 2
+
+    def test_failing_stream(self, capfd: pytest.CaptureFixture[str]) -> None:
+        """
+        Tests writing on after a failed batch, and dropping once the stream closes.
+
+        :return:
+        """
+
+        class FailingStream(io.BytesIO):
+            def write(self, data: bytes) -> int:  # type: ignore[override]
+                if b"fail" in data:
+                    raise OSError("disk full")
+                return super().write(data)
+
+        stream = FailingStream()
+        sink = QueueSink(stream, maxsize=1, batch_size=1, block=True, serialize=False)
+        for message in ("fail\n", "ok\n"):
+            sink.write(message)  # type: ignore[arg-type]
+        sink.stop()
+        assert stream.getvalue() == b"ok\n"
+        assert "Failed to write 1 log records" in capfd.readouterr().err
+
+        sink = QueueSink(stream, maxsize=1, batch_size=1, block=True, serialize=False)
+        stream.close()
+        # blocks for room while the writer drains the queue, then drops
+        for _ in range(3):
+            sink.write("closed\n")  # type: ignore[arg-type]
+        sink.stop()
+        assert sink.closed and sink.dropped >= 1
+
+    def test_restart_after_fork(self) -> None:
+        """
+        Tests restarting the writer thread of the current sink alone after a fork.
+
+        :return:
+        """
+        old, current = (
+            QueueSink(
+                io.BytesIO(), maxsize=1, batch_size=1, block=True, serialize=False
+            )
+            for _ in range(2)
+        )
+        old.stop()
+        assert QueueSink.current is current
+        old_thread, current_thread = old._thread, current._thread
+        current_queue = current._queue
+        try:
+            restart_queue_sink()
+            assert old._thread is old_thread
+            assert current._thread is not current_thread
+        finally:
+            # without a fork, the replaced writer thread is still running
+            current_queue.put(None)
+            current_thread.join()
+            current.stop()
+        assert QueueSink.current is None
+
+
+class TestInterceptHandler:
+    """Tests for the standard library logging interception."""
+
+    def test_caller(self) -> None:
+        """
+        Tests taking the caller from the standard library record.
+
+        :return:
+        """
+        messages: list[str] = []
+        handler_id = logger.add(
+            messages.append, format="{name}:{function}:{line} {message}"
+        )
+        stdlib_logger = logging.getLogger("test.intercept")
+        stdlib_logger.addHandler(InterceptHandler())
+        stdlib_logger.propagate = False
+        try:
+            stdlib_logger.warning("literal {braces}")
+            line = stdlib_logger.findCaller()[1] - 1
+        finally:
+            logger.remove(handler_id)
+            stdlib_logger.handlers = []
+        assert messages == [f"test.intercept:test_caller:{line} literal {{braces}}\n"]
@@ -0,0 +1,116 @@
+import asyncio
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+from app.events import EventHub
+
+
+def build_event(id: int, owner_id: uuid.UUID) -> schemas.ItemEvent:
+    """
+    Build an update event of an item.
+
+    :param id:
+    :param owner_id:
+    :return:
+    """
+    return schemas.ItemEvent(
+        id=id, item_id=id, owner_id=owner_id, op="update", version_id=2
+    )
+
+
+class TestEventHub:
+    """Tests for the in-memory fan-out of item events."""
+
+    async def test_resume_from_buffer(self, db: AsyncSession) -> None:
+        """
+        Tests resuming from the buffer, then receiving live events and keepalives.
+
+        :return:
+        """
+        owner_id, other_id = uuid.uuid4(), uuid.uuid4()
+        hub = EventHub(buffer_size=10, queue_maxsize=10, session=lambda: db)
+        hub.horizon = 0
+        for id, owner in enumerate((owner_id, other_id, owner_id), start=1):
+            hub.publish(build_event(id, owner))
+
+        events = hub.subscribe(owner_id=owner_id, after=1, keepalive=0.01)
+        assert (await anext(events)).id == 3
+        hub.publish(build_event(4, other_id))
+        hub.publish(build_event(5, owner_id))
+        assert (await anext(events)).id == 5
+        assert await anext(events) is None
+        await events.aclose()
+        assert not hub.subscriptions
+
+    async def test_resume_from_database(self, db: AsyncSession) -> None:
+        """
+        Tests catching up from the table when the buffer no longer holds the id.
+
+        :return:
+        """
+        owner_id, other_id = uuid.uuid4(), uuid.uuid4()
+        owners = (owner_id, other_id, owner_id, owner_id)
+        db.add_all(
+            models.ItemEvent(id=id, item_id=id, owner_id=owner, op="update")
+            for id, owner in enumerate(owners, start=1)
+        )
+        await db.commit()
+        hub = EventHub(buffer_size=2, queue_maxsize=10, session=lambda: db)
+        hub.horizon = 0
+        for id, owner in enumerate(owners, start=1):
+            hub.publish(build_event(id, owner))
+        assert hub.horizon == 2
+
+        events = hub.subscribe(owner_id=owner_id, after=0, keepalive=1)
+        assert [(await anext(events)).id for _ in range(3)] == [1, 3, 4]
+        await events.aclose()
+
+    async def test_catch_up_once(self, db: AsyncSession) -> None:
+        """
+        Tests publishing an event notified while catching up only once.
+
+        :return:
+        """
+        owner_id = uuid.uuid4()
+        db.add_all(
+            models.ItemEvent(id=id, item_id=id, owner_id=owner_id, op="update")
+            for id in (1, 2, 3)
+        )
+        await db.commit()
+        hub = EventHub(buffer_size=10, queue_maxsize=10, session=lambda: db)
+        hub.horizon = 0
+        hub.publish(build_event(1, owner_id))
+        events = hub.subscribe(owner_id=None, after=None, keepalive=0.01)
+        received = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+
+        # notified after reconnecting, before the table is read
+        hub.publish(build_event(2, owner_id))
+        await hub.catch_up()
+        hub.publish(build_event(3, owner_id))
+        ids = [(await received).id]
+        while (event := await anext(events)) is not None:
+            ids.append(event.id)
+        assert ids == [2, 3]
+        await events.aclose()
+
+    async def test_drop_slow_subscriber(self, db: AsyncSession) -> None:
+        """
+        Tests disconnecting a subscriber whose queue is full.
+
+        :return:
+        """
+        owner_id = uuid.uuid4()
+        hub = EventHub(buffer_size=10, queue_maxsize=1, session=lambda: db)
+        events = hub.subscribe(owner_id=None, after=None, keepalive=1)
+        first = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+        hub.publish(build_event(1, owner_id))
+        assert (await first).id == 1
+
+        hub.publish(build_event(2, owner_id))
+        hub.publish(build_event(3, owner_id))
+        assert not hub.subscriptions
+        assert [event async for event in events] == []
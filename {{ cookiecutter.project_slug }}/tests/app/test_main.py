@@ -0,0 +1,24 @@
+from pathlib import Path
+from unittest import mock
+
+import orjson as json
+
+from app.config import settings
+from app.main import create_app
+
+
+class TestCreateApp:
+    """Tests for the app factory."""
+
+    def test_precomputed_openapi(self, tmp_path: Path) -> None:
+        """
+        Tests serving the OpenAPI schema read from `FASTAPI_OPENAPI_SCHEMA`.
+
+        :return:
+        """
+        schema = {"openapi": "3.1.0", "info": {"title": "test", "version": "0"}}
+        path = tmp_path / "openapi.json"
+        path.write_bytes(json.dumps(schema))
+        with mock.patch.object(settings, "fastapi_openapi_schema", str(path)):
+            app = create_app()
+        assert app.openapi() == schema
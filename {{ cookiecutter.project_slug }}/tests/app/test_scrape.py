@@ -0,0 +1,87 @@
+import threading
+from pathlib import Path
+from unittest import mock
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from app import scrape
+from app.scrape import (
+    ScrapeCache,
+    compact_dead_workers,
+    compact_worker,
+    lock_directory,
+)
+
+KEY = mmap_key("jobs", "jobs_total", [], [], "Jobs run.")
+
+
+def write_counter(path: Path, value: float) -> None:
+    """
+    Write a counter sample to a metric file.
+
+    :param path:
+    :param value:
+    :return:
+    """
+    values = MmapedDict(str(path))
+    values.write_value(KEY, value, 0.0)
+    values.close()
+
+
+class TestScrape:
+    """Tests for the multiprocess metrics exposition."""
+
+    def test_compact_dead_workers(self, tmp_path: Path) -> None:
+        """
+        Tests folding an exited worker's counters into the archive.
+
+        :return:
+        """
+        write_counter(tmp_path / "counter_archive.db", 1)
+        write_counter(tmp_path / "counter_100.db", 2)
+        write_counter(tmp_path / "counter_200.db", 4)
+        with mock.patch.object(scrape, "is_alive", lambda pid: pid == 200):
+            assert compact_dead_workers(tmp_path) == [100]
+
+        assert not (tmp_path / "counter_100.db").exists()
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry, str(tmp_path))
+        assert registry.get_sample_value("jobs_total") == 7
+
+    def test_generate_during_compaction(self, tmp_path: Path) -> None:
+        """
+        Tests reading the metric files only once a compaction is done.
+
+        :return:
+        """
+        write_counter(tmp_path / "counter_archive.db", 1)
+        write_counter(tmp_path / "counter_100.db", 2)
+        cache = ScrapeCache(ttl=0, path=tmp_path)
+        content: list[bytes] = []
+        with mock.patch.object(scrape, "compact_dead_workers"):
+            with lock_directory(tmp_path, exclusive=True):
+                reader = threading.Thread(
+                    target=lambda: content.append(cache.generate())
+                )
+                reader.start()
+                reader.join(0.2)
+                assert reader.is_alive()
+                compact_worker(tmp_path, 100)
+            reader.join()
+
+        assert b"jobs_total 3.0" in content[0]
+
+    def test_cache(self) -> None:
+        """
+        Tests regenerating the exposition only once expired.
+
+        :return:
+        """
+        cache = ScrapeCache(ttl=60)
+        with mock.patch.object(cache, "generate", return_value=b"metrics") as generate:
+            assert cache.get() == b"metrics"
+            assert cache.get(gzipped=True) != b"metrics"
+            assert cache.get() == b"metrics"
+        generate.assert_called_once()
@@ -0,0 +1,89 @@
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from app.config import InterceptHandler, QueueSink
+from app.server import Supervisor, read_memory
+
+
+class TestSupervisor:
+    """Tests for the preforking worker supervisor."""
+
+    def test_restart(self) -> None:
+        """
+        Tests restarting workers that exit until stopped.
+
+        :return:
+        """
+        supervisor = Supervisor(
+            lambda: time.sleep(0.05),
+            workers=2,
+            memory_report_interval=0,
+            shutdown_timeout=1,
+            restart_delay=0,
+        )
+        timer = threading.Timer(0.5, supervisor.stop)
+        timer.start()
+        supervisor.run()
+        timer.join()
+
+        assert supervisor.restarts >= 2
+        assert not supervisor.slots
+
+    def test_worker_failed(self, tmp_path: Path) -> None:
+        """
+        Tests writing the queued log records of a failed worker before it exits.
+
+        :return:
+        """
+
+        def fail() -> None:
+            raise RuntimeError("failed")
+
+        class SlowFile(io.FileIO):
+            def write(self, data: bytes) -> int:  # type: ignore[override]
+                # a worker exiting at once would lose the record being written
+                time.sleep(0.1)
+                return super().write(data)
+
+        supervisor = Supervisor(
+            fail,
+            workers=1,
+            memory_report_interval=0,
+            shutdown_timeout=1,
+            restart_delay=0.1,
+        )
+        server_logger = logging.getLogger("app.server")
+        handler = InterceptHandler()
+        server_logger.addHandler(handler)
+        with SlowFile(tmp_path / "log", "wb") as stream:
+            sink = QueueSink(
+                stream, maxsize=10, batch_size=10, block=True, serialize=False
+            )
+            handler_id = logger.add(sink, format="{message}", colorize=False)
+            try:
+                timer = threading.Timer(0.5, supervisor.stop)
+                timer.start()
+                supervisor.run()
+                timer.join()
+            finally:
+                logger.remove(handler_id)
+                server_logger.removeHandler(handler)
+
+        assert "Worker 0 failed" in (tmp_path / "log").read_text()
+
+    def test_read_memory(self) -> None:
+        """
+        Tests reading the memory of a process.
+
+        :return:
+        """
+        memory = read_memory(os.getpid())
+        if memory is not None:
+            assert memory["rss"] >= memory["private"] > 0
+        assert read_memory(-1) is None
@@ -0,0 +1,105 @@
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Status, StatusCode, Tracer, set_span_in_context
+from prometheus_client import REGISTRY
+
+from app.tracing import TailSamplingSpanProcessor
+
+
+def sampled(decision: str, reason: str) -> float:
+    """
+    Read the count of traces sampled with a decision and reason.
+
+    :param decision:
+    :param reason:
+    :return:
+    """
+    labels = {"decision": decision, "reason": reason}
+    return REGISTRY.get_sample_value("traces_sampled_total", labels) or 0
+
+
+def trace(
+    tracer: Tracer, name: str, *, duration_ms: int = 1, error: bool = False
+) -> None:
+    """
+    Record a trace of a root span with one child span.
+
+    :param tracer:
+    :param name:
+    :param duration_ms:
+    :param error:
+    :return:
+    """
+    root = tracer.start_span(name, start_time=0)
+    child = tracer.start_span(f"{name} child", context=set_span_in_context(root))
+    if error:
+        child.set_status(Status(StatusCode.ERROR))
+    child.end()
+    root.end(end_time=duration_ms * 1_000_000)
+
+
+@pytest.fixture()
+def exporter() -> InMemorySpanExporter:
+    """
+    Collect the spans kept by tail sampling.
+
+    :return:
+    """
+    return InMemorySpanExporter()
+
+
+def build_tracer(exporter: InMemorySpanExporter, ratio: float) -> Tracer:
+    """
+    Build a tracer tail sampling into an exporter.
+
+    :param exporter:
+    :param ratio:
+    :return:
+    """
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(
+        TailSamplingSpanProcessor(
+            SimpleSpanProcessor(exporter),
+            latency_threshold_ms=100,
+            ratio=ratio,
+            max_traces=10,
+        )
+    )
+    return tracer_provider.get_tracer(__name__)
+
+
+class TestTailSamplingSpanProcessor:
+    """Tests for latency-aware tail sampling."""
+
+    def test_keeps_errors_and_slow_traces(self, exporter: InMemorySpanExporter) -> None:
+        """
+        Tests keeping every span of failed and slow traces, dropping fast ones.
+
+        :return:
+        """
+        tracer = build_tracer(exporter, ratio=0)
+        dropped = sampled("dropped", "ratio")
+        trace(tracer, "fast")
+        trace(tracer, "error", error=True)
+        trace(tracer, "slow", duration_ms=100)
+
+        names = [span.name for span in exporter.get_finished_spans()]
+        assert names == ["error child", "error", "slow child", "slow"]
+        assert sampled("dropped", "ratio") == dropped + 1
+
+    def test_keeps_ratio(self, exporter: InMemorySpanExporter) -> None:
+        """
+        Tests keeping fast traces with a sample ratio of one.
+
+        :return:
+        """
+        tracer = build_tracer(exporter, ratio=1)
+        kept = sampled("kept", "ratio")
+        trace(tracer, "fast")
+
+        assert len(exporter.get_finished_spans()) == 2
+        assert sampled("kept", "ratio") == kept + 1
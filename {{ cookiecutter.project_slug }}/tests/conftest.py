@@ -1,13 +1,18 @@
 import asyncio
 import sys
 from asyncio import AbstractEventLoop
-from collections.abc import Callable, Iterator
+from collections.abc import AsyncIterator, Callable, Iterator
+from typing import Any
 
 import pytest
 from aioresponses import aioresponses
 from fastapi.testclient import TestClient
-
-from app.main import app
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.elements import BinaryExpression
 
 
 @pytest.fixture(scope="session")
@@ -50,11 +55,79 @@ def init_database() -> Callable[..., None]:
 
     :return:
     """
-    from src.app.db.base_class import Base  # isort: skip
+    from app.db.base_class import Base  # isort: skip
 
     return Base.metadata.create_all
 
 
+@compiles(REGCONFIG, "sqlite")
+@compiles(TSVECTOR, "sqlite")
+def compile_text_search_type(*_: Any, **__: Any) -> str:
+    """
+    Store PostgreSQL text search types as text in SQLite.
+
+    :return:
+    """
+    return "TEXT"
+
+
+@compiles(BinaryExpression, "sqlite")
+def compile_text_search_match(
+    element: BinaryExpression[Any], compiler: SQLCompiler, **kw: Any
+) -> str:
+    """
+    Call `ts_match` for the PostgreSQL `@@` operator in SQLite.
+
+    :param element:
+    :param compiler:
+    :param kw:
+    :return:
+    """
+    if getattr(element.operator, "opstring", None) == "@@":
+        left = compiler.process(element.left, **kw)
+        right = compiler.process(element.right, **kw)
+        return f"ts_match({left}, {right})"
+    return compiler.visit_binary(element, **kw)
+
+
+def create_text_search_functions(dbapi_connection: Any, _: Any) -> None:
+    """
+    Stand in for the PostgreSQL text search functions in SQLite.
+
+    A `tsvector` is its text, and a query matches the vectors containing it.
+
+    :param dbapi_connection:
+    :param _:
+    :return:
+    """
+    for name, function in (
+        ("to_tsvector", lambda _, text: text),
+        ("setweight", lambda vector, _: vector),
+        ("websearch_to_tsquery", lambda _, q: q),
+        ("ts_rank", lambda vector, query: vector.lower().count(query.lower())),
+        ("ts_match", lambda vector, query: query.lower() in vector.lower()),
+    ):
+        dbapi_connection.create_function(name, 2, function, deterministic=True)
+
+
+@pytest.fixture
+async def db() -> AsyncIterator[AsyncSession]:
+    """
+    In-memory SQLite session with every table created.
+
+    :return:
+    """
+    from app.db.base_class import Base  # isort: skip
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    event.listen(engine.sync_engine, "connect", create_text_search_functions)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
 @pytest.fixture(scope="session")
 def server_api() -> Iterator[TestClient]:
     """
@@ -62,7 +135,9 @@ def server_api() -> Iterator[TestClient]:
 
     :return:
     """
-    with TestClient(app) as c:
+    from app.main import create_app  # isort: skip
+
+    with TestClient(create_app()) as c:
         yield c
 
 